@@ -0,0 +1,155 @@
+# ai_profiles.py - Perfiles de usuario con Gemini, persistidos y direccionados por contenido
+#
+# El perfil se guarda en feedbacks.final_summary junto con summary_hash: el hash
+# de las respuestas normalizadas + versión del prompt + modelos. Mientras las
+# respuestas no cambien, el perfil guardado sigue vigente y no se vuelve a pedir
+# a Gemini (ni por pestaña, ni por usuario del dashboard, ni tras reiniciar).
+# El cálculo corre en segundo plano (ver insights.py) y las llamadas pasan por
+# llm_client.LLMClient (circuit breaker y orden por salud de cada modelo).
+# El prompt tiene un presupuesto de tokens: las respuestas abiertas largas se
+# recortan para acotar latencia y cuota.
+
+import os
+import re
+import hashlib
+import logging
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from llm_client import LLMClient
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PROMPT_VERSION = "profile-v2"
+PACK_PROMPT_VERSION = "pack-v1"      # Prompt por lotes del backfill (insights.PACK_PROMPT)
+PROFILE_MODELS = [
+    'models/gemini-2.5-flash',
+    'models/gemini-2.0-flash',
+    'models/gemini-flash-latest'
+]
+PROFILE_MIN_ANSWERS = 3
+PROFILE_MAX_WORDS = 80
+# Presupuesto aproximado (1 token ~ 4 caracteres en español)
+PROFILE_TOKEN_BUDGET = int(os.getenv("PROFILE_TOKEN_BUDGET", "900"))
+PROFILE_MAX_ANSWER_TOKENS = int(os.getenv("PROFILE_MAX_ANSWER_TOKENS", "120"))
+PROFILE_MAX_OUTPUT_TOKENS = int(os.getenv("PROFILE_MAX_OUTPUT_TOKENS", "256"))
+CHARS_PER_TOKEN = 4
+
+# Columnas reales de la encuesta -> etiqueta para el prompt, en orden de prioridad
+# (si el presupuesto se agota, se descartan las del final)
+PROFILE_FIELDS = {
+    'q18_edad': 'Edad',
+    'q10_situacion_vivienda': 'Situación de vivienda',
+    'q1_actividades_productivas': 'Actividades productivas',
+    'q3_nivel_productividad': 'Nivel de productividad',
+    'q7_actividades_proposito': 'Actividades que le dan propósito',
+    'q9_nivel_proposito': 'Nivel de propósito',
+    'q15_actividades_disfrute': 'Actividades que disfruta',
+    'q4_uso_tecnologia': 'Uso de tecnología',
+    'q11_entorno_cercano': 'Entorno cercano',
+    'q12_frecuencia_social': 'Frecuencia de contacto social',
+    'q14_nivel_apoyo_social': 'Apoyo social',
+    'q13_soledad': 'Sentimientos de soledad',
+    'q2_experiencia_valor': 'Valor de su experiencia',
+    'q22_filosofia_vida': 'Filosofía de vida',
+    'q23_mensaje_generaciones': 'Mensaje a nuevas generaciones',
+    'q26_servicios_necesarios': 'Servicios que necesita',
+    'q27_limitaciones_fisicas': 'Limitaciones físicas',
+    'q5_aprendizaje_tecnologia': 'Aprendizaje de tecnología',
+    'q6_oportunidades_digitales': 'Oportunidades digitales',
+    'q8_importancia_utilidad': 'Importancia de sentirse útil',
+    'q16_frecuencia_placer': 'Frecuencia de actividades placenteras',
+    'q17_satisfaccion_disfrute': 'Satisfacción con su disfrute',
+    'q19_experiencias_discriminacion': 'Experiencias de discriminación por edad',
+    'q20_espacios_discriminacion': 'Espacios de discriminación',
+    'q21_frecuencia_discriminacion': 'Frecuencia de discriminación',
+    'q24_compartir_adicional': 'Comentarios adicionales',
+    'q25_experiencias_recientes': 'Experiencias recientes',
+}
+
+PROFILE_PROMPT = """Dame un resumen empático y personalizado en tercera persona de este usuario según la información de su encuesta:
+
+{answers}
+
+Genera un perfil de máximo {max_words} palabras que destaque:
+- Sus fortalezas y aspectos positivos
+- Su personalidad y estilo de vida
+- Sus habilidades y experiencias
+- Su actitud hacia la vida
+
+Enfoque: comprensivo, respetuoso y que resalte sus cualidades."""
+
+def normalize_value(value) -> Optional[str]:
+    """Texto limpio de la respuesta (None si está vacía)"""
+    if value is None:
+        return None
+    text = re.sub(r"\s+", " ", str(value)).strip()
+    return text if text and text not in ('None', 'nan') else None
+
+def _truncate(text: str, max_tokens: int) -> str:
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(' ', 1)[0] + "…"
+
+def profile_lines(answers: dict, budget_tokens: int = PROFILE_TOKEN_BUDGET) -> List[str]:
+    """Líneas '• Etiqueta: respuesta' dentro del presupuesto de tokens"""
+    lines = []
+    used = 0
+    for column, label in PROFILE_FIELDS.items():
+        value = normalize_value(answers.get(column))
+        if value is None:
+            continue
+        line = f"• {label}: {_truncate(value, PROFILE_MAX_ANSWER_TOKENS)}"
+        cost = len(line) // CHARS_PER_TOKEN + 1
+        if used + cost > budget_tokens:
+            break
+        lines.append(line)
+        used += cost
+    return lines
+
+def profile_hash(lines: List[str], version: str = PROFILE_PROMPT_VERSION) -> str:
+    """Clave de contenido: respuestas normalizadas + versión del prompt que lo generó + modelos"""
+    key = "\n".join([version, ",".join(PROFILE_MODELS), *lines])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+def cached_profile(answers: dict) -> Optional[str]:
+    """Perfil guardado si sigue vigente para estas respuestas (sin consultas ni llamadas a Gemini)"""
+    summary = normalize_value(answers.get('final_summary'))
+    if not summary or not answers.get('summary_hash'):
+        return None
+    lines = profile_lines(answers)
+    for version in (PROFILE_PROMPT_VERSION, PACK_PROMPT_VERSION):
+        if answers['summary_hash'] == profile_hash(lines, version):
+            return summary
+    return None
+
+def _error_message(error: Exception) -> str:
+    error_msg = str(error)
+    if "404" in error_msg:
+        return "❌ Error 404: Modelo no encontrado en tu región. Intenta con otro modelo."
+    if "403" in error_msg or "permission" in error_msg.lower():
+        return "🔐 Error: Sin permisos API. Verifica tu API key de Gemini."
+    if "quota" in error_msg.lower() or "limit" in error_msg.lower():
+        return "⚠️ Error: Cuota API agotada. Intenta más tarde."
+    if "SAFETY" in error_msg.upper():
+        return "🛡️ Contenido bloqueado por filtros de seguridad. Intenta de nuevo."
+    return f"⚠️ Error IA: {error_msg[:80]}..."
+
+@lru_cache(maxsize=1)
+def gemini_client() -> LLMClient:
+    """Cliente compartido por proceso (modelos reutilizados, salud por modelo)"""
+    return LLMClient(PROFILE_MODELS)
+
+def call_gemini(prompt: str, max_output_tokens: int = PROFILE_MAX_OUTPUT_TOKENS, **generation_config) -> str:
+    """Texto del mejor modelo disponible; relanza el último error si todos fallan"""
+    generation_config = {"temperature": 0.3, "max_output_tokens": max_output_tokens, **generation_config}
+    return gemini_client().generate(prompt, **generation_config)
+
+def generate_profile(lines: List[str]) -> Tuple[Optional[str], str]:
+    """Llama a Gemini; devuelve (perfil, '') o (None, mensaje de error para mostrar)"""
+    if not os.getenv("GEMINI_API_KEY"):
+        return None, "🔑 API key de Gemini no configurada"
+    try:
+        return call_gemini(PROFILE_PROMPT.format(answers="\n".join(lines), max_words=PROFILE_MAX_WORDS)), ""
+    except Exception as e:
+        return None, _error_message(e)
@@ -0,0 +1,104 @@
+# benchmarks/bench_async_db.py - Compara el camino sync (SessionLocal) vs async (asyncpg)
+#
+# Carga sintética: N usuarios responden M preguntas; después de cada respuesta se
+# simula el envío de la siguiente pregunta a la Graph API con una latencia fija.
+# El camino sync procesa los mensajes uno a uno (como un worker Celery --pool=solo);
+# el camino async procesa a todos los usuarios en un solo proceso con asyncio.
+#
+# Uso:  python -m benchmarks.bench_async_db --users 200 --answers 5 --api-latency-ms 80
+
+import argparse
+import asyncio
+import time
+import uuid
+from sqlalchemy import delete
+from database import SessionLocal, AsyncSessionLocal, Feedback, init_db, async_engine
+from survey_repository import get_survey, save_answer, aget_survey, asave_answer
+
+# Bloque de preguntas abiertas (22-27): cada respuesta es texto libre
+START_STEP = 22
+ANSWER_TEXT = "Que hay que disfrutar cada día con la familia"
+
+def seed_users(prefix, users):
+    """Crea N encuestas activas en el paso START_STEP"""
+    db = SessionLocal()
+    try:
+        db.add_all([
+            Feedback(user_id=f"{prefix}{i}", status='active', current_step=START_STEP)
+            for i in range(users)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+def cleanup_users(prefix):
+    db = SessionLocal()
+    try:
+        db.execute(delete(Feedback).where(Feedback.user_id.like(f"{prefix}%")))
+        db.commit()
+    finally:
+        db.close()
+
+def run_sync(prefix, users, answers, api_latency):
+    """Camino sync: un mensaje a la vez, la latencia de la API bloquea el proceso"""
+    for _ in range(answers):
+        for i in range(users):
+            db = SessionLocal()
+            try:
+                survey = get_survey(db, f"{prefix}{i}")
+                save_answer(db, survey, ANSWER_TEXT)
+            finally:
+                db.close()
+            time.sleep(api_latency)  # Envío de la siguiente pregunta
+
+async def run_async(prefix, users, answers, api_latency, concurrency):
+    """Camino async: los usuarios se atienden en paralelo y solapan BD + API"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def respondent(user_id):
+        for _ in range(answers):
+            async with semaphore:
+                async with AsyncSessionLocal() as session:
+                    survey = await aget_survey(session, user_id)
+                    await asave_answer(session, survey, ANSWER_TEXT)
+                await asyncio.sleep(api_latency)  # Envío de la siguiente pregunta
+
+    await asyncio.gather(*(respondent(f"{prefix}{i}") for i in range(users)))
+    await async_engine.dispose()
+
+def report(label, elapsed, messages):
+    print(f"{label:<6} {elapsed:8.2f}s  {messages / elapsed:10.1f} msg/s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sync vs async de la capa de datos")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--answers", type=int, default=5, help="Máximo 6 (preguntas 22-27)")
+    parser.add_argument("--api-latency-ms", type=float, default=80.0)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    init_db()
+    api_latency = args.api_latency_ms / 1000
+    messages = args.users * args.answers
+    print(f"📊 {args.users} usuarios x {args.answers} respuestas, latencia API {args.api_latency_ms:.0f}ms")
+
+    prefix = f"bench-sync-{uuid.uuid4().hex[:8]}-"
+    seed_users(prefix, args.users)
+    try:
+        start = time.perf_counter()
+        run_sync(prefix, args.users, args.answers, api_latency)
+        report("sync", time.perf_counter() - start, messages)
+    finally:
+        cleanup_users(prefix)
+
+    prefix = f"bench-async-{uuid.uuid4().hex[:8]}-"
+    seed_users(prefix, args.users)
+    try:
+        start = time.perf_counter()
+        asyncio.run(run_async(prefix, args.users, args.answers, api_latency, args.concurrency))
+        report("async", time.perf_counter() - start, messages)
+    finally:
+        cleanup_users(prefix)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# benchmarks/bench_feedback_indexes.py - Verifica los planes de las consultas calientes sobre feedbacks
+#
+# Migra un schema aparte hasta la revisión previa a los índices, siembra N filas
+# (1M por defecto), muestra el plan de cada consulta caliente antes y después de
+# la revisión 0003_hot_query_indexes y falla (exit 1) si alguna consulta no usa
+# el índice esperado.
+#
+# Uso:  python -m benchmarks.bench_feedback_indexes --rows 1000000
+
+import argparse
+import json
+import sys
+import time
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL, ALEMBIC_INI
+
+BENCH_SCHEMA = "bench_indexes"
+
+# (descripción, SQL, índice esperado)
+HOT_QUERIES = [
+    ("webhook: encuesta por usuario",
+     "SELECT * FROM feedbacks WHERE user_id = '573000424242' LIMIT 1",
+     "uq_feedbacks_user_id"),
+    ("dashboard: completadas en 30 días",
+     "SELECT count(*) FROM feedbacks WHERE status = 'completed' "
+     "AND created_at BETWEEN now() - interval '60 days' AND now() - interval '30 days'",
+     "ix_feedbacks_status_created_at"),
+    ("barrido: activas sin actividad",
+     "SELECT id, user_id FROM feedbacks WHERE status = 'active' "
+     "AND updated_at < now() - interval '1 day' ORDER BY updated_at LIMIT 500",
+     "ix_feedbacks_active_updated_at"),
+]
+
+def upgrade(bench_engine, revision):
+    config = Config(ALEMBIC_INI)
+    config.attributes["engine"] = bench_engine
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, revision)
+
+def seed(conn, rows):
+    """N filas sintéticas (5% activas)"""
+    conn.execute(text("""
+        INSERT INTO feedbacks (id, user_id, status, current_step, created_at, updated_at)
+        SELECT g,
+               '57300' || lpad(g::text, 7, '0'),
+               CASE WHEN g % 20 = 0 THEN 'active' WHEN g % 20 < 15 THEN 'completed' ELSE 'in_progress' END,
+               CASE WHEN g % 20 < 15 AND g % 20 <> 0 THEN 28 ELSE 1 + g % 27 END,
+               now() - (g % 730) * interval '1 day' - (g % 1440) * interval '1 minute',
+               now() - (g % 730) * interval '1 day' + (g % 90) * interval '1 minute'
+        FROM generate_series(1, :rows) AS g
+    """), {'rows': rows})
+    conn.execute(text("ANALYZE feedbacks"))
+
+def index_names(plan):
+    """Recorre el plan JSON y devuelve los índices usados"""
+    names = set()
+    if 'Index Name' in plan:
+        names.add(plan['Index Name'])
+    for child in plan.get('Plans', []):
+        names |= index_names(child)
+    return names
+
+def explain(conn, sql):
+    raw = conn.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")).scalar()
+    result = (json.loads(raw) if isinstance(raw, str) else raw)[0]
+    return result['Plan'], result['Execution Time']
+
+def check_plans(conn, label):
+    failures = 0
+    print(f"\n--- {label} ---")
+    for description, sql, expected in HOT_QUERIES:
+        plan, elapsed_ms = explain(conn, sql)
+        used = index_names(plan)
+        ok = expected in used
+        failures += 0 if ok else 1
+        print(f"{'✅' if ok else '❌'} {description:<36} {elapsed_ms:9.2f} ms  "
+              f"{plan['Node Type']:<20} {', '.join(sorted(used)) or '-'}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Planes de consultas calientes sobre feedbacks")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--keep", action="store_true", help=f"No borrar el schema {BENCH_SCHEMA}")
+    args = parser.parse_args()
+
+    with create_engine(DATABASE_URL).begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {BENCH_SCHEMA}"))
+
+    bench_engine = create_engine(DATABASE_URL, connect_args={'options': f'-csearch_path={BENCH_SCHEMA}'})
+    try:
+        upgrade(bench_engine, "0002_survey_answers")
+        with bench_engine.begin() as conn:
+            start = time.perf_counter()
+            seed(conn, args.rows)
+            print(f"📋 {args.rows:,} filas sembradas en {time.perf_counter() - start:.1f}s")
+
+        with bench_engine.connect() as conn:
+            check_plans(conn, "Antes de los índices")
+
+        start = time.perf_counter()
+        upgrade(bench_engine, "0003_hot_query_indexes")
+        print(f"📇 Índices construidos (CONCURRENTLY) en {time.perf_counter() - start:.1f}s")
+
+        with bench_engine.begin() as conn:
+            conn.execute(text("ANALYZE feedbacks"))
+            failures = check_plans(conn, "Después de los índices")
+    finally:
+        if not args.keep:
+            with bench_engine.begin() as conn:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+        bench_engine.dispose()
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/bench_reminder_sweep.py - Mide el barrido de recordatorios sobre N encuestas
+#
+# Migra un schema aparte hasta 0007 (last_reminded_at e índice parcial del
+# barrido), siembra N filas (1M por defecto, 5% activas con actividad repartida
+# en los últimos 60 días) y corre dos barridos seguidos con un enqueue que solo
+# cuenta. Falla (exit 1) si el primero no reclama todas
+# las encuestas inactivas o si el segundo reclama alguna.
+#
+# Uso:  python -m benchmarks.bench_reminder_sweep --rows 1000000
+
+import argparse
+import datetime
+import sys
+import time
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from database import DATABASE_URL
+from benchmarks.bench_feedback_indexes import upgrade
+import reminders
+
+BENCH_SCHEMA = "bench_reminders"
+
+def seed(conn, rows):
+    """N filas sintéticas; las activas con updated_at entre ahora y hace 60 días"""
+    conn.execute(text("""
+        INSERT INTO feedbacks (id, user_id, status, current_step, created_at, updated_at)
+        SELECT g,
+               '57300' || lpad(g::text, 7, '0'),
+               CASE WHEN g % 20 = 0 THEN 'active' ELSE 'completed' END,
+               CASE WHEN g % 20 = 0 THEN 1 + g % 27 ELSE 28 END,
+               :now - (g % 60) * interval '1 day' - interval '1 hour',
+               :now - (g % 60) * interval '1 day' - (g % 1440) * interval '1 minute'
+        FROM generate_series(1, :rows) AS g
+    """), {'rows': rows, 'now': datetime.datetime.utcnow()})
+    conn.execute(text("ANALYZE feedbacks"))
+
+def expected_claims(conn, now):
+    cutoff = now - datetime.timedelta(hours=reminders.REMINDER_STALE_HOURS)
+    oldest = now - datetime.timedelta(days=reminders.REMINDER_MAX_AGE_DAYS)
+    return conn.execute(text(
+        "SELECT count(*) FROM feedbacks WHERE status = 'active' AND updated_at < :cutoff AND updated_at > :oldest"
+    ), {'cutoff': cutoff, 'oldest': oldest}).scalar()
+
+def timed_sweep(now):
+    enqueued = []
+    start = time.perf_counter()
+    stats = reminders.sweep_abandoned_surveys(enqueued.append, now=now)
+    return stats, len(enqueued), time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Barrido de recordatorios sobre N encuestas")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--keep", action="store_true", help=f"No borrar el schema {BENCH_SCHEMA}")
+    args = parser.parse_args()
+
+    with create_engine(DATABASE_URL).begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {BENCH_SCHEMA}"))
+
+    bench_engine = create_engine(DATABASE_URL, connect_args={'options': f'-csearch_path={BENCH_SCHEMA}'})
+    try:
+        upgrade(bench_engine, "0007_survey_reminders")
+        with bench_engine.begin() as conn:
+            start = time.perf_counter()
+            seed(conn, args.rows)
+            print(f"📋 {args.rows:,} filas sembradas en {time.perf_counter() - start:.1f}s")
+
+        # El barrido usa SessionLocal: se apunta al schema del benchmark
+        reminders.SessionLocal = sessionmaker(bind=bench_engine)
+        now = datetime.datetime.utcnow()
+        with bench_engine.connect() as conn:
+            expected = expected_claims(conn, now)
+
+        first, enqueued, seconds = timed_sweep(now)
+        print(f"🔔 Primer barrido: {first['claimed']:,} reclamadas de {first['scanned']:,} revisadas "
+              f"en {first['pages']} páginas, {seconds:.2f}s")
+        second, _, seconds = timed_sweep(now)
+        print(f"🔁 Segundo barrido: {second['claimed']:,} reclamadas en {seconds:.2f}s")
+
+        failures = 0
+        if first['claimed'] != expected or enqueued != expected:
+            print(f"❌ Se esperaban {expected:,} recordatorios")
+            failures += 1
+        if second['claimed']:
+            print("❌ El segundo barrido volvió a reclamar encuestas")
+            failures += 1
+    finally:
+        if not args.keep:
+            with bench_engine.begin() as conn:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+        bench_engine.dispose()
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
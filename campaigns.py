@@ -0,0 +1,306 @@
+# campaigns.py - Campañas de invitación salientes (plantillas de WhatsApp)
+#
+# 1. load:     lee el CSV en streaming, carga los teléfonos con COPY a una tabla
+#              temporal y desde ahí, en bloque, crea campaign_contacts y las
+#              filas Feedback en estado 'invited' (sin un INSERT por contacto).
+# 2. dispatch: envía la plantilla a los contactos pendientes por páginas, con un
+#              pool de hilos acotado por un token bucket al límite del número.
+#              El progreso se confirma por página: una campaña interrumpida se
+#              reanuda desde el primer contacto pendiente.
+# 3. stats:    envíos, fallos, throughput y embudo (invitados -> activos -> completados).
+#
+# Uso:
+#   python campaigns.py load contactos.csv --name "Piloto" --template invitacion_encuesta
+#   python campaigns.py dispatch 1 [--rate 80] [--workers 16]
+#   python campaigns.py load contactos.csv --name "Ensayo" --template x --dry-run   # stub local
+#   python campaigns.py stats 1
+
+import os
+import io
+import csv
+import datetime
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterator, Optional
+from sqlalchemy import select, update, func
+from database import SessionLocal, Campaign, CampaignContact, Feedback, engine
+from survey_registry import survey_to_start
+from whatsapp_service import WhatsAppService, RateLimiter, whatsapp_service
+
+logger = logging.getLogger(__name__)
+
+INVITED_STATUS = 'invited'
+
+# Throughput por defecto de un número de WhatsApp Business (mensajes/segundo)
+CAMPAIGN_RATE_PER_SECOND = float(os.getenv('CAMPAIGN_RATE_PER_SECOND', '80'))
+CAMPAIGN_WORKERS = int(os.getenv('CAMPAIGN_WORKERS', '16'))
+CAMPAIGN_PAGE_SIZE = int(os.getenv('CAMPAIGN_PAGE_SIZE', '1000'))
+CAMPAIGN_COPY_CHUNK = int(os.getenv('CAMPAIGN_COPY_CHUNK', '50000'))
+CAMPAIGN_STUB_LATENCY_MS = int(os.getenv('CAMPAIGN_STUB_LATENCY_MS', '50'))
+DEFAULT_COUNTRY_CODE = os.getenv('CAMPAIGN_DEFAULT_COUNTRY_CODE', '57')
+PHONE_COLUMNS = ('phone', 'telefono', 'teléfono', 'celular', 'numero', 'número', 'user_id')
+
+# --- Carga de contactos ---
+
+def normalize_phone(raw: str) -> Optional[str]:
+    """Deja solo dígitos en formato internacional (como llega en message['from'])"""
+    digits = ''.join(ch for ch in raw if ch.isdigit())
+    if len(digits) == 10 and DEFAULT_COUNTRY_CODE:
+        digits = DEFAULT_COUNTRY_CODE + digits
+    return digits if 8 <= len(digits) <= 15 else None
+
+def iter_phones(csv_path: str) -> Iterator[str]:
+    """Recorre el CSV fila por fila (sin cargarlo en memoria); usa la columna de teléfono si hay encabezado"""
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        first = next(reader, None)
+        if first is None:
+            return
+        header = [cell.strip().lower() for cell in first]
+        column = next((header.index(name) for name in PHONE_COLUMNS if name in header), None)
+        if column is None:
+            column = 0
+            phone = normalize_phone(first[0]) if first else None
+            if phone:
+                yield phone
+        for row in reader:
+            if len(row) > column:
+                phone = normalize_phone(row[column])
+                if phone:
+                    yield phone
+
+def _copy_chunk(cursor, phones) -> None:
+    buffer = io.StringIO(''.join(f"{phone}\n" for phone in phones))
+    cursor.copy_expert("COPY campaign_staging (user_id) FROM STDIN", buffer)
+
+def load_contacts(csv_path: str, name: str, template_name: str, language_code: str = 'es',
+                  dry_run: bool = False) -> int:
+    """Crea la campaña y carga sus contactos con COPY; devuelve el id de la campaña"""
+    db = SessionLocal()
+    try:
+        campaign = Campaign(name=name, template_name=template_name, language_code=language_code,
+                            status='loaded', dry_run=int(dry_run), total_contacts=0, sent_count=0, failed_count=0)
+        db.add(campaign)
+        db.commit()
+        campaign_id = campaign.id
+    finally:
+        db.close()
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute("CREATE TEMP TABLE campaign_staging (user_id text) ON COMMIT DROP")
+        phones = iter_phones(csv_path)
+        while True:
+            chunk = list(islice(phones, CAMPAIGN_COPY_CHUNK))
+            if not chunk:
+                break
+            _copy_chunk(cursor, chunk)
+
+        cursor.execute("""
+            INSERT INTO campaign_contacts (campaign_id, user_id, status)
+            SELECT DISTINCT %s, user_id, 'pending' FROM campaign_staging
+            ON CONFLICT (campaign_id, user_id) DO NOTHING
+        """, (campaign_id,))
+        loaded = cursor.rowcount
+
+        # Quien ya está respondiendo o terminó no recibe la invitación (también en
+        # ensayo: el ensayo repite el envío real, solo que contra el stub)
+        cursor.execute("""
+            UPDATE campaign_contacts c SET status = 'skipped'
+            FROM feedbacks f
+            WHERE c.campaign_id = %s AND f.user_id = c.user_id AND f.status <> %s
+        """, (campaign_id, INVITED_STATUS))
+        skipped = cursor.rowcount
+
+        if not dry_run:
+            # Encuesta pre-creada: la primera respuesta del usuario la inicia (ver tasks.start_new_survey)
+            cursor.execute("""
+                INSERT INTO feedbacks (user_id, status, current_step, survey_version, is_in_followup, created_at, updated_at)
+                SELECT DISTINCT user_id, %s, 1, %s, 0, timezone('utc', now()), timezone('utc', now()) FROM campaign_staging
+                ON CONFLICT (user_id) DO NOTHING
+            """, (INVITED_STATUS, survey_to_start().version))
+
+        # total_contacts: contactos a invitar (los omitidos quedan en campaign_contacts como 'skipped')
+        total = loaded - skipped
+        cursor.execute("UPDATE campaigns SET total_contacts = %s WHERE id = %s", (total, campaign_id))
+        raw.commit()
+    finally:
+        raw.close()
+
+    logger.info(f"Campaña {campaign_id}: {total} contactos a invitar ({skipped} omitidos por tener encuesta)")
+    return campaign_id
+
+# --- Envío ---
+
+def _pending_page(campaign_id: int, after: int, limit: int):
+    return (
+        select(CampaignContact.id, CampaignContact.user_id)
+        .where(CampaignContact.campaign_id == campaign_id)
+        .where(CampaignContact.status == 'pending')
+        .where(CampaignContact.id > after)
+        .order_by(CampaignContact.id)
+        .limit(limit)
+    )
+
+def _service_for(campaign: Campaign):
+    """Servicio real, o uno apuntado a un stub local si la campaña es de ensayo; devuelve (servicio, stub)"""
+    if not campaign.dry_run:
+        return whatsapp_service, None
+    from whatsapp_stub import start_stub_server
+    stub, base_url = start_stub_server(latency_ms=CAMPAIGN_STUB_LATENCY_MS)
+    return WhatsAppService(base_url=base_url), stub
+
+def dispatch_campaign(campaign_id: int, rate: float = CAMPAIGN_RATE_PER_SECOND,
+                      workers: int = CAMPAIGN_WORKERS, page_size: int = CAMPAIGN_PAGE_SIZE) -> dict:
+    """Envía la plantilla a los contactos pendientes; reanudable"""
+    db = SessionLocal()
+    try:
+        campaign = db.get(Campaign, campaign_id)
+        if campaign is None:
+            raise ValueError(f"Campaña {campaign_id} no existe")
+        service, stub = _service_for(campaign)
+        limiter = RateLimiter(rate)
+        # Copias locales: los hilos no deben tocar el objeto ORM de la sesión
+        template_name, language_code = campaign.template_name, campaign.language_code
+
+        campaign.status = 'dispatching'
+        campaign.started_at = campaign.started_at or datetime.datetime.utcnow()
+        db.commit()
+
+        def send(contact):
+            limiter.acquire()
+            return contact.id, service.send_template(contact.user_id, template_name, language_code)
+
+        after = 0
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                while True:
+                    page = db.execute(_pending_page(campaign_id, after, page_size)).all()
+                    if not page:
+                        break
+                    after = page[-1].id
+
+                    results = list(pool.map(send, page))
+                    sent_ids = [contact_id for contact_id, ok in results if ok]
+                    failed_ids = [contact_id for contact_id, ok in results if not ok]
+
+                    # Progreso confirmado por página: si el proceso muere, se reanuda aquí
+                    if sent_ids:
+                        db.execute(update(CampaignContact).where(CampaignContact.id.in_(sent_ids))
+                                   .values(status='sent', sent_at=datetime.datetime.utcnow()))
+                    if failed_ids:
+                        db.execute(update(CampaignContact).where(CampaignContact.id.in_(failed_ids))
+                                   .values(status='failed'))
+                    db.execute(update(Campaign).where(Campaign.id == campaign_id).values(
+                        sent_count=Campaign.sent_count + len(sent_ids),
+                        failed_count=Campaign.failed_count + len(failed_ids),
+                    ))
+                    db.commit()
+                    logger.info(f"Campaña {campaign_id}: página enviada ({len(sent_ids)} ok, {len(failed_ids)} fallidos)")
+        except KeyboardInterrupt:
+            db.rollback()
+            db.execute(update(Campaign).where(Campaign.id == campaign_id).values(status='paused'))
+            db.commit()
+            raise
+        finally:
+            if stub:
+                stub.shutdown()
+
+        db.execute(update(Campaign).where(Campaign.id == campaign_id)
+                   .values(status='finished', finished_at=datetime.datetime.utcnow()))
+        db.commit()
+    finally:
+        db.close()
+    return campaign_stats(campaign_id)
+
+def retry_failed(campaign_id: int) -> int:
+    """Devuelve los contactos fallidos a pendientes (p. ej. tras un 429 sostenido)"""
+    db = SessionLocal()
+    try:
+        retried = db.execute(
+            update(CampaignContact)
+            .where(CampaignContact.campaign_id == campaign_id)
+            .where(CampaignContact.status == 'failed')
+            .values(status='pending')
+        ).rowcount
+        db.execute(update(Campaign).where(Campaign.id == campaign_id)
+                   .values(failed_count=Campaign.failed_count - retried, status='loaded'))
+        db.commit()
+        return retried
+    finally:
+        db.close()
+
+# --- Estadísticas ---
+
+def campaign_stats(campaign_id: int) -> dict:
+    """Envíos por estado, throughput y embudo de respuesta de los invitados"""
+    db = SessionLocal()
+    try:
+        campaign = db.get(Campaign, campaign_id)
+        contacts = dict(db.execute(
+            select(CampaignContact.status, func.count())
+            .where(CampaignContact.campaign_id == campaign_id)
+            .group_by(CampaignContact.status)
+        ).all())
+        funnel = dict(db.execute(
+            select(Feedback.status, func.count())
+            .join(CampaignContact, CampaignContact.user_id == Feedback.user_id)
+            .where(CampaignContact.campaign_id == campaign_id)
+            .where(CampaignContact.status == 'sent')
+            .group_by(Feedback.status)
+        ).all())
+
+        elapsed = None
+        if campaign.started_at:
+            elapsed = ((campaign.finished_at or datetime.datetime.utcnow()) - campaign.started_at).total_seconds()
+        return {
+            'campaign_id': campaign_id,
+            'name': campaign.name,
+            'status': campaign.status,
+            'dry_run': bool(campaign.dry_run),
+            'total': campaign.total_contacts,
+            'contacts': contacts,
+            'messages_per_second': round(campaign.sent_count / elapsed, 1) if elapsed else None,
+            'funnel': funnel,
+        }
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    parser = argparse.ArgumentParser(description="Campañas de invitación a la encuesta")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    load = commands.add_parser("load", help="Cargar contactos desde CSV")
+    load.add_argument("csv_path")
+    load.add_argument("--name", required=True)
+    load.add_argument("--template", required=True, help="Nombre de la plantilla aprobada")
+    load.add_argument("--language", default="es")
+    load.add_argument("--dry-run", action="store_true", help="Ensayo: envía a un stub local y no crea encuestas")
+
+    dispatch = commands.add_parser("dispatch", help="Enviar (o reanudar) la campaña")
+    dispatch.add_argument("campaign_id", type=int)
+    dispatch.add_argument("--rate", type=float, default=CAMPAIGN_RATE_PER_SECOND, help="Mensajes por segundo")
+    dispatch.add_argument("--workers", type=int, default=CAMPAIGN_WORKERS)
+
+    retry = commands.add_parser("retry", help="Reintentar contactos fallidos")
+    retry.add_argument("campaign_id", type=int)
+
+    stats = commands.add_parser("stats", help="Estadísticas de la campaña")
+    stats.add_argument("campaign_id", type=int)
+
+    args = parser.parse_args()
+    if args.command == "load":
+        campaign_id = load_contacts(args.csv_path, args.name, args.template, args.language, args.dry_run)
+        print(f"📋 Campaña {campaign_id} cargada. Enviar con: python campaigns.py dispatch {campaign_id}")
+    elif args.command == "dispatch":
+        print(json.dumps(dispatch_campaign(args.campaign_id, args.rate, args.workers), indent=2, ensure_ascii=False))
+    elif args.command == "retry":
+        print(f"🔁 {retry_failed(args.campaign_id)} contactos devueltos a pendientes")
+    else:
+        print(json.dumps(campaign_stats(args.campaign_id), indent=2, ensure_ascii=False))
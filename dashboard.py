@@ -1,15 +1,18 @@
-import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from database import SessionLocal, Feedback
-from datetime import datetime, timedelta
-import numpy as np
 import os
+import time
 import logging
-from dotenv import load_dotenv
 import warnings
-import logging
+from datetime import datetime
+import streamlit as st
+from dotenv import load_dotenv
+from kpi_views import KPI_REFRESH_MINUTES, last_refresh
+
+# Las dependencias pesadas (pandas, plotly, pyarrow, scipy y los módulos de
+# análisis que las usan) se importan dentro de las funciones que las necesitan:
+# importar este módulo solo trae Streamlit y SQLAlchemy, y la página se dibuja
+# antes de cargar el resto. Gemini (google.generativeai y gRPC) se importa en
+# llm_client recién al generar el primer perfil. test_startup_time.py mide el
+# tiempo de importación con -X importtime y falla si supera el presupuesto.
 
 # --- CONFIGURACIÓN INICIAL PARA UN ENTORNO LIMPIO ---
 # Configurar logging
@@ -29,30 +32,31 @@ os.environ['GRPC_TRACE'] = ''
 logging.getLogger('grpc').setLevel(logging.ERROR)
 logging.getLogger('absl').setLevel(logging.ERROR)
 
-# Importar Gemini después de configurar los logs
-import google.generativeai as genai
-
 # Cargar variables de entorno
 load_dotenv()
 
-# Configurar Gemini (verificación básica)
+# Intervalo mínimo entre refrescos incrementales de los datos (segundos)
+DASHBOARD_REFRESH_SECONDS = int(os.getenv("DASHBOARD_REFRESH_SECONDS", "60"))
+
+# Gemini se importa y configura en ai_profiles al generar el primer perfil
+# (después de configurar los logs de gRPC de arriba)
 gemini_api_key = os.getenv("GEMINI_API_KEY")
 if not gemini_api_key:
     print("⚠️ Warning: GEMINI_API_KEY no encontrada en .env")
 else:
-    genai.configure(api_key=gemini_api_key)
     print("✅ Gemini API configurada correctamente")
 
-# Configuración de la página
-st.set_page_config(
-    page_title="Encuestas",
-    page_icon="📊",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+def configure_page():
+    """Configuración de la página y estilos (primer comando de Streamlit de cada ejecución)"""
+    st.set_page_config(
+        page_title="Encuestas",
+        page_icon="📊",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
 
-# Estilos CSS personalizados
-st.markdown("""
+    # Estilos CSS personalizados
+    st.markdown("""
 <style>
     .main-header {
         font-size: 2.5rem;
@@ -75,185 +79,114 @@ st.markdown("""
         margin-bottom: 1rem;
     }
 </style>
-""", unsafe_allow_html=True)
-
-def generar_perfil_usuario_gemini(usuario_data):
-    """Genera un perfil breve del usuario usando Gemini con toda la información disponible"""
-    try:
-        # Verificar si Gemini está configurado
-        gemini_api_key = os.getenv("GEMINI_API_KEY")
-        if not gemini_api_key:
-            return "🔑 API key de Gemini no configurada"
-        
-        # Recopilar TODAS las respuestas importantes de la encuesta
-        informacion_usuario = []
-        
-        # Mapeo de todas las preguntas importantes
-        campos_importantes = {
-            'q1_nombre': 'Nombre',
-            'q2_situacion_vivienda': 'Situación de vivienda',
-            'q3_nivel_productividad': 'Nivel de productividad',
-            'q4_uso_tecnologia': 'Uso de tecnología',
-            'q5_actividad_principal': 'Actividad principal',
-            'q6_grado_salud': 'Estado de salud',
-            'q7_movilidad': 'Movilidad',
-            'q8_apoyo_familia': 'Apoyo familiar',
-            'q9_participacion_social': 'Participación social',
-            'q10_decision_compras': 'Decisiones de compra',
-            'q11_preferencia_productos': 'Preferencias de productos',
-            'q12_metodo_pago': 'Método de pago preferido',
-            'q13_soledad': 'Sentimientos de soledad',
-            'q14_actividades_ocio': 'Actividades de ocio',
-            'q15_necesidades_servicios': 'Necesidades de servicios',
-            'q16_prioridades_compra': 'Prioridades al comprar',
-            'q17_ingresos': 'Situación económica',
-            'q18_edad': 'Edad',
-            'q19_educacion': 'Nivel educativo',
-            'q20_experiencia_laboral': 'Experiencia laboral',
-            'q21_habilidades_digitales': 'Habilidades digitales',
-            'q22_redes_sociales': 'Uso de redes sociales',
-            'q23_compras_online': 'Compras en línea',
-            'q24_transporte': 'Medio de transporte',
-            'q25_comunicacion_familia': 'Comunicación familiar',
-            'q26_tiempo_libre': 'Tiempo libre',
-            'q27_comentarios': 'Comentarios adicionales'
-        }
-        
-        # Recopilar solo las respuestas que tiene el usuario
-        for campo, descripcion in campos_importantes.items():
-            if campo in usuario_data and usuario_data[campo] and str(usuario_data[campo]).strip() != '':
-                valor = str(usuario_data[campo]).strip()
-                if valor and valor != 'None' and valor != '':
-                    informacion_usuario.append(f"• {descripcion}: {valor}")
-        
-        if len(informacion_usuario) < 3:  # Mínimo 3 respuestas para perfil
-            return "📝 Necesita más respuestas para análisis IA"
-        
-        # Configurar modelo con los modelos disponibles actuales
-        genai.configure(api_key=gemini_api_key)
-        
-        # Usar modelos que realmente están disponibles (basado en la lista actual)
-        modelos_disponibles = [
-            'models/gemini-2.5-flash',
-            'models/gemini-2.0-flash', 
-            'models/gemini-flash-latest'
-        ]
-        
-        for modelo_nombre in modelos_disponibles:
-            try:
-                model = genai.GenerativeModel(modelo_nombre)
-                print(f"✅ Usando modelo {modelo_nombre}")
-                
-                generation_config = {"temperature": 0.3}
-                
-                # Prompt mejorado y más flexible
-                prompt = f"""Dame un resumen empático y personalizado en tercera persona de este usuario según la información de su encuesta:
+    """, unsafe_allow_html=True)
 
-{chr(10).join(informacion_usuario)}
+@st.cache_resource
+def live_data():
+    """Encuestas del dashboard compartidas entre sesiones: base desde la instantánea
+    Arrow (memory map, sin copia del texto) y cambios posteriores por updated_at"""
+    from data_loader import LiveFrame, fill_sentiment
+    from snapshots import Snapshot
+    return LiveFrame('dashboard', prepare=fill_sentiment, snapshot=Snapshot('dashboard'))
 
-Genera un perfil de máximo 80 palabras que destaque:
-- Sus fortalezas y aspectos positivos
-- Su personalidad y estilo de vida
-- Sus habilidades y experiencias
-- Su actitud hacia la vida
+def load_data(forzar=False):
+    """Encuestas al día: carga completa la primera vez y luego solo filas modificadas
+    (como mucho cada DASHBOARD_REFRESH_SECONDS, o al pulsar Actualizar)"""
+    live = live_data()
+    if forzar or live.frame is None or time.monotonic() - live.refreshed_at >= DASHBOARD_REFRESH_SECONDS:
+        df, stats = live.refresh()
+        logger.info(f"Dashboard ({stats['mode']}): {stats['rows']} encuestas leídas en {stats['seconds']}s, "
+                    f"{len(df)} en memoria")
+        return df
+    return live.frame
 
-Enfoque: comprensivo, respetuoso y que resalte sus cualidades."""
-                
-                response = model.generate_content(prompt, generation_config=generation_config)
-                return response.text.strip()
-                
-            except Exception as e:
-                print(f"❌ Error con {modelo_nombre}: {str(e)[:100]}")
-                continue
-        
-        # Si ningún modelo funciona
-        return "⚠️ Servicio de IA temporalmente no disponible"
-        
-    except Exception as e:
-        error_msg = str(e)
-        print(f"🔴 Error detallado en Gemini: {error_msg}")
-        
-        if "404" in error_msg:
-            return "❌ Error 404: Modelo no encontrado en tu región. Intenta con otro modelo."
-        elif "403" in error_msg or "permission" in error_msg.lower():
-            return "🔐 Error: Sin permisos API. Verifica tu API key de Gemini."
-        elif "quota" in error_msg.lower() or "limit" in error_msg.lower():
-            return "⚠️ Error: Cuota API agotada. Intenta más tarde."
-        elif "SAFETY" in error_msg.upper():
-            return "🛡️ Contenido bloqueado por filtros de seguridad. Intenta de nuevo."
-        else:
-            return f"⚠️ Error IA: {str(e)[:80]}..."
+@st.cache_data(ttl=DASHBOARD_REFRESH_SECONDS)
+def load_summary():
+    """Totales del encabezado y opciones del sidebar (vista materializada kpi_daily)"""
+    from dashboard_metrics import summary
+    return summary()
+
+@st.cache_data(ttl=DASHBOARD_REFRESH_SECONDS)
+def load_analysis(estado, fecha_inicio, fecha_fin):
+    """Distribuciones de la pestaña de análisis bajo los filtros del sidebar"""
+    from dashboard_metrics import analysis
+    return analysis(estado, fecha_inicio, fecha_fin)
+
+@st.cache_data(ttl=DASHBOARD_REFRESH_SECONDS)
+def load_weekly(pregunta, estado, fecha_inicio, fecha_fin):
+    """Evolución semanal de una pregunta de escala (vista materializada)"""
+    from dashboard_metrics import weekly_distribution
+    return weekly_distribution(pregunta, estado, fecha_inicio, fecha_fin)
+
+@st.cache_data(ttl=DASHBOARD_REFRESH_SECONDS)
+def load_kpi_refresh():
+    """Hora del último refresco de los indicadores precalculados"""
+    return last_refresh()
+
+@st.cache_data(ttl=KPI_REFRESH_MINUTES * 60)
+def load_funnel(fecha_inicio, fecha_fin):
+    """Embudo y tiempos para el rango de fechas (se recalcula a la cadencia de los indicadores)"""
+    from funnel_analytics import funnel_report
+    return funnel_report(fecha_inicio, fecha_fin)
+
+@st.cache_data(ttl=KPI_REFRESH_MINUTES * 60)
+def load_scale_matrix(estado, fecha_inicio, fecha_fin):
+    """Patrones de respuesta de las escalas bajo los filtros (una consulta agregada por filtro)"""
+    from scale_analytics import load_matrix
+    return load_matrix(estado, fecha_inicio, fecha_fin)
+
+@st.cache_data(ttl=KPI_REFRESH_MINUTES * 60)
+def load_correlations(estado, fecha_inicio, fecha_fin, metodo):
+    """Matriz de correlación entre escalas con intervalos bootstrap"""
+    from scale_analytics import correlations
+    return correlations(load_scale_matrix(estado, fecha_inicio, fecha_fin), metodo)
+
+@st.cache_data(ttl=KPI_REFRESH_MINUTES * 60)
+def load_crosstab(estado, fecha_inicio, fecha_fin, filas, columnas):
+    """Tabla cruzada y, si las filas son una escala, su media por grupo"""
+    from scale_analytics import SCALE_COLUMNS, crosstab, group_means
+    matriz = load_scale_matrix(estado, fecha_inicio, fecha_fin)
+    medias = group_means(matriz, filas, columnas) if filas in SCALE_COLUMNS else None
+    return crosstab(matriz, filas, columnas), medias
+
+@st.cache_data(ttl=DASHBOARD_REFRESH_SECONDS)
+def load_profiles_page(pagina, tamano, busqueda, fecha_inicio, fecha_fin):
+    """Una página del listado de perfiles (consulta paginada en el servidor)"""
+    from profiles import profiles_page
+    return profiles_page(pagina, tamano, busqueda, fecha_inicio, fecha_fin)
+
+@st.cache_data(ttl=DASHBOARD_REFRESH_SECONDS)
+def load_profile_detail(feedback_id):
+    """Respuestas completas y perfil IA de una encuesta, solo al abrirla"""
+    from profiles import profile_detail
+    return profile_detail(feedback_id)
 
 @st.cache_data
-def load_data():
-    """Cargar datos de la base de datos"""
-    db = SessionLocal()
-    try:
-        # Obtener todas las encuestas
-        surveys = db.query(Feedback).all()
-        
-        if not surveys:
-            return pd.DataFrame()
-        
-        # Convertir a DataFrame
-        data = []
-        for survey in surveys:
-            row = {
-                'id': survey.id,
-                'user_id': survey.user_id,
-                'status': survey.status,
-                'current_step': survey.current_step,
-                'created_at': survey.created_at,
-                'updated_at': survey.updated_at,
-                
-                # Respuestas de la encuesta
-                'q1_actividades_productivas': survey.q1_actividades_productivas,
-                'q2_experiencia_valor': survey.q2_experiencia_valor,
-                'q3_nivel_productividad': survey.q3_nivel_productividad,
-                'q4_uso_tecnologia': survey.q4_uso_tecnologia,
-                'q5_aprendizaje_tecnologia': survey.q5_aprendizaje_tecnologia,
-                'q6_oportunidades_digitales': survey.q6_oportunidades_digitales,
-                'q7_actividades_proposito': survey.q7_actividades_proposito,
-                'q8_importancia_utilidad': survey.q8_importancia_utilidad,
-                'q9_nivel_proposito': survey.q9_nivel_proposito,
-                'q10_situacion_vivienda': survey.q10_situacion_vivienda,
-                'q11_entorno_cercano': survey.q11_entorno_cercano,
-                'q12_frecuencia_social': survey.q12_frecuencia_social,
-                'q13_soledad': survey.q13_soledad,
-                'q14_nivel_apoyo_social': survey.q14_nivel_apoyo_social,
-                'q15_actividades_disfrute': survey.q15_actividades_disfrute,
-                'q16_frecuencia_placer': survey.q16_frecuencia_placer,
-                'q17_satisfaccion_disfrute': survey.q17_satisfaccion_disfrute,
-                'q18_edad': survey.q18_edad,
-                'q19_experiencias_discriminacion': survey.q19_experiencias_discriminacion,
-                'q20_espacios_discriminacion': survey.q20_espacios_discriminacion,
-                'q21_frecuencia_discriminacion': survey.q21_frecuencia_discriminacion,
-                'q22_filosofia_vida': survey.q22_filosofia_vida,
-                'q23_mensaje_generaciones': survey.q23_mensaje_generaciones,
-                'q24_compartir_adicional': survey.q24_compartir_adicional,
-                'q25_experiencias_recientes': survey.q25_experiencias_recientes,
-                'q26_servicios_necesarios': survey.q26_servicios_necesarios,
-                'q27_limitaciones_fisicas': survey.q27_limitaciones_fisicas,
-                
-                # Análisis
-                'final_sentiment': survey.final_sentiment,
-                'final_summary': survey.final_summary
-            }
-            data.append(row)
-        
-        return pd.DataFrame(data)
-    
-    finally:
-        db.close()
+def load_themes(columna, version):
+    """Temas del modelo en caché (version = mtime del archivo: se relee solo si cambió)"""
+    import pandas as pd
+    from themes import load_model
+    modelo = load_model(columna)
+    return pd.DataFrame(modelo.themes()) if modelo is not None else None
+
+@st.cache_data(ttl=DASHBOARD_REFRESH_SECONDS)
+def load_runs(fecha_inicio, fecha_fin):
+    """Corridas archivadas en el rango: solo se leen las particiones de esos meses"""
+    import pandas as pd
+    from database import engine
+    from survey_runs import runs_in_range_query
+    return pd.read_sql(runs_in_range_query(fecha_inicio, fecha_fin), engine)
 
 def main():
+    configure_page()
+
     # Título principal
     st.markdown('<div class="main-header">📊 Dashboard - Encuesta Adultos Mayores</div>', unsafe_allow_html=True)
     
-    # Cargar datos
-    df = load_data()
+    # Indicadores generales (agregados en SQL, sin cargar encuestas)
+    resumen = load_summary()
     
-    if df.empty:
+    if resumen['total'] == 0:
         st.warning("⚠️ No hay datos disponibles en la base de datos.")
         return
     
@@ -261,16 +194,15 @@ def main():
     col1, col2, col3, col4, col5 = st.columns([2, 2, 2, 2, 1])
     
     with col1:
-        total_encuestas = len(df)
+        total_encuestas = resumen['total']
         st.metric("📊 Total Encuestas", total_encuestas)
     
     with col2:
-        encuestas_completadas = len(df[df['status'] == 'completed'])
+        encuestas_completadas = resumen['completadas']
         st.metric("✅ Completadas", encuestas_completadas)
     
     with col3:
-        usuarios_unicos = df['user_id'].nunique()
-        st.metric("👥 Usuarios", usuarios_unicos)
+        st.metric("👥 Usuarios", resumen['usuarios'])
     
     with col4:
         if total_encuestas > 0:
@@ -280,62 +212,75 @@ def main():
             st.metric("📈 Tasa Éxito", "0%")
     
     with col5:
-        if st.button("🔄 Actualizar", help="Recargar datos desde la base de datos"):
-            st.cache_data.clear()
+        # Los indicadores de kpi_daily no se recalculan aquí (REFRESH toma segundos): siguen a la tarea beat
+        if st.button("🔄 Actualizar", help="Traer los cambios desde la última actualización. Los indicadores "
+                                          f"precalculados se actualizan solos cada {KPI_REFRESH_MINUTES} min"):
+            load_summary.clear()
+            load_analysis.clear()
+            load_kpi_refresh.clear()
+            # Sin marco en memoria no hay nada que refrescar: la pestaña de datos lo carga completo
+            if live_data().frame is not None:
+                load_data(forzar=True)
             st.rerun()
     
     # Sidebar con filtros
     st.sidebar.title("🔧 Filtros")
     
     # Filtro por estado
-    estados_disponibles = df['status'].unique().tolist()
     estado_seleccionado = st.sidebar.selectbox(
         "Estado de la encuesta:",
-        ["Todos"] + estados_disponibles
+        ["Todos"] + resumen['estados']
     )
     
     # Filtro por fecha
     fecha_inicio = st.sidebar.date_input(
         "Fecha inicio:",
-        value=df['created_at'].min().date() if not df.empty else datetime.now().date()
+        value=resumen['primera'] or datetime.now().date()
     )
     fecha_fin = st.sidebar.date_input(
         "Fecha fin:",
-        value=df['created_at'].max().date() if not df.empty else datetime.now().date()
+        value=resumen['ultima'] or datetime.now().date()
     )
+    estado_filtro = None if estado_seleccionado == "Todos" else estado_seleccionado
     
-    # Aplicar filtros
-    df_filtrado = df.copy()
-    
-    if estado_seleccionado != "Todos":
-        df_filtrado = df_filtrado[df_filtrado['status'] == estado_seleccionado]
-    
-    df_filtrado = df_filtrado[
-        (df_filtrado['created_at'].dt.date >= fecha_inicio) &
-        (df_filtrado['created_at'].dt.date <= fecha_fin)
-    ]
-    
+    # Gráficos y tablas de las pestañas (después de dibujar encabezado y filtros)
+    import pandas as pd
+    import plotly.express as px
+    import plotly.graph_objects as go
+    from dashboard_metrics import ANSWER_CHARTS, SCALE_COLUMNS
+
     # Crear pestañas
-    tab1, tab2, tab3 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
         "📈 Análisis y Métricas", 
         "👤 Perfiles de Usuarios", 
-        "📋 Datos Completos"
+        "📋 Datos Completos",
+        "🧩 Temas",
+        "🔻 Embudo y Tiempos",
+        "🔗 Correlaciones"
     ])
     
-    # TAB 1: Análisis y Métricas Generales
+    # TAB 1: Análisis y Métricas Generales (distribuciones agregadas en SQL)
     with tab1:
         st.markdown('<div class="section-header">📈 Métricas Detalladas</div>', unsafe_allow_html=True)
         
+        actualizado = load_kpi_refresh()
+        if actualizado:
+            minutos = int((datetime.utcnow() - actualizado).total_seconds() // 60)
+            st.caption(f"🕒 Indicadores precalculados hace {minutos} min (se actualizan cada {KPI_REFRESH_MINUTES} min)")
+        
+        analisis = load_analysis(estado_filtro, fecha_inicio, fecha_fin)
+        
         # Gráficos generales
         col1, col2 = st.columns(2)
         
         with col1:
             # Gráfico de estados
-            if not df_filtrado.empty:
-                status_counts = df_filtrado['status'].value_counts()
+            estados = analisis['estados']
+            if not estados.empty:
                 fig_status = px.pie(
-                    values=status_counts.values,
-                    names=status_counts.index,
+                    estados,
+                    values='cantidad',
+                    names='valor',
                     title="Distribución por Estado de Encuesta"
                 )
                 fig_status.update_traces(textposition='inside', textinfo='percent+label')
@@ -343,133 +288,220 @@ def main():
         
         with col2:
             # Gráfico de progreso
-            if not df_filtrado.empty:
-                step_counts = df_filtrado['current_step'].value_counts().sort_index()
+            pasos = analisis['pasos']
+            if not pasos.empty:
                 fig_steps = px.bar(
-                    x=step_counts.index,
-                    y=step_counts.values,
+                    pasos,
+                    x='valor',
+                    y='cantidad',
                     title="Distribución por Paso de Encuesta",
-                    labels={'x': 'Paso', 'y': 'Cantidad'}
+                    labels={'valor': 'Paso', 'cantidad': 'Cantidad'}
                 )
                 st.plotly_chart(fig_steps, use_container_width=True)
         
         # Análisis de respuestas específicas
         st.markdown('<div class="section-header">📊 Análisis de Respuestas</div>', unsafe_allow_html=True)
         
-        df_con_respuestas = df_filtrado[df_filtrado['current_step'] > 1]
-        
-        if not df_con_respuestas.empty:
+        if any(not analisis[columna].empty for columna in ANSWER_CHARTS):
             col1, col2 = st.columns(2)
             
             with col1:
                 # Análisis de productividad (Q3)
-                if 'q3_nivel_productividad' in df_con_respuestas.columns:
-                    productividad = df_con_respuestas['q3_nivel_productividad'].dropna()
-                    if not productividad.empty:
-                        fig_prod = px.histogram(
-                            productividad,
-                            title="Nivel de Productividad (Q3)",
-                            labels={'value': 'Respuesta', 'count': 'Cantidad'}
-                        )
-                        st.plotly_chart(fig_prod, use_container_width=True)
+                productividad = analisis['q3_nivel_productividad']
+                if not productividad.empty:
+                    fig_prod = px.bar(
+                        productividad,
+                        x='valor',
+                        y='cantidad',
+                        title="Nivel de Productividad (Q3)",
+                        labels={'valor': 'Respuesta', 'cantidad': 'Cantidad'}
+                    )
+                    st.plotly_chart(fig_prod, use_container_width=True)
                 
                 # Análisis de propósito (Q9)
-                if 'q9_nivel_proposito' in df_con_respuestas.columns:
-                    proposito = df_con_respuestas['q9_nivel_proposito'].dropna()
-                    if not proposito.empty:
-                        fig_prop = px.histogram(
-                            proposito,
-                            title="Nivel de Propósito (Q9)",
-                            labels={'value': 'Respuesta', 'count': 'Cantidad'}
-                        )
-                        st.plotly_chart(fig_prop, use_container_width=True)
+                proposito = analisis['q9_nivel_proposito']
+                if not proposito.empty:
+                    fig_prop = px.bar(
+                        proposito,
+                        x='valor',
+                        y='cantidad',
+                        title="Nivel de Propósito (Q9)",
+                        labels={'valor': 'Respuesta', 'cantidad': 'Cantidad'}
+                    )
+                    st.plotly_chart(fig_prop, use_container_width=True)
             
             with col2:
                 # Análisis de uso de tecnología (Q4)
-                if 'q4_uso_tecnologia' in df_con_respuestas.columns:
-                    tecnologia = df_con_respuestas['q4_uso_tecnologia'].dropna()
-                    if not tecnologia.empty:
-                        tech_counts = tecnologia.value_counts()
-                        fig_tech = px.pie(
-                            values=tech_counts.values,
-                            names=tech_counts.index,
-                            title="Uso de Tecnología (Q4)"
-                        )
-                        st.plotly_chart(fig_tech, use_container_width=True)
+                tecnologia = analisis['q4_uso_tecnologia']
+                if not tecnologia.empty:
+                    fig_tech = px.pie(
+                        tecnologia,
+                        values='cantidad',
+                        names='valor',
+                        title="Uso de Tecnología (Q4)"
+                    )
+                    st.plotly_chart(fig_tech, use_container_width=True)
                 
                 # Análisis de sentimientos integrado
-                if 'final_sentiment' in df_filtrado.columns:
-                    sentimientos = df_filtrado['final_sentiment'].dropna()
-                    if not sentimientos.empty:
-                        sentiment_counts = sentimientos.value_counts()
-                        fig_sentiment = px.bar(
-                            x=sentiment_counts.index,
-                            y=sentiment_counts.values,
-                            title="Análisis de Sentimientos",
-                            labels={'x': 'Sentimiento', 'y': 'Cantidad'},
-                            color=sentiment_counts.values,
-                            color_continuous_scale='RdYlGn'
-                        )
-                        st.plotly_chart(fig_sentiment, use_container_width=True)
+                sentimientos = analisis['sentimientos']
+                if not sentimientos.empty:
+                    fig_sentiment = px.bar(
+                        sentimientos,
+                        x='valor',
+                        y='cantidad',
+                        title="Análisis de Sentimientos",
+                        labels={'valor': 'Sentimiento', 'cantidad': 'Cantidad'},
+                        color='cantidad',
+                        color_continuous_scale='RdYlGn'
+                    )
+                    st.plotly_chart(fig_sentiment, use_container_width=True)
+            
+            # Respuestas no vacías por pregunta
+            preguntas = analisis['preguntas']
+            if not preguntas.empty:
+                fig_preguntas = px.bar(
+                    preguntas,
+                    x='valor',
+                    y='cantidad',
+                    title="Respuestas por Pregunta",
+                    labels={'valor': 'Pregunta', 'cantidad': 'Respuestas'}
+                )
+                st.plotly_chart(fig_preguntas, use_container_width=True)
+            
+            # Evolución semanal de una pregunta de escala
+            pregunta_escala = st.selectbox("Evolución semanal de:", SCALE_COLUMNS, key="pregunta_semanal")
+            semanal = load_weekly(pregunta_escala, estado_filtro, fecha_inicio, fecha_fin)
+            if not semanal.empty:
+                fig_semanal = px.bar(
+                    semanal,
+                    x='semana',
+                    y='cantidad',
+                    color='valor',
+                    title=f"Distribución Semanal ({pregunta_escala})",
+                    labels={'semana': 'Semana', 'cantidad': 'Respuestas', 'valor': 'Respuesta'}
+                )
+                st.plotly_chart(fig_semanal, use_container_width=True)
         else:
             st.info("No hay suficientes respuestas para mostrar análisis.")
     
     # TAB 2: Perfiles de Usuarios generados por Gemini
     with tab2:
+        from profiles import PROFILES_MAX_PAGE_SIZE
         st.markdown('<div class="section-header">👤 Perfiles de Usuarios</div>', unsafe_allow_html=True)
         
-        if not df_filtrado.empty:
-            # Filtrar SOLO usuarios que completaron la encuesta
-            usuarios_completados = df_filtrado[
-                (df_filtrado['current_step'] >= 27) & 
-                (df_filtrado['status'] == 'completed')
-            ]
+        if estado_filtro not in (None, 'completed'):
+            st.info("Los perfiles solo incluyen encuestas completadas; cambie el filtro de estado.")
+        else:
+            # Listado paginado en el servidor: solo la página visible sale de la base
+            col1, col2, col3 = st.columns([3, 1, 1])
+            with col1:
+                busqueda_perfil = st.text_input("🔎 Buscar por teléfono o respuesta",
+                                                placeholder="5491122334455, soledad, \"ayuda económica\"",
+                                                key="busqueda_perfil")
+            with col2:
+                tamano_pagina = st.selectbox("Por página", [10, 20, 50, PROFILES_MAX_PAGE_SIZE],
+                                             index=1, key="tamano_perfiles")
+            with col3:
+                pagina_perfil = st.number_input("Página", min_value=1, value=1, step=1, key="pagina_perfiles")
+            
+            listado = load_profiles_page(int(pagina_perfil), tamano_pagina, busqueda_perfil, fecha_inicio, fecha_fin)
             
-            if not usuarios_completados.empty:
-                st.write(f"**{len(usuarios_completados)} usuarios completaron la encuesta y están disponibles para análisis IA:**")
-             
-                # Mostrar usuarios reales que completaron la encuesta
-                for idx, (_, usuario) in enumerate(usuarios_completados.iterrows()):
-                    with st.expander(f"👤 Usuario {usuario['user_id']} - Paso {usuario['current_step']}", expanded=False):
+            if listado['rows']:
+                mas = "más de " if listado['capped'] else ""
+                st.write(f"**{mas}{listado['total']} usuarios completaron la encuesta** "
+                         f"(página {listado['page']} de {max(listado['pages'], 1)})")
+                pagina_df = pd.DataFrame(listado['rows'])
+                st.dataframe(
+                    pagina_df[['user_id', 'created_at', 'q18_edad', 'final_sentiment']].rename(columns={
+                        'user_id': 'Usuario', 'created_at': 'Inicio', 'q18_edad': 'Edad', 'final_sentiment': 'Sentimiento'}),
+                    width='stretch',
+                    hide_index=True
+                )
+                
+                # Detalle bajo demanda: una consulta por clave primaria al elegir a alguien
+                usuarios = dict(zip(pagina_df['id'], pagina_df['user_id']))
+                seleccionado = st.selectbox("Ver perfil de:", list(usuarios), index=None,
+                                            format_func=lambda feedback_id: f"👤 {usuarios[feedback_id]}",
+                                            placeholder="Elegir usuario de esta página", key="perfil_seleccionado")
+                if seleccionado is not None:
+                    usuario = load_profile_detail(int(seleccionado))
+                    if usuario is None:
+                        st.warning("⚠️ La encuesta ya no existe.")
+                    else:
                         col1, col2, col3 = st.columns([2, 1, 1])
                         
                         with col1:
                             st.write("**Información básica:**")
                             st.write(f"• **Estado:** {usuario['status']}")
                             st.write(f"• **Progreso:** {usuario['current_step']}/27")
-                            st.write(f"• **Inicio:** {usuario['created_at'].strftime('%Y-%m-%d')}")
+                            if usuario['created_at']:
+                                st.write(f"• **Inicio:** {usuario['created_at'].strftime('%Y-%m-%d')}")
                             
                             # Mostrar algunas respuestas clave
-                            if pd.notna(usuario['q18_edad']) and str(usuario['q18_edad']) != 'None':
+                            if usuario['q18_edad']:
                                 st.write(f"• **Edad:** {usuario['q18_edad']}")
-                            if pd.notna(usuario['q3_nivel_productividad']) and str(usuario['q3_nivel_productividad']) != 'None':
+                            if usuario['q3_nivel_productividad']:
                                 st.write(f"• **Productividad:** {usuario['q3_nivel_productividad']}")
-                            if pd.notna(usuario['q4_uso_tecnologia']) and str(usuario['q4_uso_tecnologia']) != 'None':
+                            if usuario['q4_uso_tecnologia']:
                                 st.write(f"• **Tecnología:** {usuario['q4_uso_tecnologia']}")
                         
+                        # Perfil y sentimiento precalculados en segundo plano (insights.py):
+                        # el dashboard nunca espera a Gemini
                         with col2:
-                            # Botón para generar perfil individual
-                            if st.button(f"🤖 Generar Perfil IA", key=f"gen_{idx}"):
-                                with st.spinner("Generando perfil con Gemini..."):
-                                    # Convertir Serie de pandas a diccionario
-                                    usuario_dict = usuario.to_dict()
-                                    perfil = generar_perfil_usuario_gemini(usuario_dict)
-                                    st.session_state[f"perfil_{idx}"] = perfil
+                            if usuario['final_sentiment']:
+                                st.write(f"**Sentimiento:** {usuario['final_sentiment']}")
                         
                         with col3:
-                            # Mostrar perfil si ya fue generado
-                            if f"perfil_{idx}" in st.session_state:
+                            if usuario['perfil']:
                                 st.write("**Perfil IA:**")
-                                st.write(st.session_state[f"perfil_{idx}"])
+                                st.write(usuario['perfil'])
+                            elif usuario['final_summary']:
+                                st.write("**Perfil IA:**")
+                                st.write(usuario['final_summary'])
+                                st.caption("🔄 Las respuestas cambiaron; el perfil se actualizará en el próximo backfill.")
+                            else:
+                                st.caption("⏳ Perfil IA en preparación")
+            elif busqueda_perfil.strip():
+                st.info("Ningún usuario completado coincide con la búsqueda.")
             else:
                 st.info("No hay usuarios que hayan completado la encuesta completa (27 pasos).")
-        else:
-            st.info("No hay datos de usuarios disponibles.")
     
     # TAB 3: Datos Completos
     with tab3:
+        from search import search_answers
+        from exports import FORMATS, request_export, export_state, read_export, export_mime
         st.markdown('<div class="section-header">📋 Datos Completos</div>', unsafe_allow_html=True)
         
+        # Búsqueda de texto completo en respuestas abiertas (índice GIN, paginada)
+        busqueda = st.text_input("🔎 Buscar en respuestas abiertas",
+                                 placeholder='diabetes, "ayuda económica", transporte -bus')
+        if busqueda.strip():
+            pagina = st.number_input("Página", min_value=1, value=1, step=1, key="pagina_busqueda")
+            resultado = search_answers(busqueda, int(pagina), status=estado_filtro)
+            mas = "más de " if resultado['capped'] else ""
+            st.write(f"**{mas}{resultado['total']} resultados** (página {resultado['page']} de {max(resultado['pages'], 1)})")
+            if resultado['hits']:
+                st.dataframe(
+                    pd.DataFrame(resultado['hits'])[['user_id', 'status', 'updated_at', 'fragmento']],
+                    width='stretch',
+                    hide_index=True
+                )
+            st.divider()
+        
+        # Encuestas individuales: el marco completo se carga recién aquí, con las pestañas
+        # anteriores ya dibujadas (Streamlit ejecuta todas las pestañas en cada corrida)
+        # Sin copia: df es compartido entre sesiones y los filtros crean marcos nuevos
+        df = load_data()
+        df_filtrado = df
+        
+        if estado_filtro:
+            df_filtrado = df_filtrado[df_filtrado['status'] == estado_filtro]
+        
+        df_filtrado = df_filtrado[
+            (df_filtrado['created_at'].dt.date >= fecha_inicio) &
+            (df_filtrado['created_at'].dt.date <= fecha_fin)
+        ]
+        
         if not df_filtrado.empty:
             st.write(f"**Total de registros:** {len(df_filtrado)}")
             
@@ -501,16 +533,208 @@ def main():
                 hide_index=True
             )
             
-            # Botón de descarga
-            csv = df_ordenado.to_csv(index=False)
-            st.download_button(
-                label="📥 Descargar datos completos (CSV)",
-                data=csv,
-                file_name=f"encuesta_datos_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
-                mime="text/csv"
-            )
+            # Exportación por streaming a archivo (en segundo plano si es grande)
+            col1, col2 = st.columns([1, 3])
+            with col1:
+                formato = st.radio("Formato", FORMATS, format_func=str.upper, horizontal=True, key="formato_export")
+            with col2:
+                if st.button("📦 Preparar exportación", help="Se genera un archivo con los filtros actuales"):
+                    st.session_state['exportacion'] = request_export(formato, estado_filtro, fecha_inicio, fecha_fin)
+            
+            exportacion = st.session_state.get('exportacion')
+            if exportacion:
+                estado_export, motivo = export_state(exportacion['name'])
+                if estado_export == 'ready':
+                    # Se lee del disco compartido solo tras el clic (no en cada rerun) y se entrega
+                    # solo a esta sesión; al descargar se olvida la exportación
+                    if st.button(f"📥 Preparar descarga de {exportacion['name']} ({exportacion['rows']} registros)",
+                                 key="preparar_descarga"):
+                        st.download_button("💾 Guardar archivo", data=read_export(exportacion['name']),
+                                           file_name=exportacion['name'], mime=export_mime(exportacion['name']),
+                                           key="descargar_export",
+                                           on_click=st.session_state.pop, args=('exportacion', None))
+                elif estado_export == 'too_large':
+                    st.warning(f"⚠️ La exportación {motivo}: acota los filtros o pídela en el servidor (python exports.py)")
+                elif estado_export == 'failed':
+                    st.error(f"❌ La exportación falló: {motivo}")
+                else:
+                    st.info(f"⏳ Exportando {exportacion['rows']} registros en segundo plano...")
+                    if st.button("🔄 Comprobar exportación"):
+                        st.rerun()
         else:
             st.info("No hay datos para mostrar.")
+        
+        # Historial de corridas completadas (survey_runs, particionado por mes)
+        with st.expander("🗂️ Historial de corridas completadas"):
+            df_runs = load_runs(fecha_inicio, fecha_fin)
+            if not df_runs.empty:
+                st.write(f"**Corridas en el rango:** {len(df_runs)} de {df_runs['user_id'].nunique()} usuarios")
+                st.dataframe(df_runs.drop(columns=['id']), width='stretch', hide_index=True)
+            else:
+                st.info("No hay corridas archivadas en el rango seleccionado.")
+
+    # TAB 4: Temas de las respuestas abiertas (modelos precalculados por themes.py)
+    with tab4:
+        from themes import THEME_COLUMNS, model_path
+        st.markdown('<div class="section-header">🧩 Temas de las Respuestas Abiertas</div>', unsafe_allow_html=True)
+        st.caption("Calculado sobre todas las encuestas completadas; se actualiza cada hora.")
+
+        columna = st.selectbox("Pregunta", list(THEME_COLUMNS), format_func=THEME_COLUMNS.get)
+        ruta = model_path(columna)
+        df_temas = load_themes(columna, os.path.getmtime(ruta)) if os.path.exists(ruta) else None
+
+        if df_temas is not None and not df_temas.empty:
+            fig_temas = px.bar(
+                df_temas.sort_values('respuestas'),
+                x='respuestas',
+                y='tema',
+                orientation='h',
+                title=f"Temas principales - {THEME_COLUMNS[columna]}",
+                labels={'respuestas': 'Respuestas', 'tema': 'Tema'}
+            )
+            st.plotly_chart(fig_temas, use_container_width=True)
+
+            for _, tema in df_temas.iterrows():
+                with st.expander(f"{tema['tema']} ({tema['proporcion']:.1%})"):
+                    for ejemplo in tema['ejemplos']:
+                        st.write(f"• {ejemplo}")
+        else:
+            st.info("Aún no hay temas calculados. Ejecuta: python themes.py refresh")
+
+    # TAB 5: Embudo de abandono por pregunta y tiempos de respuesta (funnel_analytics.py)
+    with tab5:
+        from funnel_analytics import FUNNEL_ABANDON_HOURS, TIME_LABELS
+        st.markdown('<div class="section-header">🔻 Embudo de Abandono y Tiempos</div>', unsafe_allow_html=True)
+        st.caption(f"Abandonada: encuesta activa sin actividad en {FUNNEL_ABANDON_HOURS:.0f} h. "
+                   "Tiempos a partir de la hora de cada respuesta; las pausas largas se cuentan aparte.")
+
+        reporte = load_funnel(fecha_inicio, fecha_fin)
+        embudo = reporte['embudo']
+        finalizacion = reporte['finalizacion']
+
+        if reporte['encuestas'] == 0:
+            st.info("No hay encuestas en el rango seleccionado.")
+        else:
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("📝 Encuestas", reporte['encuestas'])
+            with col2:
+                st.metric("🚪 Abandonadas", int(embudo['abandonaron'].sum()))
+            with col3:
+                st.metric("⏱️ Mediana para completar", f"{finalizacion['p50_min']} min" if 'p50_min' in finalizacion else "-")
+            with col4:
+                st.metric("⏱️ P90 para completar", f"{finalizacion['p90_min']} min" if 'p90_min' in finalizacion else "-")
+
+            col1, col2 = st.columns(2)
+            with col1:
+                fig_embudo = go.Figure(go.Funnel(
+                    y=[f"P{numero}" for numero in embudo['pregunta']],
+                    x=embudo['alcanzaron'],
+                    textinfo="value+percent initial"
+                ))
+                fig_embudo.update_layout(title="Personas que alcanzaron cada pregunta", height=700)
+                st.plotly_chart(fig_embudo, use_container_width=True)
+            with col2:
+                fig_abandono = px.bar(
+                    embudo,
+                    x='pregunta',
+                    y='tasa_abandono',
+                    hover_data=['columna', 'abandonaron', 'alcanzaron'],
+                    title="Tasa de abandono por pregunta",
+                    labels={'pregunta': 'Pregunta', 'tasa_abandono': 'Abandono'}
+                )
+                fig_abandono.update_yaxes(tickformat=".1%")
+                st.plotly_chart(fig_abandono, use_container_width=True)
+
+            tiempos = reporte['tiempos']
+            tiempos = tiempos[tiempos['respuestas'] > 0]
+            if not tiempos.empty:
+                histograma = reporte['histograma']
+                fig_tiempos = px.bar(
+                    histograma[histograma['cantidad'] > 0],
+                    x='pregunta',
+                    y='cantidad',
+                    color='rango',
+                    category_orders={'rango': list(TIME_LABELS)},
+                    title="Tiempo de respuesta por pregunta",
+                    labels={'pregunta': 'Pregunta', 'cantidad': 'Respuestas', 'rango': 'Tiempo'}
+                )
+                st.plotly_chart(fig_tiempos, use_container_width=True)
+                st.dataframe(tiempos.round(1), width='stretch', hide_index=True)
+            else:
+                st.info("Aún no hay respuestas con hora registrada en el rango.")
+
+    # TAB 6: Correlaciones y tablas cruzadas entre escalas (scale_analytics.py)
+    with tab6:
+        from scale_analytics import CATEGORY_COLUMNS, METHODS, correlation_pairs
+        st.markdown('<div class="section-header">🔗 Correlaciones entre Escalas</div>', unsafe_allow_html=True)
+
+        matriz = load_scale_matrix(estado_filtro, fecha_inicio, fecha_fin)
+        if matriz.respondents == 0:
+            st.info("No hay respuestas de escala con los filtros seleccionados.")
+        else:
+            metodo = st.radio("Método", METHODS, horizontal=True, format_func=str.capitalize)
+            resultado = load_correlations(estado_filtro, fecha_inicio, fecha_fin, metodo)
+            st.caption(f"{matriz.respondents} personas; casos completos por par e intervalos "
+                       "bootstrap del 95% (percentil).")
+
+            col1, col2 = st.columns(2)
+            with col1:
+                fig_corr = px.imshow(
+                    resultado['r'],
+                    zmin=-1,
+                    zmax=1,
+                    color_continuous_scale='RdBu',
+                    text_auto='.2f',
+                    title="Correlación entre preguntas de escala"
+                )
+                fig_corr.update_layout(height=550)
+                st.plotly_chart(fig_corr, use_container_width=True)
+            with col2:
+                pares = correlation_pairs(resultado)
+                st.dataframe(pares.round(3), width='stretch', hide_index=True, height=550)
+
+            st.markdown('<div class="section-header">🧮 Tablas Cruzadas</div>', unsafe_allow_html=True)
+            col1, col2 = st.columns(2)
+            with col1:
+                filas = st.selectbox("Filas", SCALE_COLUMNS + CATEGORY_COLUMNS, key="cruce_filas")
+            with col2:
+                columnas = st.selectbox("Columnas", [c for c in CATEGORY_COLUMNS + SCALE_COLUMNS if c != filas],
+                                        key="cruce_columnas")
+            tabla, medias = load_crosstab(estado_filtro, fecha_inicio, fecha_fin, filas, columnas)
+
+            if tabla['n'] == 0:
+                st.info("No hay personas que respondieran ambas preguntas.")
+            else:
+                st.caption(f"{tabla['n']} personas respondieron ambas preguntas; V de Cramér {tabla['cramer_v']:.3f}")
+                col1, col2 = st.columns(2)
+                with col1:
+                    fig_cruce = px.imshow(
+                        tabla['porcentaje_fila'],
+                        zmin=0,
+                        zmax=1,
+                        color_continuous_scale='Blues',
+                        text_auto='.0%',
+                        title="Distribución por fila"
+                    )
+                    st.plotly_chart(fig_cruce, use_container_width=True)
+                with col2:
+                    if medias is not None:
+                        medias = medias[medias['n'] > 0]
+                        fig_medias = px.bar(
+                            medias,
+                            x='grupo',
+                            y='media',
+                            error_y=medias['superior'] - medias['media'],
+                            error_y_minus=medias['media'] - medias['inferior'],
+                            hover_data=['n'],
+                            title=f"Media de {filas} por grupo (IC 95%)",
+                            labels={'grupo': columnas, 'media': 'Media (1-5)'}
+                        )
+                        fig_medias.update_yaxes(range=[1, 5])
+                        st.plotly_chart(fig_medias, use_container_width=True)
+                    else:
+                        st.dataframe(tabla['conteos'], width='stretch')
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,135 @@
+# dashboard_metrics.py - Métricas y distribuciones del dashboard calculadas en SQL
+#
+# Los indicadores del encabezado, los filtros del sidebar y los gráficos de la
+# pestaña de análisis se leen de la vista materializada kpi_daily (conteos
+# por día, estado, dimensión y valor; ver database.kpi_daily_view_sql), que
+# kpi_views.py refresca cada KPI_REFRESH_MINUTES. Cada consulta suma unos
+# pocos miles de filas precalculadas y devuelve DataFrames chicos; no se lee
+# feedbacks ni se carga ninguna encuesta individual.
+
+import datetime
+from typing import Dict, List, Optional
+import pandas as pd
+from sqlalchemy import select, func, distinct, table, column, Date, Integer, String
+from database import engine, Feedback, KPI_DAILY_VIEW
+from survey_questions import ELDERLY_SURVEY_QUESTIONS
+
+# Preguntas con gráfico de distribución en la pestaña de análisis
+ANSWER_CHARTS = ['q3_nivel_productividad', 'q4_uso_tecnologia', 'q9_nivel_proposito']
+# Preguntas de escala con evolución semanal
+SCALE_COLUMNS = [question['column'] for question in ELDERLY_SURVEY_QUESTIONS.values()
+                 if question['type'] == 'scale_1_5']
+
+kpi_daily = table(
+    KPI_DAILY_VIEW,
+    column('day', Date),
+    column('status', String),
+    column('dimension', String),
+    column('valor', String),
+    column('total', Integer),
+    column('respondidas', Integer),
+)
+
+# Dimensiones del gráfico y el conteo que usan (las preguntas solo cuentan encuestas con respuestas)
+DIMENSIONS = {
+    'estados': 'total',
+    'pasos': 'total',
+    'sentimientos': 'total',
+    'preguntas': 'total',
+    **{name: 'respondidas' for name in ANSWER_CHARTS},
+}
+
+def survey_filters(status: Optional[str] = None, start: Optional[datetime.date] = None,
+                   end: Optional[datetime.date] = None) -> List:
+    """Condiciones del sidebar sobre feedbacks (fechas inclusivas por día); nunca incluye invitaciones pendientes"""
+    conditions = [Feedback.status != 'invited']
+    if status:
+        conditions.append(Feedback.status == status)
+    if start:
+        conditions.append(Feedback.created_at >= datetime.datetime.combine(start, datetime.time.min))
+    if end:
+        conditions.append(Feedback.created_at < datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min))
+    return conditions
+
+def kpi_filters(status: Optional[str] = None, start: Optional[datetime.date] = None,
+                end: Optional[datetime.date] = None) -> List:
+    """Las mismas condiciones sobre kpi_daily (la vista ya excluye invitaciones)"""
+    conditions = []
+    if status:
+        conditions.append(kpi_daily.c.status == status)
+    if start:
+        conditions.append(kpi_daily.c.day >= start)
+    if end:
+        conditions.append(kpi_daily.c.day <= end)
+    return conditions
+
+def summary() -> Dict:
+    """Encabezado y límites del sidebar: totales, usuarios, estados y rango de fechas"""
+    statement = select(
+        func.coalesce(func.sum(kpi_daily.c.total), 0).label('total'),
+        func.coalesce(func.sum(kpi_daily.c.total).filter(kpi_daily.c.valor == 'completed'), 0).label('completadas'),
+        func.min(kpi_daily.c.day).label('primera'),
+        func.max(kpi_daily.c.day).label('ultima'),
+    ).where(kpi_daily.c.dimension == 'estados')
+    with engine.connect() as conn:
+        row = dict(conn.execute(statement).mappings().one())
+        row['estados'] = conn.execute(
+            select(distinct(kpi_daily.c.valor)).where(kpi_daily.c.dimension == 'estados')
+            .order_by(kpi_daily.c.valor)).scalars().all()
+    row['total'] = int(row['total'])
+    row['completadas'] = int(row['completadas'])
+    row['usuarios'] = row['total']      # uq_feedbacks_user_id: una fila por usuario
+    return row
+
+def analysis(status: Optional[str] = None, start: Optional[datetime.date] = None,
+             end: Optional[datetime.date] = None) -> Dict[str, pd.DataFrame]:
+    """Distribuciones de la pestaña de análisis bajo los filtros del sidebar.
+
+    Dict de DataFrames ['valor', 'cantidad'] por dimensión; las preguntas
+    cuentan solo encuestas con respuestas (current_step > 1).
+    """
+    statement = (
+        select(
+            kpi_daily.c.dimension,
+            kpi_daily.c.valor,
+            func.sum(kpi_daily.c.total).label('total'),
+            func.sum(kpi_daily.c.respondidas).label('respondidas'),
+        )
+        .where(kpi_daily.c.dimension.in_(list(DIMENSIONS)))
+        .where(*kpi_filters(status, start, end))
+        .group_by(kpi_daily.c.dimension, kpi_daily.c.valor)
+    )
+    with engine.connect() as conn:
+        rows = pd.DataFrame(conn.execute(statement).mappings().all(),
+                            columns=['dimension', 'valor', 'total', 'respondidas'])
+
+    result = {}
+    for name, count in DIMENSIONS.items():
+        frame = rows.loc[rows['dimension'] == name, ['valor', count]]
+        frame.columns = ['valor', 'cantidad']
+        frame = frame.astype({'cantidad': int})
+        result[name] = frame[frame['cantidad'] > 0].sort_values('valor').reset_index(drop=True)
+    result['pasos']['valor'] = result['pasos']['valor'].astype(int)
+    result['pasos'] = result['pasos'].sort_values('valor').reset_index(drop=True)
+    # Respuestas por pregunta en el orden de la encuesta
+    order = {question['column']: number for number, question in ELDERLY_SURVEY_QUESTIONS.items()}
+    result['preguntas'] = result['preguntas'].sort_values('valor', key=lambda valores: valores.map(order)) \
+        .reset_index(drop=True)
+    return result
+
+def weekly_distribution(question: str, status: Optional[str] = None, start: Optional[datetime.date] = None,
+                        end: Optional[datetime.date] = None) -> pd.DataFrame:
+    """Respuestas de una pregunta por semana: ['semana', 'valor', 'cantidad']"""
+    week = func.date_trunc('week', kpi_daily.c.day).cast(Date).label('semana')
+    statement = (
+        select(week, kpi_daily.c.valor, func.sum(kpi_daily.c.respondidas).label('cantidad'))
+        .where(kpi_daily.c.dimension == question)
+        .where(kpi_daily.c.day.is_not(None))
+        .where(*kpi_filters(status, start, end))
+        .group_by(week, kpi_daily.c.valor)
+        .order_by(week, kpi_daily.c.valor)
+    )
+    with engine.connect() as conn:
+        frame = pd.DataFrame(conn.execute(statement).mappings().all(), columns=['semana', 'valor', 'cantidad'])
+    frame['cantidad'] = frame['cantidad'].astype(int)
+    return frame[frame['cantidad'] > 0].reset_index(drop=True)
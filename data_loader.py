@@ -0,0 +1,230 @@
+# data_loader.py - Carga de feedbacks a pandas por columnas y por bloques
+#
+# En vez de hidratar un objeto ORM por fila y copiar atributos a un dict:
+#   - se seleccionan solo las columnas que la vista necesita;
+#   - se lee con cursor del lado del servidor (stream_results) en bloques de
+#     LOADER_CHUNK_SIZE filas;
+#   - cada bloque se convierte en columnas tipadas apenas llega: categóricas
+#     para estado, sentimiento y preguntas cerradas (escala/botones/lista),
+#     datetime64 para fechas; así el pico de memoria es un bloque de tuplas y
+#     no la tabla entera como objetos.
+# Cada carga registra filas/s, tamaño del DataFrame y pico de memoria.
+#
+# LiveFrame mantiene una vista cargada al día de forma incremental: guarda el
+# máximo updated_at como marca de agua, en cada refresco lee solo las filas
+# modificadas desde entonces (ix_feedbacks_updated_at) y las reemplaza por id.
+# Con una instantánea Arrow (snapshots.py) la carga base sale del archivo y
+# solo se consulta la base por lo cambiado después de construirla.
+#
+#   python data_loader.py --view dashboard [--trace-memory]
+
+import os
+import time
+import logging
+import datetime
+import threading
+import resource
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import pandas as pd
+from pandas.api.types import union_categoricals
+from sqlalchemy import select
+from database import engine, Feedback, SurveyAnswersMixin
+from survey_registry import current_survey
+from sentiment_lexicon import OPEN_TEXT_COLUMNS, label_respondents
+
+logger = logging.getLogger(__name__)
+
+LOADER_CHUNK_SIZE = int(os.getenv("LOADER_CHUNK_SIZE", "20000"))
+# Margen hacia atrás de la marca de agua: cubre transacciones que confirmaron
+# tarde con un updated_at anterior al máximo ya leído (volver a leerlas es inocuo)
+LIVE_OVERLAP_SECONDS = int(os.getenv("LIVE_OVERLAP_SECONDS", "120"))
+# Recarga completa periódica: recoge filas borradas, que el incremental no ve
+LIVE_FULL_RELOAD_SECONDS = int(os.getenv("LIVE_FULL_RELOAD_SECONDS", "3600"))
+
+ANSWER_COLUMNS = [column for column in vars(SurveyAnswersMixin) if column.startswith('q')]
+DATETIME_COLUMNS = {'created_at', 'updated_at', 'last_reminded_at'}
+
+# Columnas por vista del dashboard
+VIEWS = {
+    'dashboard': ['id', 'user_id', 'status', 'current_step', 'created_at', 'updated_at',
+                  *ANSWER_COLUMNS, 'final_sentiment', 'final_summary', 'summary_hash'],
+    'metricas': ['id', 'user_id', 'status', 'created_at', 'updated_at', 'q3_nivel_productividad',
+                 'q4_uso_tecnologia', 'q9_nivel_proposito', 'final_sentiment'],
+}
+
+def categorical_columns() -> set:
+    """Estado, sentimiento y respuestas de preguntas cerradas (pocas categorías repetidas)"""
+    closed = {question.column for question in current_survey().questions
+              if question is not None and question.type != 'open'}
+    return {'status', 'final_sentiment', 'survey_version', *closed}
+
+def _typed_chunk(rows: Sequence[Tuple], columns: List[str], categorical: set) -> pd.DataFrame:
+    frame = pd.DataFrame.from_records(rows, columns=columns)
+    for column in columns:
+        if column in DATETIME_COLUMNS:
+            frame[column] = pd.to_datetime(frame[column]).astype('datetime64[ns]')
+        elif column in categorical:
+            frame[column] = frame[column].astype('category')
+    return frame
+
+def _concat(chunks: List[pd.DataFrame], columns: List[str], categorical: set) -> pd.DataFrame:
+    """Une los bloques; las categóricas se unen sin pasar por object"""
+    if len(chunks) == 1:
+        return chunks[0]
+    data = {}
+    for column in columns:
+        parts = [chunk[column] for chunk in chunks]
+        if column in categorical:
+            # Un bloque sin valores infiere otro tipo de categorías: se igualan antes de unir
+            parts = [part.cat.set_categories(part.cat.categories.astype(object)) for part in parts]
+            data[column] = pd.Series(union_categoricals(parts, ignore_order=True))
+        else:
+            data[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(data)
+
+def load_columns(columns: Sequence[str], where: Sequence = (), chunk_size: int = LOADER_CHUNK_SIZE,
+                 trace_memory: bool = False) -> Tuple[pd.DataFrame, Dict]:
+    """(DataFrame tipado, estadísticas) con solo `columns` de feedbacks (sin invitaciones pendientes)"""
+    columns = list(columns)
+    categorical = categorical_columns() & set(columns)
+    query = select(*[getattr(Feedback, column) for column in columns]).where(Feedback.status != 'invited')
+    for condition in where:
+        query = query.where(condition)
+
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    chunks = []
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+        for rows in result.partitions():
+            chunks.append(_typed_chunk(rows, columns, categorical))
+    frame = _concat(chunks, columns, categorical) if chunks else pd.DataFrame(columns=columns)
+    elapsed = time.perf_counter() - started
+
+    stats = {
+        'rows': len(frame),
+        'chunks': len(chunks),
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(len(frame) / elapsed) if elapsed else 0,
+        'frame_mb': round(float(frame.memory_usage(deep=True).sum()) / 2**20, 1),
+        # ru_maxrss: pico del proceso completo (KiB en Linux)
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    if trace_memory:
+        stats['peak_traced_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        tracemalloc.stop()
+    logger.info(f"Carga de {len(columns)} columnas: {stats['rows']} filas en {stats['seconds']}s "
+                f"({stats['rows_per_second']} filas/s, {stats['frame_mb']} MB)")
+    return frame, stats
+
+def load_view(view: str, where: Sequence = (), **options) -> Tuple[pd.DataFrame, Dict]:
+    return load_columns(VIEWS[view], where, **options)
+
+def fill_sentiment(frame: pd.DataFrame) -> pd.DataFrame:
+    """Sentimiento local (léxico vectorizado) para encuestas completadas aún sin etiqueta;
+    las activas quedan sin sentimiento hasta completarse"""
+    missing = frame['final_sentiment'].isna() & (frame['status'] == 'completed')
+    if missing.any():
+        local = pd.Series(label_respondents(frame.loc[missing, OPEN_TEXT_COLUMNS].to_dict('records')),
+                          index=frame.index[missing], dtype=object)
+        frame['final_sentiment'] = frame['final_sentiment'].astype(object).fillna(local).astype('category')
+    return frame
+
+def upsert_rows(frame: pd.DataFrame, changes: pd.DataFrame, key: str = 'id') -> pd.DataFrame:
+    """Reemplaza en `frame` las filas de `changes` (por `key`) y agrega las nuevas"""
+    if changes.empty:
+        return frame
+    columns = list(frame.columns)
+    categorical = {column for column in columns if isinstance(frame[column].dtype, pd.CategoricalDtype)}
+    # Texto respaldado por Arrow (instantáneas): los cambios se igualan para no degradar a object
+    changes = changes[columns].astype({column: frame[column].dtype for column in columns
+                                       if isinstance(frame[column].dtype, pd.StringDtype)})
+    kept = frame[~frame[key].isin(changes[key])]
+    return _concat([kept.reset_index(drop=True), changes.reset_index(drop=True)], columns, categorical)
+
+class LiveFrame:
+    """Vista cargada que se mantiene al día leyendo solo los cambios por updated_at.
+
+    `prepare` se aplica a cada bloque leído (carga completa o cambios), así el
+    trabajo derivado (p. ej. sentimiento local) se hace solo sobre filas nuevas.
+    `snapshot` (snapshots.Snapshot) da la carga base ya preparada; cuando se
+    publica una instantánea nueva se vuelve a ella y se descartan los cambios
+    acumulados en memoria propia.
+    """
+
+    def __init__(self, view: str, prepare: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+                 overlap_seconds: int = LIVE_OVERLAP_SECONDS, full_reload_seconds: int = LIVE_FULL_RELOAD_SECONDS,
+                 snapshot=None):
+        if 'updated_at' not in VIEWS[view] or 'id' not in VIEWS[view]:
+            raise ValueError(f"La vista {view} necesita id y updated_at para refrescarse")
+        self.view = view
+        self.prepare = prepare or (lambda frame: frame)
+        self.overlap = datetime.timedelta(seconds=overlap_seconds)
+        self.full_reload_seconds = full_reload_seconds
+        self.snapshot = snapshot
+        self.snapshot_version = None
+        self.frame: Optional[pd.DataFrame] = None
+        self.watermark: Optional[datetime.datetime] = None
+        self.loaded_at = 0.0
+        self.refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def _advance(self, frame: pd.DataFrame):
+        latest = frame['updated_at'].max() if not frame.empty else None
+        if latest is not None and not pd.isna(latest):
+            latest = latest.to_pydatetime()
+            self.watermark = max(self.watermark, latest) if self.watermark else latest
+
+    def _from_snapshot(self) -> bool:
+        version = self.snapshot.version()
+        loaded = self.snapshot.load() if version is not None else None
+        if loaded is None:
+            return False
+        self.frame, self.watermark = loaded
+        self.snapshot_version = version
+        return self.watermark is not None
+
+    def reload(self) -> Dict:
+        started = time.perf_counter()
+        self.loaded_at = self.refreshed_at = time.monotonic()
+        if self.snapshot is not None and self._from_snapshot():
+            return {'rows': len(self.frame), 'seconds': round(time.perf_counter() - started, 3), 'mode': 'snapshot'}
+        frame, stats = load_view(self.view)
+        self.frame = self.prepare(frame)
+        self.watermark = None
+        self._advance(self.frame)
+        return {**stats, 'mode': 'full'}
+
+    def refresh(self, full: bool = False) -> Tuple[pd.DataFrame, Dict]:
+        """(DataFrame al día, estadísticas) leyendo solo lo cambiado desde la marca de agua"""
+        with self._lock:
+            stale = time.monotonic() - self.loaded_at > self.full_reload_seconds
+            republished = self.snapshot is not None and self.snapshot.version() != self.snapshot_version
+            if full or stale or republished or self.frame is None or self.watermark is None:
+                stats = self.reload()
+                if stats['mode'] != 'snapshot':
+                    return self.frame, stats
+
+            since = self.watermark - self.overlap
+            changes, stats = load_view(self.view, where=[Feedback.updated_at >= since])
+            if not changes.empty:
+                self.frame = upsert_rows(self.frame, self.prepare(changes))
+                self._advance(changes)
+            self.refreshed_at = time.monotonic()
+            return self.frame, {**stats, 'mode': 'incremental', 'since': since}
+
+if __name__ == "__main__":
+    import argparse
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    parser = argparse.ArgumentParser(description="Carga de feedbacks a pandas (medición)")
+    parser.add_argument("--view", choices=list(VIEWS), default="dashboard")
+    parser.add_argument("--chunk-size", type=int, default=LOADER_CHUNK_SIZE)
+    parser.add_argument("--trace-memory", action="store_true", help="Pico de memoria con tracemalloc (más lento)")
+    args = parser.parse_args()
+
+    frame, stats = load_view(args.view, chunk_size=args.chunk_size, trace_memory=args.trace_memory)
+    print(frame.dtypes.value_counts().to_string())
+    print(stats)
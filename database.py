@@ -3,8 +3,11 @@
 import os
 import datetime
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, Column, Computed, Integer, BigInteger, SmallInteger, Sequence, String, DateTime, Float, Text, ForeignKey, Index, UniqueConstraint, text
+from sqlalchemy.dialects.postgresql import TSVECTOR, JSONB
+from sqlalchemy.orm import sessionmaker, declarative_base, deferred
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from survey_questions import ELDERLY_SURVEY_QUESTIONS
 
 # --- Cargar Variables de Entorno ---
 load_dotenv()
@@ -17,56 +20,54 @@ DB_PORT = os.getenv("DB_PORT")
 DB_NAME = os.getenv("DB_NAME")
 
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+DB_ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", "10"))
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
 
 # --- Motor y Sesión de SQLAlchemy ---
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-# --- DEFINICIÓN DEL MODELO DE DATOS PARA ENCUESTA DE ADULTOS MAYORES ---
-class Feedback(Base):
-    __tablename__ = "feedbacks"
+# --- Motor y Sesión Async (asyncpg) ---
+# Comparte los mismos modelos; pensado para handlers asyncio que solapan
+# I/O de base de datos y de la Graph API entre muchos usuarios.
+async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_size=DB_ASYNC_POOL_SIZE)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String, index=True)
-    
-    # Control de la encuesta
-    status = Column(String(50))
-    current_step = Column(Integer)
-    # is_in_followup = Column(Integer, default=0)  # 0=No, 1=Sí (SQLite compatible)
-    # followup_question = Column(Integer, nullable=True)  # Número de pregunta que disparó el seguimiento
-    
+# --- COLUMNAS DE RESPUESTA (compartidas por Feedback y SurveyRun) ---
+class SurveyAnswersMixin:
     # PRODUCTIVIDAD Y PARTICIPACIÓN (Preguntas 1-6)
     q1_actividades_productivas = Column(Text, nullable=True)  # P1: Actividades que generan ingresos
     q2_experiencia_valor = Column(Text, nullable=True)        # P2: Cómo aporta valor su experiencia
-    q3_nivel_productividad = Column(String(10), nullable=True) # P3: Escala 1-5 productividad
-    q4_uso_tecnologia = Column(String(50), nullable=True)     # P4: Uso de herramientas digitales
+    q3_nivel_productividad = Column(Text, nullable=True) # P3: Escala 1-5 productividad
+    q4_uso_tecnologia = Column(Text, nullable=True)     # P4: Uso de herramientas digitales
     q5_aprendizaje_tecnologia = Column(Text, nullable=True)   # P5: Facilidad aprender tecnología
-    q6_oportunidades_digitales = Column(String(10), nullable=True) # P6: Escala 1-5 oportunidades
+    q6_oportunidades_digitales = Column(Text, nullable=True) # P6: Escala 1-5 oportunidades
     
     # PROPÓSITO Y SENTIDO (Preguntas 7-9)
     q7_actividades_proposito = Column(Text, nullable=True)    # P7: Actividades que dan propósito
     q8_importancia_utilidad = Column(Text, nullable=True)     # P8: Importancia sentirse útil
-    q9_nivel_proposito = Column(String(10), nullable=True)    # P9: Escala 1-5 propósito actual
+    q9_nivel_proposito = Column(Text, nullable=True)    # P9: Escala 1-5 propósito actual
     
     # COMPAÑÍA Y REDES SOCIALES (Preguntas 10-14)
-    q10_situacion_vivienda = Column(String(100), nullable=True) # P10: Vive solo o acompañado
+    q10_situacion_vivienda = Column(Text, nullable=True) # P10: Vive solo o acompañado
     q11_entorno_cercano = Column(Text, nullable=True)         # P11: Quiénes están cerca
-    q12_frecuencia_social = Column(String(100), nullable=True) # P12: Frecuencia encuentros
+    q12_frecuencia_social = Column(Text, nullable=True) # P12: Frecuencia encuentros
     q13_soledad = Column(Text, nullable=True)                 # P13: Experiencias de soledad (respuesta larga)
     # q13b_circunstancias_soledad = Column(Text, nullable=True) # P13b: Circunstancias de soledad
-    q14_nivel_apoyo_social = Column(String(10), nullable=True) # P14: Escala 1-5 apoyo social
+    q14_nivel_apoyo_social = Column(Text, nullable=True) # P14: Escala 1-5 apoyo social
     
     # DISFRUTE Y BIENESTAR (Preguntas 15-17)
     q15_actividades_disfrute = Column(Text, nullable=True)    # P15: Hobbies y entretenimiento
-    q16_frecuencia_placer = Column(String(100), nullable=True) # P16: Tiempo para actividades placenteras
-    q17_satisfaccion_disfrute = Column(String(10), nullable=True) # P17: Escala 1-5 satisfacción
+    q16_frecuencia_placer = Column(Text, nullable=True) # P16: Tiempo para actividades placenteras
+    q17_satisfaccion_disfrute = Column(Text, nullable=True) # P17: Escala 1-5 satisfacción
     
     # DISCRIMINACIÓN POR EDAD (Preguntas 18-21)
     q18_edad = Column(Text, nullable=True)                    # P18: Edad (puede ser respuesta larga)
     q19_experiencias_discriminacion = Column(Text, nullable=True) # P19: Situaciones de discriminación
     q20_espacios_discriminacion = Column(Text, nullable=True) # P20: Dónde ha percibido discriminación
-    q21_frecuencia_discriminacion = Column(String(10), nullable=True) # P21: Escala 1-5 frecuencia
+    q21_frecuencia_discriminacion = Column(Text, nullable=True) # P21: Escala 1-5 frecuencia
     
     # REFLEXIONES Y NECESIDADES (Preguntas 22-27)
     q22_filosofia_vida = Column(Text, nullable=True)          # P22: Frase que resume su visión
@@ -79,19 +80,208 @@ class Feedback(Base):
     # Análisis final de IA
     final_sentiment = Column(String, nullable=True)
     final_summary = Column(Text, nullable=True)
+    summary_hash = Column(String(64), nullable=True)  # Clave de contenido del perfil (ai_profiles.profile_hash)
+
+# --- BÚSQUEDA DE TEXTO COMPLETO (ver migrations/versions/0010) ---
+SEARCH_CONFIG = "es_unaccent"  # spanish + unaccent
+SEARCH_COLUMNS = [
+    'q1_actividades_productivas', 'q2_experiencia_valor', 'q5_aprendizaje_tecnologia',
+    'q7_actividades_proposito', 'q13_soledad', 'q15_actividades_disfrute',
+    'q19_experiencias_discriminacion', 'q20_espacios_discriminacion', 'q22_filosofia_vida',
+    'q23_mensaje_generaciones', 'q24_compartir_adicional', 'q25_experiencias_recientes',
+    'q26_servicios_necesarios', 'q27_limitaciones_fisicas',
+]
+
+def search_document_sql():
+    """Texto indexado: respuestas abiertas concatenadas (expresión inmutable para la columna generada)"""
+    return " || ' ' || ".join(f"coalesce({column}, '')" for column in SEARCH_COLUMNS)
+
+# --- DEFINICIÓN DEL MODELO DE DATOS PARA ENCUESTA DE ADULTOS MAYORES ---
+class Feedback(SurveyAnswersMixin, Base):
+    __tablename__ = "feedbacks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String)
     
-    # Timestamps
+    # Control de la encuesta
+    status = Column(String(50))
+    current_step = Column(Integer)
+    survey_version = Column(String(16), nullable=True)  # Versión de la definición (survey_registry)
+    is_in_followup = Column(Integer, default=0)  # 0=No, 1=Sí (SQLite compatible)
+    followup_question = Column(Integer, nullable=True)  # Número de pregunta que disparó el seguimiento
+    
+    # Respuestas (P1-P27) y análisis final: ver SurveyAnswersMixin
+    
+    # Timestamps en UTC sin zona: escrituras y comparaciones usan datetime.utcnow (o timezone('utc', now()) en SQL)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    last_reminded_at = Column(DateTime, nullable=True)  # Último recordatorio de encuesta abandonada
+
+    # Columna generada por Postgres; diferida para no cargarla con cada encuesta
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        f"to_tsvector('{SEARCH_CONFIG}'::regconfig, {search_document_sql()})", persisted=True)))
+
+    # Índices de las consultas calientes (ver migrations/versions/0003, 0007, 0010, 0011 y 0012)
+    __table_args__ = (
+        UniqueConstraint("user_id", name="uq_feedbacks_user_id"),                  # Webhook: una fila por usuario
+        Index("ix_feedbacks_status_created_at", "status", "created_at"),           # Dashboard: filtros estado/fecha
+        Index("ix_feedbacks_active_updated_id", "updated_at", "id",
+              postgresql_where=text("status = 'active'")),                         # Barrido de encuestas activas (keyset)
+        Index("ix_feedbacks_updated_at", "updated_at"),                            # Dashboard: cambios desde la marca de agua
+        Index("ix_feedbacks_user_id_pattern", "user_id",
+              postgresql_ops={"user_id": "varchar_pattern_ops"}),                  # Perfiles: búsqueda por prefijo de teléfono
+        Index("ix_feedbacks_search_vector", "search_vector", postgresql_using="gin"),  # Búsqueda en respuestas abiertas
+    )
+
+# --- HISTORIAL DE CORRIDAS: una fila por encuesta completada, particionada por mes ---
+class SurveyRun(SurveyAnswersMixin, Base):
+    __tablename__ = "survey_runs"
+
+    id = Column(BigInteger, Sequence("survey_runs_id_seq"), primary_key=True)
+    created_at = Column(DateTime, primary_key=True)        # Clave de partición (inicio de la corrida)
+    feedback_id = Column(Integer, nullable=False)           # Fila viva en feedbacks
+    user_id = Column(String)
+    status = Column(String(50))
+    current_step = Column(Integer)
+    survey_version = Column(String(16))
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("feedback_id", "created_at", name="uq_survey_runs_feedback_created"),
+        Index("ix_survey_runs_user_created", "user_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+# --- RESPUESTAS NORMALIZADAS: una fila por (encuesta, pregunta) ---
+class SurveyAnswer(Base):
+    __tablename__ = "survey_answers"
+
+    survey_id = Column(Integer, ForeignKey("feedbacks.id", ondelete="CASCADE"), primary_key=True)
+    question_no = Column(SmallInteger, primary_key=True)
+
+    raw_text = Column(Text, nullable=True)                    # Respuesta tal como llegó (texto/audio transcrito)
+    normalized_option = Column(String(100), nullable=True)    # Opción reconocida (None si es texto libre)
+    scale_value = Column(SmallInteger, nullable=True)         # 1-5 para preguntas scale_1_5
+    answered_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        # Agregaciones de escalas: GROUP BY scale_value WHERE question_no = N
+        Index("ix_survey_answers_question_scale", "question_no", "scale_value"),
+        # Temas: encuestas con respuestas posteriores a la marca de agua (0015)
+        Index("ix_survey_answers_answered_at", "answered_at"),
+    )
+
+# --- DEFINICIONES DE ENCUESTA: una fila por versión (survey_registry) ---
+class SurveyDefinition(Base):
+    """Definición con la que empezaron las encuestas de cada versión (feedbacks.survey_version)"""
+    __tablename__ = "survey_definitions"
+
+    version = Column(String(16), primary_key=True)
+    definition = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+# --- CAMPAÑAS DE INVITACIÓN (envíos salientes con plantilla) ---
+class Campaign(Base):
+    __tablename__ = "campaigns"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(200), nullable=False)
+    template_name = Column(String(100), nullable=False)       # Plantilla aprobada en WhatsApp Manager
+    language_code = Column(String(10), default="es")
+    status = Column(String(20), default="loaded")            # loaded | dispatching | paused | finished
+    dry_run = Column(Integer, default=0)                      # 1 = envíos contra el stub, sin tocar feedbacks
+    total_contacts = Column(Integer, default=0)
+    sent_count = Column(Integer, default=0)
+    failed_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+class CampaignContact(Base):
+    __tablename__ = "campaign_contacts"
+
+    id = Column(BigInteger, primary_key=True)
+    campaign_id = Column(Integer, ForeignKey("campaigns.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(String, nullable=False)
+    status = Column(String(20), default="pending")           # pending | sent | failed
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("campaign_id", "user_id", name="uq_campaign_contacts_user"),
+        # Reanudación: siguiente página de pendientes por id
+        Index("ix_campaign_contacts_pending", "campaign_id", "id", postgresql_where=text("status = 'pending'")),
+    )
+
+# --- Vista de compatibilidad con el formato ancho de feedbacks ---
+ANSWERS_WIDE_VIEW = "feedbacks_answers_wide"
+
+def answers_wide_view_sql():
+    """CREATE VIEW que reconstruye las columnas qN_* a partir de survey_answers"""
+    pivot_columns = ",\n    ".join(
+        f"max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = {number}) AS {question['column']}"
+        for number, question in ELDERLY_SURVEY_QUESTIONS.items()
+    )
+    return f"""CREATE OR REPLACE VIEW {ANSWERS_WIDE_VIEW} AS
+SELECT
+    f.id, f.user_id, f.status, f.current_step, f.created_at, f.updated_at,
+    {pivot_columns},
+    f.final_sentiment, f.final_summary
+FROM feedbacks f
+LEFT JOIN survey_answers a ON a.survey_id = f.id
+GROUP BY f.id"""
+
+# --- Indicadores del dashboard precalculados (vista materializada por día) ---
+# Una fila por (día, estado, dimensión, valor): estados, pasos, sentimientos,
+# respuestas de preguntas cerradas y respuestas no vacías por pregunta. Los
+# filtros del dashboard son por día, así cualquier rango se resuelve sumando.
+KPI_DAILY_VIEW = "kpi_daily"
+
+def kpi_daily_view_sql():
+    """CREATE MATERIALIZED VIEW con los conteos diarios que usa el dashboard"""
+    dimensions = [
+        "('estados', f.status)",
+        "('pasos', f.current_step::text)",
+        "('sentimientos', f.final_sentiment)",
+        *(f"('{question['column']}', nullif(f.{question['column']}, ''))"
+          for question in ELDERLY_SURVEY_QUESTIONS.values() if question['type'] != 'open'),
+        *(f"('preguntas', CASE WHEN f.{question['column']} <> '' THEN '{question['column']}' END)"
+          for question in ELDERLY_SURVEY_QUESTIONS.values()),
+    ]
+    values = ",\n        ".join(dimensions)
+    return f"""CREATE MATERIALIZED VIEW IF NOT EXISTS {KPI_DAILY_VIEW} AS
+SELECT
+    f.created_at::date AS day,
+    f.status,
+    d.dimension,
+    d.valor,
+    count(*) AS total,
+    count(*) FILTER (WHERE f.current_step > 1) AS respondidas
+FROM feedbacks f
+CROSS JOIN LATERAL (VALUES
+        {values}
+) AS d(dimension, valor)
+WHERE f.status <> 'invited' AND d.valor IS NOT NULL
+GROUP BY 1, 2, 3, 4"""
+
+class ViewRefresh(Base):
+    """Último refresco de cada vista materializada (frescura que muestra el dashboard)"""
+    __tablename__ = "view_refreshes"
+    view_name = Column(String(63), primary_key=True)
+    refreshed_at = Column(DateTime, nullable=False)
+    seconds = Column(Float)
 
 # --- Función de Inicialización ---
 def init_db():
+    """Aplica las migraciones pendientes (alembic upgrade head)"""
+    from alembic import command
+    from alembic.config import Config
     try:
-        print("Creando tablas si no existen...")
-        Base.metadata.create_all(bind=engine)
+        print("Aplicando migraciones...")
+        command.upgrade(Config(ALEMBIC_INI), "head")
         print("¡Tablas listas!")
     except Exception as e:
-        print(f"Error al inicializar la base de< datos: {e}")
+        print(f"Error al inicializar la base de datos: {e}")
 
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    init_db()
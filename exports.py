@@ -0,0 +1,220 @@
+# exports.py - Exportación de encuestas a CSV o Parquet por streaming
+#
+# Las filas salen de un cursor del lado del servidor en bloques de
+# EXPORT_CHUNK_SIZE y se escriben directo al archivo: CSV con el módulo csv,
+# Parquet con un row group por bloque y las preguntas cerradas (escala,
+# botones, listas), estado y sentimiento como columnas de diccionario. Nunca
+# se arma el archivo entero en memoria, así el pico es un bloque sin importar
+# el tamaño de la exportación.
+# Hasta EXPORT_INLINE_ROWS filas se exporta en el proceso que la pide; más
+# allá se encola tasks.export_task. El archivo se publica con reemplazo
+# atómico en EXPORT_DIR; si falla queda un marcador <archivo>.error con el
+# motivo. EXPORT_DIR no se sirve por HTTP (los archivos traen teléfonos y
+# respuestas): el dashboard lo lee del disco y lo entrega con
+# st.download_button en la sesión de quien lo pidió, así que el worker y
+# Streamlit deben montar la misma carpeta (volumen compartido). La entrega
+# pasa el archivo entero por la memoria de Streamlit: se lee solo al pedir la
+# descarga y nunca más de EXPORT_DELIVERY_MB; las más grandes quedan en el
+# servidor (python exports.py) y el dashboard pide acotar los filtros.
+#
+#   python exports.py csv [--status completed] [--start 2026-01-01] [--end 2026-06-30]
+#   python exports.py parquet ...
+
+import os
+import csv
+import time
+import uuid
+import logging
+import datetime
+from typing import Dict, Optional, Tuple
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select, func, desc
+from database import engine, Feedback
+from dashboard_metrics import survey_filters
+from data_loader import ANSWER_COLUMNS, DATETIME_COLUMNS, categorical_columns
+
+logger = logging.getLogger(__name__)
+
+# Carpeta privada compartida entre el worker y Streamlit (nunca publicada)
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "exports"))
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "10000"))
+EXPORT_INLINE_ROWS = int(os.getenv("EXPORT_INLINE_ROWS", "50000"))
+EXPORT_RETENTION_HOURS = int(os.getenv("EXPORT_RETENTION_HOURS", "24"))
+# Tope de lo que el dashboard carga en memoria para entregar una exportación
+EXPORT_DELIVERY_MB = int(os.getenv("EXPORT_DELIVERY_MB", "200"))
+
+FORMATS = ['csv', 'parquet']
+MIME_TYPES = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+
+EXPORT_COLUMNS = ['user_id', 'status', 'current_step', 'created_at', 'updated_at',
+                  *ANSWER_COLUMNS, 'final_sentiment', 'final_summary']
+INTEGER_COLUMNS = {'current_step'}
+
+def export_statement(status: Optional[str] = None, start: Optional[datetime.date] = None,
+                     end: Optional[datetime.date] = None):
+    """Filas a exportar bajo los filtros del dashboard, más recientes primero"""
+    return (
+        select(*[getattr(Feedback, column) for column in EXPORT_COLUMNS])
+        .where(*survey_filters(status, start, end))
+        .order_by(desc(Feedback.updated_at), desc(Feedback.id))
+    )
+
+def count_rows(status: Optional[str] = None, start: Optional[datetime.date] = None,
+               end: Optional[datetime.date] = None) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).where(*survey_filters(status, start, end))).scalar()
+
+def parquet_schema() -> pa.Schema:
+    dictionary = categorical_columns()
+    fields = []
+    for column in EXPORT_COLUMNS:
+        if column in DATETIME_COLUMNS:
+            kind = pa.timestamp('us')
+        elif column in INTEGER_COLUMNS:
+            kind = pa.int64()
+        elif column in dictionary:
+            kind = pa.dictionary(pa.int32(), pa.string())
+        else:
+            kind = pa.string()
+        fields.append(pa.field(column, kind))
+    return pa.schema(fields)
+
+def _write_csv(path: str, partitions) -> int:
+    written = 0
+    with open(path, 'w', newline='', encoding='utf-8') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(EXPORT_COLUMNS)
+        for rows in partitions:
+            writer.writerows(rows)
+            written += len(rows)
+    return written
+
+def _write_parquet(path: str, partitions) -> int:
+    schema = parquet_schema()
+    dictionary = [field.name for field in schema if pa.types.is_dictionary(field.type)]
+    written = 0
+    with pq.ParquetWriter(path, schema, compression='zstd', use_dictionary=dictionary) as writer:
+        for rows in partitions:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema))
+            written += len(rows)
+        if not written:
+            writer.write_table(schema.empty_table())
+    return written
+
+def new_export_name(fmt: str) -> str:
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato no soportado: {fmt}")
+    return f"encuesta_datos_{datetime.datetime.now():%Y%m%d_%H%M}_{uuid.uuid4().hex[:12]}.{fmt}"
+
+def export_path(name: str) -> str:
+    return os.path.join(EXPORT_DIR, os.path.basename(name))
+
+def export_mime(name: str) -> str:
+    return MIME_TYPES.get(name.rsplit('.', 1)[-1], 'application/octet-stream')
+
+def write_export(name: str, status: Optional[str] = None, start: Optional[datetime.date] = None,
+                 end: Optional[datetime.date] = None, chunk_size: int = EXPORT_CHUNK_SIZE) -> Dict:
+    """Escribe la exportación `name` (el formato sale de la extensión) y la publica"""
+    fmt = name.rsplit('.', 1)[-1]
+    path = export_path(name)
+    temporary = f"{path}.tmp"
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    started = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(
+                export_statement(status, start, end))
+            writer = _write_parquet if fmt == 'parquet' else _write_csv
+            rows = writer(temporary, result.partitions())
+        os.replace(temporary, path)
+    except Exception as e:
+        with open(f"{path}.error", 'w', encoding='utf-8') as marker:
+            marker.write(str(e))
+        raise
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+    stats = {
+        'name': name,
+        'rows': rows,
+        'mb': round(os.path.getsize(path) / 2**20, 1),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"Exportación {name}: {stats['rows']} filas, {stats['mb']} MB en {stats['seconds']}s")
+    return stats
+
+def export_state(name: str) -> Tuple[str, Optional[str]]:
+    """('ready', None) | ('too_large', motivo) | ('failed', motivo) | ('pending', None)"""
+    path = export_path(name)
+    if os.path.exists(path):
+        mb = os.path.getsize(path) / 2**20
+        if mb > EXPORT_DELIVERY_MB:
+            return 'too_large', f"pesa {mb:.0f} MB y el dashboard entrega hasta {EXPORT_DELIVERY_MB} MB"
+        return 'ready', None
+    if os.path.exists(f"{path}.error"):
+        with open(f"{path}.error", encoding='utf-8') as marker:
+            return 'failed', marker.read()
+    return 'pending', None
+
+def read_export(name: str) -> bytes:
+    """Contenido de una exportación lista para st.download_button (hasta EXPORT_DELIVERY_MB)"""
+    state, reason = export_state(name)
+    if state != 'ready':
+        raise ValueError(f"La exportación {name} no se puede entregar: {reason or state}")
+    with open(export_path(name), 'rb') as archivo:
+        return archivo.read()
+
+def queue_export(name: str, status: Optional[str] = None, start: Optional[datetime.date] = None,
+                 end: Optional[datetime.date] = None):
+    """Encola tasks.export_task por nombre (el dashboard no importa tasks.py)"""
+    from celery import Celery
+    producer = Celery('tasks', broker=os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0'))
+    producer.send_task('tasks.export_task', args=[name, status,
+                                                  start.isoformat() if start else None,
+                                                  end.isoformat() if end else None])
+
+def request_export(fmt: str, status: Optional[str] = None, start: Optional[datetime.date] = None,
+                   end: Optional[datetime.date] = None) -> Dict:
+    """Exporta en línea si es chica o la encola; {'name', 'rows', 'background'}"""
+    cleanup_exports()
+    name = new_export_name(fmt)
+    rows = count_rows(status, start, end)
+    background = rows > EXPORT_INLINE_ROWS
+    if background:
+        queue_export(name, status, start, end)
+    else:
+        write_export(name, status, start, end)
+    return {'name': name, 'rows': rows, 'background': background}
+
+def cleanup_exports(hours: int = EXPORT_RETENTION_HOURS) -> int:
+    """Borra exportaciones (y marcadores de error) más viejas que `hours`"""
+    if not os.path.isdir(EXPORT_DIR):
+        return 0
+    cutoff = time.time() - hours * 3600
+    removed = 0
+    for entry in os.scandir(EXPORT_DIR):
+        if entry.is_file() and entry.name.startswith('encuesta_datos_') and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
+            removed += 1
+    return removed
+
+if __name__ == "__main__":
+    import argparse
+    import resource
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    parser = argparse.ArgumentParser(description="Exportar encuestas a CSV o Parquet")
+    parser.add_argument("format", choices=FORMATS)
+    parser.add_argument("--status", default=None)
+    parser.add_argument("--start", type=datetime.date.fromisoformat, default=None)
+    parser.add_argument("--end", type=datetime.date.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    stats = write_export(new_export_name(args.format), args.status, args.start, args.end)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"📦 {export_path(stats['name'])}: {stats['rows']} filas, {stats['mb']} MB "
+          f"en {stats['seconds']}s (pico RSS {peak:.0f} MB)")
@@ -0,0 +1,196 @@
+# funnel_analytics.py - Embudo de abandono por pregunta y tiempos de respuesta
+#
+# Embudo: a partir de status/current_step/updated_at de feedbacks (una fila
+# por persona) se cuenta con np.bincount en qué paso quedó cada encuesta;
+# con una suma acumulada inversa sale cuántas personas alcanzaron, respondieron
+# y abandonaron cada pregunta. Se considera abandonada una encuesta activa sin
+# actividad en FUNNEL_ABANDON_HOURS (el mismo criterio que los recordatorios).
+# Los pasos salteados por una transición 'next' cuentan como alcanzados.
+#
+# Tiempos: survey_answers guarda answered_at por (encuesta, pregunta). El
+# tiempo de una respuesta es la diferencia con la respuesta anterior de la
+# misma encuesta (o con created_at para la primera), calculada con lag() en
+# Postgres; percentiles e histogramas por pregunta se calculan vectorizados.
+# Las diferencias mayores a FUNNEL_MAX_GAP_HOURS se cuentan como pausas (la
+# persona siguió otro día) y no entran en la distribución. El tiempo total de
+# una encuesta completada es su última respuesta menos created_at.
+#
+#   python funnel_analytics.py [--start 2026-01-01] [--end 2026-06-30]
+
+import os
+import logging
+import datetime
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func, extract
+from database import engine, Feedback, SurveyAnswer
+from dashboard_metrics import survey_filters
+from reminders import REMINDER_STALE_HOURS
+from survey_registry import current_survey
+
+logger = logging.getLogger(__name__)
+
+FUNNEL_ABANDON_HOURS = float(os.getenv("FUNNEL_ABANDON_HOURS", str(REMINDER_STALE_HOURS)))
+FUNNEL_MAX_GAP_HOURS = float(os.getenv("FUNNEL_MAX_GAP_HOURS", "12"))
+
+PERCENTILES = (50, 75, 90, 95)
+# Rangos del histograma de tiempo por respuesta (segundos)
+TIME_BINS = (0, 15, 30, 60, 120, 300, 600, 1800, 3600, float('inf'))
+TIME_LABELS = ('<15 s', '15-30 s', '30-60 s', '1-2 min', '2-5 min', '5-10 min', '10-30 min', '30-60 min', '>1 h')
+
+def grouped_percentiles(groups: np.ndarray, values: np.ndarray, n_groups: int,
+                        percentiles: Sequence[float] = PERCENTILES) -> np.ndarray:
+    """Percentiles (interpolación lineal) de `values` por grupo 0..n_groups-1 sin bucles por grupo.
+
+    Devuelve una matriz (n_groups, len(percentiles)) con NaN en grupos vacíos.
+    """
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    starts = np.searchsorted(groups, np.arange(n_groups), side='left')
+    counts = np.searchsorted(groups, np.arange(n_groups), side='right') - starts
+
+    result = np.full((n_groups, len(percentiles)), np.nan)
+    present = counts > 0
+    if not present.any():
+        return result
+    positions = (counts[present, None] - 1) * (np.asarray(percentiles, dtype=float) / 100)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, counts[present, None] - 1)
+    base = starts[present, None]
+    fraction = positions - lower
+    result[present] = values[base + lower] * (1 - fraction) + values[base + upper] * fraction
+    return result
+
+def respondent_steps(start: Optional[datetime.date] = None, end: Optional[datetime.date] = None,
+                     now: Optional[datetime.datetime] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """(paso actual, abandonada) por encuesta en el rango, como arreglos"""
+    now = now or datetime.datetime.utcnow()
+    stale = now - datetime.timedelta(hours=FUNNEL_ABANDON_HOURS)
+    abandoned = (Feedback.status == 'active') & (Feedback.updated_at < stale)
+    statement = select(Feedback.current_step, abandoned).where(*survey_filters(None, start, end))
+    with engine.connect() as conn:
+        rows = conn.execute(statement).all()
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool)
+    steps, flags = zip(*rows)
+    return np.asarray(steps, dtype=np.int64), np.asarray(flags, dtype=bool)
+
+def funnel(steps: np.ndarray, abandoned: np.ndarray, total: Optional[int] = None) -> pd.DataFrame:
+    """Alcanzaron / respondieron / abandonaron / en curso por pregunta (1..total)"""
+    survey = current_survey()
+    total = total or survey.total
+    steps = np.clip(steps, 1, total + 1)
+    at_step = np.bincount(steps, minlength=total + 2)
+    reached = np.cumsum(at_step[::-1])[::-1]             # reached[q] = encuestas con paso >= q
+    dropped = np.bincount(steps[abandoned], minlength=total + 2)
+
+    questions = np.arange(1, total + 1)
+    alcanzaron = reached[questions]
+    respondieron = reached[questions + 1]
+    abandonaron = dropped[questions]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tasa = np.where(alcanzaron > 0, abandonaron / alcanzaron, 0.0)
+        retencion = np.where(reached[1] > 0, alcanzaron / reached[1], 0.0)
+    return pd.DataFrame({
+        'pregunta': questions,
+        'columna': [survey.question(number).column if number < len(survey.questions) else None
+                    for number in questions],
+        'alcanzaron': alcanzaron,
+        'respondieron': respondieron,
+        'abandonaron': abandonaron,
+        'en_curso': alcanzaron - respondieron - abandonaron,
+        'tasa_abandono': tasa,
+        'retencion': retencion,
+    })
+
+def answer_gaps(start: Optional[datetime.date] = None,
+                end: Optional[datetime.date] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """(número de pregunta, segundos desde la respuesta anterior) de cada respuesta en el rango"""
+    previous = func.lag(SurveyAnswer.answered_at).over(
+        partition_by=SurveyAnswer.survey_id, order_by=(SurveyAnswer.answered_at, SurveyAnswer.question_no))
+    seconds = extract('epoch', SurveyAnswer.answered_at - func.coalesce(previous, Feedback.created_at))
+    statement = (
+        select(SurveyAnswer.question_no, seconds)
+        .join(Feedback, Feedback.id == SurveyAnswer.survey_id)
+        .where(*survey_filters(None, start, end))
+    )
+    with engine.connect() as conn:
+        rows = conn.execute(statement).all()
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    questions, gaps = zip(*rows)
+    return np.asarray(questions, dtype=np.int64), np.asarray(gaps, dtype=float)
+
+def answer_times(questions: np.ndarray, seconds: np.ndarray, total: Optional[int] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """(percentiles por pregunta, histograma por pregunta) del tiempo de respuesta"""
+    total = total or current_survey().total
+    valid = ~np.isnan(seconds) & (seconds >= 0) & (questions >= 1) & (questions <= total)
+    questions, seconds = questions[valid], seconds[valid]
+    pause = seconds > FUNNEL_MAX_GAP_HOURS * 3600
+    timed_q, timed_s = questions[~pause] - 1, seconds[~pause]
+
+    stats = pd.DataFrame(grouped_percentiles(timed_q, timed_s, total),
+                         columns=[f"p{int(p)}_s" for p in PERCENTILES])
+    stats.insert(0, 'pregunta', np.arange(1, total + 1))
+    stats.insert(1, 'respuestas', np.bincount(timed_q, minlength=total))
+    stats.insert(2, 'pausas', np.bincount(questions[pause] - 1, minlength=total))
+
+    bins = np.digitize(timed_s, TIME_BINS[1:-1])
+    counts = np.bincount(timed_q * len(TIME_LABELS) + bins, minlength=total * len(TIME_LABELS))
+    histogram = pd.DataFrame({
+        'pregunta': np.repeat(np.arange(1, total + 1), len(TIME_LABELS)),
+        'rango': np.tile(TIME_LABELS, total),
+        'cantidad': counts,
+    })
+    return stats, histogram
+
+def completion_seconds(start: Optional[datetime.date] = None, end: Optional[datetime.date] = None) -> np.ndarray:
+    """Duración (última respuesta - inicio) de cada encuesta completada en el rango"""
+    statement = (
+        select(extract('epoch', func.max(SurveyAnswer.answered_at) - Feedback.created_at))
+        .join(SurveyAnswer, SurveyAnswer.survey_id == Feedback.id)
+        .where(*survey_filters('completed', start, end))
+        .group_by(Feedback.id, Feedback.created_at)
+    )
+    with engine.connect() as conn:
+        values = np.asarray(conn.execute(statement).scalars().all(), dtype=float)
+    return values[~np.isnan(values) & (values >= 0)]
+
+def completion_percentiles(seconds: np.ndarray, percentiles: Sequence[float] = PERCENTILES) -> Dict[str, float]:
+    if not len(seconds):
+        return {}
+    return {f"p{int(p)}_min": round(float(value) / 60, 1)
+            for p, value in zip(percentiles, np.percentile(seconds, percentiles))}
+
+def funnel_report(start: Optional[datetime.date] = None, end: Optional[datetime.date] = None,
+                  now: Optional[datetime.datetime] = None) -> Dict:
+    """{'embudo', 'tiempos', 'histograma', 'finalizacion', 'encuestas'} para el rango de fechas"""
+    steps, abandoned = respondent_steps(start, end, now)
+    questions, gaps = answer_gaps(start, end)
+    times, histogram = answer_times(questions, gaps)
+    durations = completion_seconds(start, end)
+    return {
+        'encuestas': len(steps),
+        'embudo': funnel(steps, abandoned),
+        'tiempos': times,
+        'histograma': histogram,
+        'finalizacion': {'completadas': len(durations), **completion_percentiles(durations)},
+    }
+
+if __name__ == "__main__":
+    import time
+    import argparse
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    parser = argparse.ArgumentParser(description="Embudo de abandono y tiempos de respuesta")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, default=None)
+    parser.add_argument("--end", type=datetime.date.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    report = funnel_report(args.start, args.end)
+    print(f"🔻 {report['encuestas']} encuestas en {time.perf_counter() - started:.2f}s")
+    print(report['embudo'].to_string(index=False))
+    print(report['tiempos'].round(1).to_string(index=False))
+    print(f"⏱️ Finalización: {report['finalizacion']}")
@@ -0,0 +1,283 @@
+# insights.py - Sentimiento y perfil IA precalculados al completar la encuesta
+#
+# El perfil (final_summary) se calcula fuera del webhook y del dashboard:
+#   - en tiempo real, con la cadena Celery que encola tasks.process_survey_response
+#     al completar una encuesta;
+#   - en lote, con el backfill (python insights.py backfill) para filas existentes.
+# Las llamadas a Gemini pasan por un pool acotado (INSIGHTS_CONCURRENCY hilos)
+# con limitador de tasa y reintentos con backoff; los resultados se escriben en
+# un solo UPDATE masivo por página. El dashboard solo lee lo ya guardado.
+#
+# En el backfill varias personas viajan en una misma petición (modo por lotes):
+# se agrupan bajo un presupuesto de tokens, se pide JSON estructurado
+# [{id, sentiment, profile}], se valida ítem por ítem y los que no se puedan
+# usar se recalculan con peticiones individuales. Si falla la petición misma
+# (red, cuota, circuito abierto) no se reparte en individuales: el lote queda
+# pendiente para el próximo backfill. Esos perfiles llevan su propia versión
+# de prompt en summary_hash (PACK_PROMPT_VERSION).
+#
+# final_sentiment lo pone el léxico local al completar (sentiment_lexicon.py);
+# con INSIGHTS_LLM_SENTIMENT=true Gemini lo reemplaza como enriquecimiento.
+
+import os
+import re
+import json
+import time
+import random
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select, update, or_
+from database import SessionLocal, Feedback
+from survey_runs import sync_run_insights_statement
+from ai_profiles import (PROFILE_FIELDS, PROFILE_MIN_ANSWERS, PROFILE_MAX_WORDS, CHARS_PER_TOKEN,
+                         PACK_PROMPT_VERSION, profile_lines, profile_hash, generate_profile, call_gemini)
+from whatsapp_service import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+SENTIMENT_LABELS = ('positivo', 'neutral', 'negativo')
+INSIGHTS_CONCURRENCY = int(os.getenv("INSIGHTS_CONCURRENCY", "4"))
+INSIGHTS_RATE_PER_MINUTE = float(os.getenv("INSIGHTS_RATE_PER_MINUTE", "60"))   # Cuota de la API de Gemini
+INSIGHTS_RETRIES = int(os.getenv("INSIGHTS_RETRIES", "4"))
+INSIGHTS_BACKOFF_SECONDS = float(os.getenv("INSIGHTS_BACKOFF_SECONDS", "2"))
+INSIGHTS_BATCH_SIZE = int(os.getenv("INSIGHTS_BATCH_SIZE", "100"))
+INSIGHTS_LLM_SENTIMENT = os.getenv("INSIGHTS_LLM_SENTIMENT", "false").lower() == "true"
+# Modo por lotes: personas por petición y presupuesto de tokens de entrada
+INSIGHTS_PACK_SIZE = int(os.getenv("INSIGHTS_PACK_SIZE", "20"))
+INSIGHTS_PACK_TOKEN_BUDGET = int(os.getenv("INSIGHTS_PACK_TOKEN_BUDGET", "8000"))
+INSIGHTS_PACK_OUTPUT_TOKENS = 200   # Salida por persona (~80 palabras + JSON)
+
+SENTIMENT_PROMPT = """Clasifica el sentimiento general de esta persona mayor según sus respuestas a una encuesta:
+
+{answers}
+
+Responde solo con una palabra: positivo, neutral o negativo."""
+
+PACK_PROMPT = """Estas son las respuestas de {count} personas mayores a una encuesta. Para cada persona:
+- "sentiment": sentimiento general, exactamente una de: positivo, neutral, negativo
+- "profile": resumen empático en tercera persona de máximo {max_words} palabras que destaque sus fortalezas,
+  personalidad, habilidades y actitud hacia la vida (comprensivo y respetuoso)
+
+{respondents}
+
+Responde solo con un arreglo JSON, un objeto por persona y con el mismo id:
+[{{"id": 123, "sentiment": "positivo", "profile": "..."}}]"""
+
+class InsightError(Exception):
+    """Gemini no devolvió un resultado utilizable"""
+
+def parse_sentiment(text: Optional[str]) -> Optional[str]:
+    """Primera etiqueta válida en la respuesta del modelo"""
+    if not text:
+        return None
+    lowered = text.lower()
+    found = [(lowered.find(label), label) for label in SENTIMENT_LABELS if label in lowered]
+    return min(found)[1] if found else None
+
+def classify_sentiment(lines: List[str]) -> Optional[str]:
+    """Etiqueta de sentimiento con Gemini (None si no hay respuesta válida)"""
+    return parse_sentiment(call_gemini(SENTIMENT_PROMPT.format(answers="\n".join(lines)), max_output_tokens=8))
+
+def with_retries(fn, *args, attempts: int = INSIGHTS_RETRIES, base_delay: float = INSIGHTS_BACKOFF_SECONDS):
+    """Reintenta con backoff exponencial y jitter; relanza el último error"""
+    for attempt in range(1, attempts + 1):
+        try:
+            return fn(*args)
+        except Exception as e:
+            if attempt == attempts:
+                raise
+            wait = base_delay * 2 ** (attempt - 1) * (1 + random.random() / 2)
+            logger.warning(f"Reintento {attempt}/{attempts} en {wait:.1f}s: {str(e)[:80]}")
+            time.sleep(wait)
+
+def compute_insights(answers: Dict) -> Optional[Dict]:
+    """Sentimiento + perfil para un conjunto de respuestas (None si hay muy pocas)"""
+    lines = profile_lines(answers)
+    if len(lines) < PROFILE_MIN_ANSWERS:
+        return None
+    return insights_for_lines(lines)
+
+def insights_for_lines(lines: List[str]) -> Dict:
+    """Perfil (y sentimiento de Gemini si está activado) de una sola persona"""
+    profile, error = generate_profile(lines)
+    if profile is None:
+        raise InsightError(error)
+    row = {'final_summary': profile, 'summary_hash': profile_hash(lines)}
+    if INSIGHTS_LLM_SENTIMENT:
+        sentiment = classify_sentiment(lines)
+        if sentiment is None:
+            raise InsightError("Sentimiento no reconocido")
+        row['final_sentiment'] = sentiment
+    return row
+
+def _cost(lines: List[str]) -> int:
+    return sum(len(line) for line in lines) // CHARS_PER_TOKEN + 1
+
+def pack_items(items: List[Tuple[int, List[str]]], budget_tokens: int = INSIGHTS_PACK_TOKEN_BUDGET,
+               max_items: int = INSIGHTS_PACK_SIZE) -> List[List[Tuple[int, List[str]]]]:
+    """Agrupa (id, líneas) en lotes que no superan el presupuesto ni el máximo de personas"""
+    packs, current, used = [], [], 0
+    for item in items:
+        cost = _cost(item[1])
+        if current and (used + cost > budget_tokens or len(current) >= max_items):
+            packs.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        packs.append(current)
+    return packs
+
+def pack_prompt(pack: List[Tuple[int, List[str]]]) -> str:
+    respondents = "\n\n".join(f"### id={feedback_id}\n" + "\n".join(lines) for feedback_id, lines in pack)
+    return PACK_PROMPT.format(count=len(pack), max_words=PROFILE_MAX_WORDS, respondents=respondents)
+
+def parse_pack_response(text: str, pack: List[Tuple[int, List[str]]]) -> Dict[int, Dict]:
+    """Filas válidas por id; se descartan ids desconocidos, etiquetas inválidas y perfiles vacíos o largos"""
+    raw = re.sub(r"^```(?:json)?\s*|\s*```$", "", (text or "").strip())
+    try:
+        items = json.loads(raw)
+    except ValueError:
+        logger.warning(f"Respuesta por lotes no es JSON: {raw[:80]}")
+        return {}
+    if not isinstance(items, list):
+        return {}
+
+    lines_by_id = dict(pack)
+    rows = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            feedback_id = int(item.get('id'))
+        except (TypeError, ValueError):
+            continue
+        sentiment = str(item.get('sentiment') or '').strip().lower()
+        profile = item.get('profile')
+        if (feedback_id not in lines_by_id or feedback_id in rows
+                or (INSIGHTS_LLM_SENTIMENT and sentiment not in SENTIMENT_LABELS)
+                or not isinstance(profile, str) or not profile.strip()
+                or len(profile.split()) > PROFILE_MAX_WORDS):
+            continue
+        rows[feedback_id] = {
+            'id': feedback_id,
+            'final_summary': profile.strip(),
+            'summary_hash': profile_hash(lines_by_id[feedback_id], PACK_PROMPT_VERSION),
+        }
+        if INSIGHTS_LLM_SENTIMENT:
+            rows[feedback_id]['final_sentiment'] = sentiment
+    return rows
+
+def summarize_pack(pack: List[Tuple[int, List[str]]]) -> Dict[int, Dict]:
+    """Una sola petición (JSON) para todo el lote"""
+    text = call_gemini(pack_prompt(pack), max_output_tokens=INSIGHTS_PACK_OUTPUT_TOKENS * len(pack),
+                       response_mime_type="application/json")
+    return parse_pack_response(text, pack)
+
+def answers_of(survey: Feedback) -> Dict:
+    return {column: getattr(survey, column) for column in PROFILE_FIELDS}
+
+def write_insights(results: Iterable[Dict]) -> int:
+    """UPDATE masivo por clave primaria: [{'id', 'final_sentiment', 'final_summary', 'summary_hash'}, ...]
+
+    En la misma transacción copia el análisis a la corrida ya archivada en survey_runs.
+    """
+    rows = [row for row in results if row]
+    if not rows:
+        return 0
+    db = SessionLocal()
+    try:
+        db.execute(update(Feedback), rows)
+        db.execute(sync_run_insights_statement([row['id'] for row in rows]))
+        db.commit()
+    finally:
+        db.close()
+    return len(rows)
+
+def run_pool(surveys: List[Feedback], concurrency: int = INSIGHTS_CONCURRENCY,
+             limiter: Optional[RateLimiter] = None, packed: bool = True) -> List[Dict]:
+    """Calcula insights de varias encuestas con concurrencia y tasa acotadas"""
+    limiter = limiter or RateLimiter(INSIGHTS_RATE_PER_MINUTE / 60, burst=concurrency)
+
+    def single(item) -> Optional[Dict]:
+        feedback_id, lines = item
+        def attempt():
+            limiter.acquire()
+            return insights_for_lines(lines)
+        try:
+            return {'id': feedback_id, **with_retries(attempt)}
+        except Exception as e:
+            logger.error(f"Insights de la encuesta {feedback_id} fallaron: {str(e)[:100]}")
+            return None
+
+    def batch(pack) -> List[Optional[Dict]]:
+        if not packed:
+            return [single(item) for item in pack]
+        def attempt():
+            limiter.acquire()
+            return summarize_pack(pack)
+        try:
+            found = with_retries(attempt)
+        except Exception as e:
+            # Transporte o circuito abierto: pedirlos uno a uno solo multiplicaría las llamadas fallidas
+            logger.error(f"Lote de {len(pack)} falló, queda para el próximo backfill: {str(e)[:100]}")
+            return []
+        if len(found) < len(pack):
+            logger.info(f"Lote: {len(found)}/{len(pack)} válidos, el resto con peticiones individuales")
+        # Lo que no vino (o no pasó la validación) se pide de forma individual
+        return [found.get(item[0]) or single(item) for item in pack]
+
+    items = [(survey.id, profile_lines(answers_of(survey))) for survey in surveys]
+    items = [item for item in items if len(item[1]) >= PROFILE_MIN_ANSWERS]
+    packs = pack_items(items) if packed else [[item] for item in items]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return [row for rows in pool.map(batch, packs) for row in rows if row]
+
+def backfill_insights(batch_size: int = INSIGHTS_BATCH_SIZE, limit: Optional[int] = None,
+                      force: bool = False, packed: bool = True) -> dict:
+    """Completa sentimiento/perfil de las encuestas completadas que no los tienen"""
+    limiter = RateLimiter(INSIGHTS_RATE_PER_MINUTE / 60, burst=INSIGHTS_CONCURRENCY)
+    stats = {'scanned': 0, 'written': 0}
+    after = 0
+    while limit is None or stats['scanned'] < limit:
+        query = (
+            select(Feedback)
+            .where(Feedback.status == 'completed')
+            .where(Feedback.id > after)
+            .order_by(Feedback.id)
+            .limit(batch_size if limit is None else min(batch_size, limit - stats['scanned']))
+        )
+        if not force:
+            missing = [Feedback.final_summary.is_(None)]
+            if INSIGHTS_LLM_SENTIMENT:
+                missing.append(Feedback.final_sentiment.is_(None))
+            query = query.where(or_(*missing))
+
+        db = SessionLocal()
+        try:
+            page = db.execute(query).scalars().all()
+        finally:
+            db.close()
+        if not page:
+            break
+        after = page[-1].id
+
+        stats['written'] += write_insights(run_pool(page, limiter=limiter, packed=packed))
+        stats['scanned'] += len(page)
+        logger.info(f"Backfill de insights: {stats['written']}/{stats['scanned']}")
+    return stats
+
+if __name__ == "__main__":
+    import argparse
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    parser = argparse.ArgumentParser(description="Sentimiento y perfiles IA precalculados")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=INSIGHTS_BATCH_SIZE)
+    parser.add_argument("--force", action="store_true", help="Recalcular también las que ya tienen valores")
+    parser.add_argument("--single", action="store_true", help="Una persona por petición (sin lotes)")
+    args = parser.parse_args()
+
+    print(backfill_insights(args.batch_size, args.limit, args.force, packed=not args.single))
@@ -0,0 +1,63 @@
+# kpi_views.py - Refresco de las vistas materializadas del dashboard
+#
+# kpi_daily (migración 0013) guarda los conteos que el dashboard pedía en cada
+# interacción. Una tarea beat la refresca cada KPI_REFRESH_MINUTES con
+# REFRESH MATERIALIZED VIEW CONCURRENTLY (las lecturas siguen sirviendo la
+# versión anterior mientras tanto) y anota la hora en view_refreshes, que el
+# dashboard muestra como frescura de los indicadores.
+#
+#   python kpi_views.py refresh
+#   python kpi_views.py status
+
+import os
+import time
+import logging
+import datetime
+from typing import Dict, Optional
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+from database import engine, ViewRefresh, KPI_DAILY_VIEW
+
+logger = logging.getLogger(__name__)
+
+KPI_REFRESH_MINUTES = int(os.getenv("KPI_REFRESH_MINUTES", "5"))
+
+MATERIALIZED_VIEWS = [KPI_DAILY_VIEW]
+
+def refresh_view(name: str) -> float:
+    """REFRESH CONCURRENTLY de una vista y registro de la hora; devuelve los segundos"""
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name}"))
+    seconds = round(time.perf_counter() - started, 3)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(ViewRefresh)
+            .values(view_name=name, refreshed_at=datetime.datetime.utcnow(), seconds=seconds)
+            .on_conflict_do_update(index_elements=[ViewRefresh.view_name],
+                                   set_={'refreshed_at': datetime.datetime.utcnow(), 'seconds': seconds})
+        )
+    logger.info(f"Vista {name} refrescada en {seconds}s")
+    return seconds
+
+def refresh_kpi_views() -> Dict[str, float]:
+    return {name: refresh_view(name) for name in MATERIALIZED_VIEWS}
+
+def last_refresh(name: str = KPI_DAILY_VIEW) -> Optional[datetime.datetime]:
+    with engine.connect() as conn:
+        return conn.execute(select(ViewRefresh.refreshed_at).where(ViewRefresh.view_name == name)).scalar()
+
+if __name__ == "__main__":
+    import argparse
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    parser = argparse.ArgumentParser(description="Vistas materializadas del dashboard")
+    parser.add_argument("command", choices=["refresh", "status"])
+    args = parser.parse_args()
+
+    if args.command == "refresh":
+        for name, seconds in refresh_kpi_views().items():
+            print(f"✅ {name} refrescada en {seconds}s")
+    else:
+        for name in MATERIALIZED_VIEWS:
+            print(f"🕒 {name}: último refresco {last_refresh(name) or 'nunca'}")
@@ -0,0 +1,214 @@
+# llm_client.py - Cliente de Gemini con salud por modelo
+#
+# En vez de probar los modelos siempre en el mismo orden (y pagar el timeout de
+# cada uno que esté caído), el cliente:
+#   - configura genai una sola vez y reutiliza los objetos GenerativeModel;
+#   - lleva un circuit breaker por modelo: tras LLM_FAILURE_THRESHOLD fallos
+#     seguidos el modelo se salta durante LLM_RESET_SECONDS, luego se deja pasar
+#     una sola llamada de prueba (half-open) antes de volver a usarlo;
+#   - ordena los candidatos por tasa de éxito reciente y latencia p50;
+#   - expone métricas por modelo (metrics()).
+# FakeModel es un sustituto determinista para pruebas y ensayos sin API.
+
+import os
+import time
+import logging
+import threading
+import statistics
+from collections import deque
+from typing import Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+LLM_FAILURE_THRESHOLD = int(os.getenv("LLM_FAILURE_THRESHOLD", "3"))
+LLM_RESET_SECONDS = float(os.getenv("LLM_RESET_SECONDS", "60"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+LLM_HEALTH_WINDOW = int(os.getenv("LLM_HEALTH_WINDOW", "50"))    # Últimas llamadas consideradas
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+class LLMUnavailable(Exception):
+    """Ningún modelo disponible (todos fallaron o tienen el circuito abierto)"""
+
+class ModelHealth:
+    """Circuit breaker + ventana de resultados y latencias de un modelo"""
+
+    def __init__(self, name: str, failure_threshold: int = LLM_FAILURE_THRESHOLD,
+                 reset_seconds: float = LLM_RESET_SECONDS, window: int = LLM_HEALTH_WINDOW,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.calls = 0
+        self.failures = 0
+        self.outcomes = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """¿Se puede llamar ahora? En half-open solo pasa una llamada de prueba"""
+        with self._lock:
+            if self.state == OPEN and self.clock() - self.opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+                self.probing = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self.calls += 1
+            self.outcomes.append(True)
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+            self.state = CLOSED
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            self.outcomes.append(False)
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning(f"Circuito abierto para {self.name} ({self.consecutive_failures} fallos seguidos)")
+                self.state = OPEN
+                self.opened_at = self.clock()
+                self.probing = False
+
+    @property
+    def success_rate(self) -> float:
+        # Sin historial se asume sano para que los modelos nuevos se prueben
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 1.0
+
+    @property
+    def p50(self) -> float:
+        return statistics.median(self.latencies) if self.latencies else 0.0
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'calls': self.calls,
+                'failures': self.failures,
+                'consecutive_failures': self.consecutive_failures,
+                'success_rate': round(self.success_rate, 3),
+                'p50_ms': round(self.p50 * 1000, 1),
+            }
+
+_genai_lock = threading.Lock()
+_genai_configured = False
+
+def gemini_model(name: str):
+    """GenerativeModel real; configura genai una sola vez por proceso"""
+    global _genai_configured
+    import google.generativeai as genai
+    with _genai_lock:
+        if not _genai_configured:
+            genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+            _genai_configured = True
+    return genai.GenerativeModel(name)
+
+class LLMClient:
+    """Llama al mejor modelo disponible y cae al siguiente si falla"""
+
+    def __init__(self, model_names: Sequence[str], model_factory: Callable[[str], object] = gemini_model,
+                 timeout: float = LLM_TIMEOUT_SECONDS, clock: Callable[[], float] = time.monotonic, **health_options):
+        self.model_names = list(model_names)
+        self.model_factory = model_factory
+        self.timeout = timeout
+        self.clock = clock
+        self.health = {name: ModelHealth(name, clock=clock, **health_options) for name in self.model_names}
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def model(self, name: str):
+        """Objeto de modelo reutilizable (se crea una vez)"""
+        with self._lock:
+            if name not in self._models:
+                self._models[name] = self.model_factory(name)
+            return self._models[name]
+
+    def ranked(self) -> List[str]:
+        """Modelos por tasa de éxito (desc) y p50 (asc); el orden configurado desempata"""
+        position = {name: index for index, name in enumerate(self.model_names)}
+        return sorted(self.model_names, key=lambda name: (
+            -self.health[name].success_rate, self.health[name].p50, position[name]))
+
+    def generate(self, prompt: str, **generation_config) -> str:
+        """Texto generado por el primer modelo que responda; LLMUnavailable si ninguno"""
+        last_error = None
+        for name in self.ranked():
+            health = self.health[name]
+            if not health.allow():
+                continue
+            started = self.clock()
+            try:
+                response = self.model(name).generate_content(
+                    prompt, generation_config=generation_config, request_options={"timeout": self.timeout})
+                text = response.text.strip()
+            except Exception as e:
+                health.record_failure()
+                logger.warning(f"Error con {name}: {str(e)[:100]}")
+                last_error = e
+                continue
+            health.record_success(self.clock() - started)
+            return text
+
+        if last_error is not None:
+            raise last_error
+        raise LLMUnavailable("Todos los modelos tienen el circuito abierto")
+
+    def metrics(self) -> Dict[str, Dict]:
+        return {name: self.health[name].snapshot() for name in self.model_names}
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+class FakeModel:
+    """Sustituto determinista de GenerativeModel.
+
+    script: lista de resultados que se consumen en orden (el último se repite);
+    cada uno es un texto, una excepción a lanzar o una función que recibe el
+    prompt y devuelve el texto. latency avanza el reloj falso (FakeClock) en
+    vez de dormir.
+    """
+
+    def __init__(self, script: Sequence, latency: float = 0.0, clock: Optional['FakeClock'] = None):
+        self.script = list(script)
+        self.latency = latency
+        self.clock = clock
+        self.calls = 0
+
+    def generate_content(self, prompt, generation_config=None, request_options=None):
+        result = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        if self.clock is not None:
+            self.clock.advance(self.latency)
+        if isinstance(result, Exception):
+            raise result
+        if callable(result):
+            result = result(prompt)
+        return FakeResponse(result)
+
+class FakeClock:
+    """Reloj manual para pruebas"""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
@@ -1,62 +1,29 @@
 # migrate_db.py - Script para migrar y actualizar la base de datos
+#
+# Las migraciones viven en migrations/versions (Alembic). Cada revisión corre
+# en transacciones cortas con lock_timeout, construye índices CONCURRENTLY y
+# hace los backfills en lotes, de modo que se puede migrar con el bot en línea.
+#
+# Uso:
+#   python migrate_db.py                                  # aplica todas las revisiones pendientes
+#   python migrate_db.py --revision 0003_hot_query_indexes
 
-import os
-from sqlalchemy import create_engine, text
+import argparse
+from alembic import command
+from alembic.config import Config
 from dotenv import load_dotenv
-from database import init_db, SessionLocal
+from database import ALEMBIC_INI
 
 # Cargar variables de entorno
 load_dotenv()
 
-def migrate_database():
-    """Ejecuta migraciones necesarias para la base de datos"""
+def migrate_database(revision="head"):
+    """Aplica las migraciones de Alembic hasta `revision`"""
     try:
         print("🔄 Iniciando migración de base de datos...")
-        
-        # Crear tablas si no existen
-        print("📋 Creando/actualizando tablas...")
-        init_db()
-        
-        # Obtener sesión de base de datos
-        db = SessionLocal()
-        
-        try:
-            # Verificar si las nuevas columnas existen
-            print("🔍 Verificando nuevas columnas...")
-            
-            # Lista de columnas a agregar
-            new_columns = [
-                ("is_in_followup", "INTEGER DEFAULT 0"),
-                ("followup_question", "INTEGER"),
-                ("q13b_circunstancias_soledad", "TEXT")
-            ]
-            
-            for column_name, column_type in new_columns:
-                try:
-                    # Intentar agregar la columna si no existe
-                    alter_query = f"ALTER TABLE feedbacks ADD COLUMN {column_name} {column_type};"
-                    db.execute(text(alter_query))
-                    print(f"✅ Columna agregada: {column_name}")
-                except Exception as e:
-                    if "already exists" in str(e).lower() or "duplicate column" in str(e).lower():
-                        print(f"ℹ️  Columna ya existe: {column_name}")
-                    else:
-                        print(f"⚠️  Error agregando {column_name}: {e}")
-            
-            # Actualizar tipo de columna q13_soledad
-            try:
-                # En PostgreSQL, cambiar el tipo de columna
-                db.execute(text("ALTER TABLE feedbacks ALTER COLUMN q13_soledad TYPE VARCHAR(100);"))
-                print("✅ Tipo de columna q13_soledad actualizado")
-            except Exception as e:
-                print(f"ℹ️  q13_soledad: {e}")
-            
-            db.commit()
-            print("💾 Cambios guardados en la base de datos")
-            
-        finally:
-            db.close()
-        
+        config = Config(ALEMBIC_INI)
+        command.current(config)
+        command.upgrade(config, revision)
         print("🎉 Migración completada exitosamente!")
         return True
         
@@ -65,8 +32,12 @@ def migrate_database():
         return False
 
 if __name__ == "__main__":
-    success = migrate_database()
+    parser = argparse.ArgumentParser(description="Migraciones versionadas (Alembic)")
+    parser.add_argument("--revision", default="head", help="Revisión destino (por defecto: head)")
+    args = parser.parse_args()
+
+    success = migrate_database(args.revision)
     if success:
-        print("\n✨ Base de datos lista para preguntas condicionales!")
+        print("\n✨ Base de datos actualizada!")
     else:
-        print("\n🚫 Migración falló. Revisar errores arriba.")
\ No newline at end of file
+        print("\n🚫 Migración falló. Revisar errores arriba.")
@@ -0,0 +1,55 @@
+# migrations/env.py - Entorno de Alembic (misma URL y modelos que database.py)
+
+import os
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import create_engine
+from database import DATABASE_URL, Base
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Guardas de lock: un ALTER que no obtiene su lock en pocos segundos falla
+# (y se reintenta) en vez de quedar en cola y bloquear detrás de él los
+# UPDATE del webhook mientras el bot está en producción.
+MIGRATION_LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "3s")
+MIGRATION_STATEMENT_TIMEOUT = os.getenv("MIGRATION_STATEMENT_TIMEOUT", "0")
+
+def run_migrations_offline():
+    """Genera el SQL sin conectarse (alembic upgrade head --sql)"""
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        transaction_per_migration=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    """Cada revisión corre en su propia transacción corta"""
+    connectable = config.attributes.get("engine") or create_engine(
+        DATABASE_URL,
+        connect_args={
+            "options": f"-c lock_timeout={MIGRATION_LOCK_TIMEOUT} "
+                       f"-c statement_timeout={MIGRATION_STATEMENT_TIMEOUT}"
+        },
+    )
+
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            transaction_per_migration=True,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
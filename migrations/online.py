@@ -0,0 +1,71 @@
+# migrations/online.py - Utilidades para migraciones sin detener el bot
+#
+# Todas reciben una conexión en AUTOCOMMIT (op.get_context().autocommit_block()),
+# de modo que cada sentencia es su propia transacción corta.
+
+import os
+import time
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+LOCK_NOT_AVAILABLE = "55P03"
+
+DDL_RETRY_ATTEMPTS = int(os.getenv("MIGRATION_DDL_RETRIES", "5"))
+# CREATE INDEX CONCURRENTLY no bloquea escrituras: puede esperar sin límite
+# a que terminen las transacciones en curso.
+INDEX_LOCK_TIMEOUT = os.getenv("MIGRATION_INDEX_LOCK_TIMEOUT", "0")
+BACKFILL_BATCH_SIZE = int(os.getenv("MIGRATION_BACKFILL_BATCH", "5000"))
+BACKFILL_PAUSE_SECONDS = float(os.getenv("MIGRATION_BACKFILL_PAUSE", "0.05"))
+
+def _is_lock_timeout(error):
+    return getattr(getattr(error, "orig", None), "pgcode", None) == LOCK_NOT_AVAILABLE
+
+def guarded_execute(conn, sql, params=None, attempts=DDL_RETRY_ATTEMPTS):
+    """Ejecuta una sentencia reintentando con backoff si vence el lock_timeout"""
+    for attempt in range(1, attempts + 1):
+        try:
+            return conn.execute(text(sql), params or {})
+        except DBAPIError as e:
+            if not _is_lock_timeout(e) or attempt == attempts:
+                raise
+            wait = 2 ** attempt
+            print(f"⏳ Lock no disponible (intento {attempt}/{attempts}), reintentando en {wait}s...")
+            time.sleep(wait)
+
+def drop_invalid_index(conn, index_name):
+    """Un CREATE INDEX CONCURRENTLY interrumpido deja un índice INVALID: se elimina para reintentar"""
+    invalid = conn.execute(text("""
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = :name AND pg_table_is_visible(c.oid) AND NOT i.indisvalid
+    """), {"name": index_name}).scalar()
+    if invalid:
+        print(f"⚠️  Índice inválido encontrado, reconstruyendo: {index_name}")
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}"))
+
+def create_index_concurrently(conn, index_name, ddl):
+    """CREATE INDEX CONCURRENTLY idempotente (el DDL debe llevar IF NOT EXISTS)"""
+    drop_invalid_index(conn, index_name)
+    previous = conn.execute(text("SHOW lock_timeout")).scalar()
+    conn.execute(text(f"SET lock_timeout = '{INDEX_LOCK_TIMEOUT}'"))
+    try:
+        conn.execute(text(ddl))
+    finally:
+        conn.execute(text(f"SET lock_timeout = '{previous}'"))
+    print(f"✅ Índice listo: {index_name}")
+
+def batched_backfill(conn, sql, params=None, table="feedbacks", key="id",
+                     batch_size=BACKFILL_BATCH_SIZE, pause=BACKFILL_PAUSE_SECONDS):
+    """Ejecuta `sql` por rangos de `key` (:lo, :hi], una transacción corta por lote"""
+    lo, hi = conn.execute(text(f"SELECT min({key}), max({key}) FROM {table}")).one()
+    if lo is None:
+        return 0
+
+    total = 0
+    start = lo - 1
+    while start < hi:
+        end = start + batch_size
+        total += guarded_execute(conn, sql, {**(params or {}), "lo": start, "hi": end}).rowcount
+        start = end
+        if pause:
+            time.sleep(pause)
+    return total
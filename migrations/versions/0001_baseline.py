@@ -0,0 +1,72 @@
+"""Esquema base de feedbacks (estado previo a Alembic)
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-19 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+QUESTION_COLUMNS = [
+    ("q1_actividades_productivas", sa.Text()),
+    ("q2_experiencia_valor", sa.Text()),
+    ("q3_nivel_productividad", sa.String(10)),
+    ("q4_uso_tecnologia", sa.String(50)),
+    ("q5_aprendizaje_tecnologia", sa.Text()),
+    ("q6_oportunidades_digitales", sa.String(10)),
+    ("q7_actividades_proposito", sa.Text()),
+    ("q8_importancia_utilidad", sa.Text()),
+    ("q9_nivel_proposito", sa.String(10)),
+    ("q10_situacion_vivienda", sa.String(100)),
+    ("q11_entorno_cercano", sa.Text()),
+    ("q12_frecuencia_social", sa.String(100)),
+    ("q13_soledad", sa.Text()),
+    ("q14_nivel_apoyo_social", sa.String(10)),
+    ("q15_actividades_disfrute", sa.Text()),
+    ("q16_frecuencia_placer", sa.String(100)),
+    ("q17_satisfaccion_disfrute", sa.String(10)),
+    ("q18_edad", sa.Text()),
+    ("q19_experiencias_discriminacion", sa.Text()),
+    ("q20_espacios_discriminacion", sa.Text()),
+    ("q21_frecuencia_discriminacion", sa.String(10)),
+    ("q22_filosofia_vida", sa.Text()),
+    ("q23_mensaje_generaciones", sa.Text()),
+    ("q24_compartir_adicional", sa.Text()),
+    ("q25_experiencias_recientes", sa.Text()),
+    ("q26_servicios_necesarios", sa.Text()),
+    ("q27_limitaciones_fisicas", sa.Text()),
+]
+
+
+def upgrade() -> None:
+    # Las bases existentes (creadas con init_db/migrate_db) ya tienen la tabla:
+    # la revisión base solo la crea en instalaciones nuevas.
+    if sa.inspect(op.get_bind()).has_table("feedbacks"):
+        return
+
+    op.create_table(
+        "feedbacks",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.String()),
+        sa.Column("status", sa.String(50)),
+        sa.Column("current_step", sa.Integer()),
+        *[sa.Column(name, type_, nullable=True) for name, type_ in QUESTION_COLUMNS],
+        sa.Column("final_sentiment", sa.String(), nullable=True),
+        sa.Column("final_summary", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_feedbacks_id", "feedbacks", ["id"])
+    op.create_index("ix_feedbacks_user_id", "feedbacks", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("feedbacks")
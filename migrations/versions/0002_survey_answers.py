@@ -0,0 +1,125 @@
+"""Respuestas normalizadas (survey_answers) y vista de compatibilidad
+
+Revision ID: 0002_survey_answers
+Revises: 0001_baseline
+Create Date: 2026-10-19 09:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.online import batched_backfill
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_survey_answers'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+# Definición fija de esta revisión: no se importan database ni survey_questions,
+# así un cambio posterior del cuestionario no altera lo que hace 0002
+ANSWERS_WIDE_VIEW = "feedbacks_answers_wide"
+
+# (número, columna, es escala 1-5, opciones cerradas)
+QUESTIONS = [
+    (1, "q1_actividades_productivas", False, []),
+    (2, "q2_experiencia_valor", False, []),
+    (3, "q3_nivel_productividad", True, ["1 - Nada", "2 - Poco", "3 - Moderado", "4 - Bastante", "5 - Demasiado"]),
+    (4, "q4_uso_tecnologia", False, ["Sí, frecuentemente", "Ocasionalmente", "No las uso"]),
+    (5, "q5_aprendizaje_tecnologia", False, []),
+    (6, "q6_oportunidades_digitales", True, ["1 - Ninguna", "2 - Pocas", "3 - Algunas", "4 - Muchas", "5 - Muchísimas"]),
+    (7, "q7_actividades_proposito", False, []),
+    (8, "q8_importancia_utilidad", False, []),
+    (9, "q9_nivel_proposito", True, ["1 - Sin propósito", "2 - Poco", "3 - Moderado", "4 - Fuerte", "5 - Muy fuerte"]),
+    (10, "q10_situacion_vivienda", False, ["Vivo solo/a", "Vivo acompañado/a", "Prefiero no decir"]),
+    (11, "q11_entorno_cercano", False, []),
+    (12, "q12_frecuencia_social", False, ["Diariamente", "Varias x semana", "1 vez x semana", "Algunas x mes", "Raramente", "Nunca"]),
+    (13, "q13_soledad", False, []),
+    (14, "q14_nivel_apoyo_social", True, ["1 - Sin apoyo", "2 - Poco", "3 - Moderado", "4 - Mucho", "5 - Excelente"]),
+    (15, "q15_actividades_disfrute", False, []),
+    (16, "q16_frecuencia_placer", False, ["Diariamente", "Varias x semana", "1 vez x semana", "Algunas x mes", "Raramente", "Nunca"]),
+    (17, "q17_satisfaccion_disfrute", True, ["1 - Nada", "2 - Poco", "3 - Moderado", "4 - Mucho", "5 - Completo"]),
+    (18, "q18_edad", False, ["55-60 años", "61-65 años", "66-70 años", "71-75 años", "76-80 años", "81-85 años", "86-90 años", "Más de 90 años", "Prefiero no decir"]),
+    (19, "q19_experiencias_discriminacion", False, []),
+    (20, "q20_espacios_discriminacion", False, []),
+    (21, "q21_frecuencia_discriminacion", True, ["1 - Nunca", "2 - Raramente", "3 - Ocasionalmente", "4 - Frecuentemente", "5 - Muy frecuentemente"]),
+    (22, "q22_filosofia_vida", False, []),
+    (23, "q23_mensaje_generaciones", False, []),
+    (24, "q24_compartir_adicional", False, []),
+    (25, "q25_experiencias_recientes", False, []),
+    (26, "q26_servicios_necesarios", False, []),
+    (27, "q27_limitaciones_fisicas", False, []),
+]
+
+ANSWERS_WIDE_VIEW_SQL = """CREATE OR REPLACE VIEW feedbacks_answers_wide AS
+SELECT
+    f.id, f.user_id, f.status, f.current_step, f.created_at, f.updated_at,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 1) AS q1_actividades_productivas,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 2) AS q2_experiencia_valor,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 3) AS q3_nivel_productividad,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 4) AS q4_uso_tecnologia,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 5) AS q5_aprendizaje_tecnologia,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 6) AS q6_oportunidades_digitales,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 7) AS q7_actividades_proposito,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 8) AS q8_importancia_utilidad,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 9) AS q9_nivel_proposito,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 10) AS q10_situacion_vivienda,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 11) AS q11_entorno_cercano,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 12) AS q12_frecuencia_social,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 13) AS q13_soledad,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 14) AS q14_nivel_apoyo_social,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 15) AS q15_actividades_disfrute,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 16) AS q16_frecuencia_placer,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 17) AS q17_satisfaccion_disfrute,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 18) AS q18_edad,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 19) AS q19_experiencias_discriminacion,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 20) AS q20_espacios_discriminacion,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 21) AS q21_frecuencia_discriminacion,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 22) AS q22_filosofia_vida,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 23) AS q23_mensaje_generaciones,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 24) AS q24_compartir_adicional,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 25) AS q25_experiencias_recientes,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 26) AS q26_servicios_necesarios,
+    max(coalesce(a.normalized_option, a.raw_text)) FILTER (WHERE a.question_no = 27) AS q27_limitaciones_fisicas,
+    f.final_sentiment, f.final_summary
+FROM feedbacks f
+LEFT JOIN survey_answers a ON a.survey_id = f.id
+GROUP BY f.id"""
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table("survey_answers"):
+        op.create_table(
+            "survey_answers",
+            sa.Column("survey_id", sa.Integer(), sa.ForeignKey("feedbacks.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("question_no", sa.SmallInteger(), primary_key=True),
+            sa.Column("raw_text", sa.Text(), nullable=True),
+            sa.Column("normalized_option", sa.String(100), nullable=True),
+            sa.Column("scale_value", sa.SmallInteger(), nullable=True),
+            sa.Column("answered_at", sa.DateTime()),
+        )
+        op.create_index("ix_survey_answers_question_scale", "survey_answers", ["question_no", "scale_value"])
+    op.execute(ANSWERS_WIDE_VIEW_SQL)
+
+    # Copia de las columnas anchas en lotes pequeños, fuera de la transacción de DDL
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        for number, column, is_scale, options in QUESTIONS:
+            normalized_sql = f"CASE WHEN {column} = ANY(:options) THEN {column} END" if options else "NULL"
+            scale_sql = (
+                f"CASE WHEN {column} ~ '^[1-5] - ' THEN substr({column}, 1, 1)::smallint END"
+                if is_scale else "NULL"
+            )
+            copied = batched_backfill(conn, f"""
+                INSERT INTO survey_answers (survey_id, question_no, raw_text, normalized_option, scale_value, answered_at)
+                SELECT id, {number}, {column}, {normalized_sql}, {scale_sql}, updated_at
+                FROM feedbacks
+                WHERE id > :lo AND id <= :hi AND {column} IS NOT NULL AND {column} <> ''
+                ON CONFLICT (survey_id, question_no) DO NOTHING
+            """, {"options": options})
+            print(f"✅ Pregunta {number}: {copied} respuestas copiadas a survey_answers")
+
+
+def downgrade() -> None:
+    op.execute(f"DROP VIEW IF EXISTS {ANSWERS_WIDE_VIEW}")
+    op.drop_table("survey_answers")
@@ -0,0 +1,62 @@
+"""Unicidad en user_id e índices de consultas calientes (CONCURRENTLY)
+
+Revision ID: 0003_hot_query_indexes
+Revises: 0002_survey_answers
+Create Date: 2026-10-19 09:20:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.online import create_index_concurrently, guarded_execute
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_hot_query_indexes'
+down_revision = '0002_survey_answers'
+branch_labels = None
+depends_on = None
+
+HOT_QUERY_INDEXES = [
+    ("uq_feedbacks_user_id",
+     "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_feedbacks_user_id ON feedbacks (user_id)"),
+    ("ix_feedbacks_status_created_at",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_feedbacks_status_created_at ON feedbacks (status, created_at)"),
+    ("ix_feedbacks_active_updated_at",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_feedbacks_active_updated_at ON feedbacks (updated_at) "
+     "WHERE status = 'active'"),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        duplicates = conn.execute(sa.text(
+            "SELECT user_id, count(*) FROM feedbacks GROUP BY user_id HAVING count(*) > 1 LIMIT 10"
+        )).fetchall()
+        if duplicates:
+            raise RuntimeError(f"Hay user_id duplicados, no se puede crear la unicidad: {duplicates}")
+
+        for index_name, ddl in HOT_QUERY_INDEXES:
+            create_index_concurrently(conn, index_name, ddl)
+
+        # Promover el índice único a constraint (lock breve, no reescanea la tabla)
+        has_constraint = conn.execute(sa.text(
+            "SELECT 1 FROM pg_constraint WHERE conname = 'uq_feedbacks_user_id' AND conrelid = 'feedbacks'::regclass"
+        )).scalar()
+        if not has_constraint:
+            guarded_execute(conn, "ALTER TABLE feedbacks ADD CONSTRAINT uq_feedbacks_user_id "
+                                  "UNIQUE USING INDEX uq_feedbacks_user_id")
+
+        # El índice no único anterior queda redundante
+        conn.execute(sa.text("DROP INDEX CONCURRENTLY IF EXISTS ix_feedbacks_user_id"))
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        create_index_concurrently(
+            conn, "ix_feedbacks_user_id",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_feedbacks_user_id ON feedbacks (user_id)")
+        guarded_execute(conn, "ALTER TABLE feedbacks DROP CONSTRAINT IF EXISTS uq_feedbacks_user_id")
+        conn.execute(sa.text("DROP INDEX CONCURRENTLY IF EXISTS ix_feedbacks_status_created_at"))
+        conn.execute(sa.text("DROP INDEX CONCURRENTLY IF EXISTS ix_feedbacks_active_updated_at"))
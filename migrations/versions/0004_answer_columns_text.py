@@ -0,0 +1,43 @@
+"""Columnas de respuesta a TEXT sin reescribir la tabla
+
+Reemplaza el ALTER COLUMN q13_soledad TYPE VARCHAR(100) de migrate_db.py, que
+truncaba respuestas largas. VARCHAR(n) -> TEXT es binariamente compatible en
+PostgreSQL: solo cambia el catálogo (lock breve, sin reescritura ni rescan).
+Las escalas guardaban opciones como "5 - Muy frecuentemente" en VARCHAR(10).
+
+Revision ID: 0004_answer_columns_text
+Revises: 0003_hot_query_indexes
+Create Date: 2026-10-19 09:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.online import guarded_execute
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_answer_columns_text'
+down_revision = '0003_hot_query_indexes'
+branch_labels = None
+depends_on = None
+
+VARCHAR_ANSWER_COLUMNS = [
+    "q3_nivel_productividad", "q4_uso_tecnologia", "q6_oportunidades_digitales",
+    "q9_nivel_proposito", "q10_situacion_vivienda", "q12_frecuencia_social",
+    "q13_soledad", "q14_nivel_apoyo_social", "q16_frecuencia_placer",
+    "q17_satisfaccion_disfrute", "q21_frecuencia_discriminacion",
+]
+
+
+def upgrade() -> None:
+    # Un ALTER por columna en su propia transacción: cada lock dura milisegundos
+    # y, si vence lock_timeout, se reintenta sin bloquear al webhook.
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        for column in VARCHAR_ANSWER_COLUMNS:
+            guarded_execute(conn, f"ALTER TABLE feedbacks ALTER COLUMN {column} TYPE TEXT")
+
+
+def downgrade() -> None:
+    # Volver a VARCHAR(n) podría truncar respuestas: no se revierte.
+    pass
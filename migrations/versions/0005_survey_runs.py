@@ -0,0 +1,106 @@
+"""Historial de corridas (survey_runs) particionado por mes en created_at
+
+Cada encuesta completada se copia a survey_runs antes de reiniciarse, así
+start_new_survey ya no pisa la historia. Las particiones mensuales permiten
+podar por rango de fechas y separar (DETACH) las viejas hacia el archivo.
+
+Revision ID: 0005_survey_runs
+Revises: 0004_answer_columns_text
+Create Date: 2026-10-19 10:00:00
+
+"""
+import datetime
+from alembic import op
+import sqlalchemy as sa
+from migrations.online import batched_backfill
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_survey_runs'
+down_revision = '0004_answer_columns_text'
+branch_labels = None
+depends_on = None
+
+# Definición fija de esta revisión (no se importan survey_questions ni survey_runs:
+# sus cambios posteriores no deben alterar lo que hace 0005 en una base nueva)
+ANSWER_COLUMNS = [
+    "q1_actividades_productivas", "q2_experiencia_valor", "q3_nivel_productividad", "q4_uso_tecnologia",
+    "q5_aprendizaje_tecnologia", "q6_oportunidades_digitales", "q7_actividades_proposito",
+    "q8_importancia_utilidad", "q9_nivel_proposito", "q10_situacion_vivienda", "q11_entorno_cercano",
+    "q12_frecuencia_social", "q13_soledad", "q14_nivel_apoyo_social", "q15_actividades_disfrute",
+    "q16_frecuencia_placer", "q17_satisfaccion_disfrute", "q18_edad", "q19_experiencias_discriminacion",
+    "q20_espacios_discriminacion", "q21_frecuencia_discriminacion", "q22_filosofia_vida",
+    "q23_mensaje_generaciones", "q24_compartir_adicional", "q25_experiencias_recientes",
+    "q26_servicios_necesarios", "q27_limitaciones_fisicas",
+]
+PARTITIONS_AHEAD = 2
+RUN_COLUMNS = ["user_id", "status", "current_step", "updated_at"] + ANSWER_COLUMNS + ["final_sentiment", "final_summary"]
+
+
+def month_start(value: datetime.datetime) -> datetime.date:
+    return datetime.date(value.year, value.month, 1)
+
+
+def next_month(value: datetime.date) -> datetime.date:
+    return datetime.date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def partition_ddl(month: datetime.date) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS survey_runs_{month:%Y_%m} PARTITION OF survey_runs "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+    )
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    answer_columns_ddl = ",\n".join(f"{column} TEXT" for column in ANSWER_COLUMNS)
+    op.execute("CREATE SEQUENCE IF NOT EXISTS survey_runs_id_seq")
+    op.execute(f"""
+        CREATE TABLE IF NOT EXISTS survey_runs (
+            id BIGINT NOT NULL DEFAULT nextval('survey_runs_id_seq'),
+            created_at TIMESTAMP NOT NULL,
+            feedback_id INTEGER NOT NULL,
+            user_id VARCHAR,
+            status VARCHAR(50),
+            current_step INTEGER,
+            updated_at TIMESTAMP,
+            archived_at TIMESTAMP DEFAULT timezone('utc', now()),
+            {answer_columns_ddl},
+            final_sentiment VARCHAR,
+            final_summary TEXT,
+            PRIMARY KEY (id, created_at),
+            CONSTRAINT uq_survey_runs_feedback_created UNIQUE (feedback_id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("ALTER SEQUENCE survey_runs_id_seq OWNED BY survey_runs.id")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_survey_runs_user_created ON survey_runs (user_id, created_at)")
+
+    # Particiones desde la corrida completada más antigua hasta PARTITIONS_AHEAD meses adelante
+    first_run = conn.execute(sa.text(
+        "SELECT min(coalesce(created_at, updated_at)) FROM feedbacks WHERE status = 'completed'"
+    )).scalar()
+    month = month_start(first_run or datetime.datetime.utcnow())
+    last = month_start(datetime.datetime.utcnow())
+    for _ in range(PARTITIONS_AHEAD):
+        last = next_month(last)
+    while month <= last:
+        op.execute(partition_ddl(month))
+        month = next_month(month)
+
+    # Las encuestas ya completadas pasan a ser su primera corrida archivada
+    with op.get_context().autocommit_block():
+        columns = ", ".join(RUN_COLUMNS)
+        copied = batched_backfill(conn, f"""
+            INSERT INTO survey_runs (feedback_id, created_at, {columns})
+            SELECT id, coalesce(created_at, updated_at, timezone('utc', now())), {columns}
+            FROM feedbacks
+            WHERE id > :lo AND id <= :hi AND status = 'completed'
+            ON CONFLICT (feedback_id, created_at) DO NOTHING
+        """)
+        print(f"✅ {copied} corridas completadas copiadas a survey_runs")
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS survey_runs")
+    op.execute("DROP SEQUENCE IF EXISTS survey_runs_id_seq")
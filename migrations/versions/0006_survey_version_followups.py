@@ -0,0 +1,43 @@
+"""Versión de la definición y estado de seguimiento en feedbacks
+
+Reactiva is_in_followup / followup_question (comentados en el modelo original)
+y agrega survey_version, que fija la definición compilada de survey_registry
+con la que empezó cada encuesta. ADD COLUMN sin default volátil solo toca el
+catálogo: lock breve, sin reescribir la tabla.
+
+Revision ID: 0006_survey_version_followups
+Revises: 0005_survey_runs
+Create Date: 2026-10-19 10:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.online import guarded_execute
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_survey_version_followups'
+down_revision = '0005_survey_runs'
+branch_labels = None
+depends_on = None
+
+NEW_COLUMNS = [
+    ("feedbacks", "survey_version VARCHAR(16)"),
+    ("feedbacks", "is_in_followup INTEGER DEFAULT 0"),
+    ("feedbacks", "followup_question INTEGER"),
+    ("survey_runs", "survey_version VARCHAR(16)"),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        for table, column_ddl in NEW_COLUMNS:
+            guarded_execute(conn, f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column_ddl}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        for table, column_ddl in reversed(NEW_COLUMNS):
+            guarded_execute(conn, f"ALTER TABLE {table} DROP COLUMN IF EXISTS {column_ddl.split()[0]}")
@@ -0,0 +1,43 @@
+"""Recordatorios de encuestas abandonadas: last_reminded_at e índice keyset
+
+El barrido pagina por (updated_at, id) sobre las encuestas activas; el índice
+parcial de 0003 solo tenía updated_at, así que se reemplaza (CONCURRENTLY)
+por uno que cubre la clave completa de paginación.
+
+Revision ID: 0007_survey_reminders
+Revises: 0006_survey_version_followups
+Create Date: 2026-10-19 11:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.online import create_index_concurrently, guarded_execute
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_survey_reminders'
+down_revision = '0006_survey_version_followups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        guarded_execute(conn, "ALTER TABLE feedbacks ADD COLUMN IF NOT EXISTS last_reminded_at TIMESTAMP")
+        create_index_concurrently(
+            conn, "ix_feedbacks_active_updated_id",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_feedbacks_active_updated_id "
+            "ON feedbacks (updated_at, id) WHERE status = 'active'")
+        conn.execute(sa.text("DROP INDEX CONCURRENTLY IF EXISTS ix_feedbacks_active_updated_at"))
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        create_index_concurrently(
+            conn, "ix_feedbacks_active_updated_at",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_feedbacks_active_updated_at "
+            "ON feedbacks (updated_at) WHERE status = 'active'")
+        conn.execute(sa.text("DROP INDEX CONCURRENTLY IF EXISTS ix_feedbacks_active_updated_id"))
+        guarded_execute(conn, "ALTER TABLE feedbacks DROP COLUMN IF EXISTS last_reminded_at")
@@ -0,0 +1,50 @@
+"""Campañas de invitación salientes (campaigns, campaign_contacts)
+
+Revision ID: 0008_campaigns
+Revises: 0007_survey_reminders
+Create Date: 2026-10-19 11:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_campaigns'
+down_revision = '0007_survey_reminders'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "campaigns",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(200), nullable=False),
+        sa.Column("template_name", sa.String(100), nullable=False),
+        sa.Column("language_code", sa.String(10)),
+        sa.Column("status", sa.String(20)),
+        sa.Column("dry_run", sa.Integer()),
+        sa.Column("total_contacts", sa.Integer()),
+        sa.Column("sent_count", sa.Integer()),
+        sa.Column("failed_count", sa.Integer()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("started_at", sa.DateTime()),
+        sa.Column("finished_at", sa.DateTime()),
+    )
+    op.create_table(
+        "campaign_contacts",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("campaign_id", sa.Integer(), sa.ForeignKey("campaigns.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("user_id", sa.String(), nullable=False),
+        sa.Column("status", sa.String(20), server_default="pending"),
+        sa.Column("sent_at", sa.DateTime()),
+        sa.UniqueConstraint("campaign_id", "user_id", name="uq_campaign_contacts_user"),
+    )
+    op.create_index("ix_campaign_contacts_pending", "campaign_contacts", ["campaign_id", "id"],
+                    postgresql_where=sa.text("status = 'pending'"))
+
+
+def downgrade() -> None:
+    op.drop_table("campaign_contacts")
+    op.drop_table("campaigns")
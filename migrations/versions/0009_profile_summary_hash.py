@@ -0,0 +1,36 @@
+"""Clave de contenido del perfil IA (summary_hash)
+
+feedbacks.final_summary pasa a guardar el perfil generado por Gemini;
+summary_hash indica para qué respuestas/prompt/modelos fue generado.
+
+Revision ID: 0009_profile_summary_hash
+Revises: 0008_campaigns
+Create Date: 2026-10-19 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.online import guarded_execute
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_profile_summary_hash'
+down_revision = '0008_campaigns'
+branch_labels = None
+depends_on = None
+
+TABLES = ["feedbacks", "survey_runs"]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        for table in TABLES:
+            guarded_execute(conn, f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS summary_hash VARCHAR(64)")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        for table in TABLES:
+            guarded_execute(conn, f"ALTER TABLE {table} DROP COLUMN IF EXISTS summary_hash")
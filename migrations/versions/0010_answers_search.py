@@ -0,0 +1,70 @@
+"""Búsqueda de texto completo en las respuestas abiertas
+
+Configuración es_unaccent (spanish + unaccent: "médico" = "medico"), columna
+generada feedbacks.search_vector sobre las respuestas abiertas e índice GIN
+(CONCURRENTLY). Si la extensión unaccent no está instalada en el servidor,
+es_unaccent queda como copia de spanish (sin plegado de tildes) y puede
+completarse después con ALTER TEXT SEARCH CONFIGURATION.
+
+Agregar una columna generada reescribe feedbacks: en tablas grandes conviene
+correrla en una ventana de poco tráfico.
+
+Revision ID: 0010_answers_search
+Revises: 0009_profile_summary_hash
+Create Date: 2026-10-19 13:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.online import create_index_concurrently, guarded_execute
+
+
+# revision identifiers, used by Alembic.
+revision = '0010_answers_search'
+down_revision = '0009_profile_summary_hash'
+branch_labels = None
+depends_on = None
+
+SEARCH_COLUMNS = [
+    'q1_actividades_productivas', 'q2_experiencia_valor', 'q5_aprendizaje_tecnologia',
+    'q7_actividades_proposito', 'q13_soledad', 'q15_actividades_disfrute',
+    'q19_experiencias_discriminacion', 'q20_espacios_discriminacion', 'q22_filosofia_vida',
+    'q23_mensaje_generaciones', 'q24_compartir_adicional', 'q25_experiencias_recientes',
+    'q26_servicios_necesarios', 'q27_limitaciones_fisicas',
+]
+DOCUMENT = " || ' ' || ".join(f"coalesce({column}, '')" for column in SEARCH_COLUMNS)
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        has_unaccent = conn.execute(sa.text(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'unaccent'")).scalar()
+        if has_unaccent:
+            conn.execute(sa.text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+        else:
+            print("⚠️  Extensión unaccent no disponible: es_unaccent se crea sin plegado de tildes")
+
+        exists = conn.execute(sa.text("SELECT 1 FROM pg_ts_config WHERE cfgname = 'es_unaccent'")).scalar()
+        if not exists:
+            conn.execute(sa.text("CREATE TEXT SEARCH CONFIGURATION es_unaccent (COPY = spanish)"))
+            if has_unaccent:
+                conn.execute(sa.text(
+                    "ALTER TEXT SEARCH CONFIGURATION es_unaccent "
+                    "ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem"))
+
+        guarded_execute(conn, (
+            "ALTER TABLE feedbacks ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS (to_tsvector('es_unaccent'::regconfig, {DOCUMENT})) STORED"))
+        create_index_concurrently(
+            conn, "ix_feedbacks_search_vector",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_feedbacks_search_vector "
+            "ON feedbacks USING gin (search_vector)")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        conn.execute(sa.text("DROP INDEX CONCURRENTLY IF EXISTS ix_feedbacks_search_vector"))
+        guarded_execute(conn, "ALTER TABLE feedbacks DROP COLUMN IF EXISTS search_vector")
+        conn.execute(sa.text("DROP TEXT SEARCH CONFIGURATION IF EXISTS es_unaccent"))
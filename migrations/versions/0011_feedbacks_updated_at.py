@@ -0,0 +1,34 @@
+"""Índice en feedbacks.updated_at para la actualización incremental del dashboard
+
+El dashboard pide solo las filas con updated_at posterior a su marca de agua;
+el índice parcial de 0003/0007 cubre solo encuestas activas, este cubre todas.
+
+Revision ID: 0011_feedbacks_updated_at
+Revises: 0010_answers_search
+Create Date: 2026-10-19 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.online import create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = '0011_feedbacks_updated_at'
+down_revision = '0010_answers_search'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        create_index_concurrently(
+            conn, "ix_feedbacks_updated_at",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_feedbacks_updated_at ON feedbacks (updated_at)")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        conn.execute(sa.text("DROP INDEX CONCURRENTLY IF EXISTS ix_feedbacks_updated_at"))
@@ -0,0 +1,35 @@
+"""Índice de prefijo sobre feedbacks.user_id para buscar perfiles por teléfono
+
+varchar_pattern_ops permite que user_id LIKE '5491%' use el índice con
+cualquier collation; el índice único existente solo sirve para igualdad.
+
+Revision ID: 0012_user_id_pattern
+Revises: 0011_feedbacks_updated_at
+Create Date: 2026-10-19 15:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.online import create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = '0012_user_id_pattern'
+down_revision = '0011_feedbacks_updated_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        create_index_concurrently(
+            conn, "ix_feedbacks_user_id_pattern",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_feedbacks_user_id_pattern "
+            "ON feedbacks (user_id varchar_pattern_ops)")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        conn.execute(sa.text("DROP INDEX CONCURRENTLY IF EXISTS ix_feedbacks_user_id_pattern"))
@@ -0,0 +1,102 @@
+"""Vista materializada kpi_daily con los indicadores del dashboard
+
+Conteos por día/estado/dimensión/valor y tabla view_refreshes con la hora
+del último refresco. El índice único permite REFRESH MATERIALIZED VIEW
+CONCURRENTLY (kpi_views.py, tarea beat) sin bloquear las lecturas del
+dashboard.
+
+Revision ID: 0013_kpi_daily
+Revises: 0012_user_id_pattern
+Create Date: 2026-10-19 16:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0013_kpi_daily'
+down_revision = '0012_user_id_pattern'
+branch_labels = None
+depends_on = None
+
+KPI_DAILY_VIEW = "kpi_daily"
+
+# Definición fija de esta revisión (database.kpi_daily_view_sql puede cambiar
+# con el cuestionario; un cambio así necesita su propia migración)
+KPI_DAILY_SQL = """CREATE MATERIALIZED VIEW IF NOT EXISTS kpi_daily AS
+SELECT
+    f.created_at::date AS day,
+    f.status,
+    d.dimension,
+    d.valor,
+    count(*) AS total,
+    count(*) FILTER (WHERE f.current_step > 1) AS respondidas
+FROM feedbacks f
+CROSS JOIN LATERAL (VALUES
+        ('estados', f.status),
+        ('pasos', f.current_step::text),
+        ('sentimientos', f.final_sentiment),
+        ('q3_nivel_productividad', nullif(f.q3_nivel_productividad, '')),
+        ('q4_uso_tecnologia', nullif(f.q4_uso_tecnologia, '')),
+        ('q6_oportunidades_digitales', nullif(f.q6_oportunidades_digitales, '')),
+        ('q9_nivel_proposito', nullif(f.q9_nivel_proposito, '')),
+        ('q10_situacion_vivienda', nullif(f.q10_situacion_vivienda, '')),
+        ('q12_frecuencia_social', nullif(f.q12_frecuencia_social, '')),
+        ('q14_nivel_apoyo_social', nullif(f.q14_nivel_apoyo_social, '')),
+        ('q16_frecuencia_placer', nullif(f.q16_frecuencia_placer, '')),
+        ('q17_satisfaccion_disfrute', nullif(f.q17_satisfaccion_disfrute, '')),
+        ('q18_edad', nullif(f.q18_edad, '')),
+        ('q21_frecuencia_discriminacion', nullif(f.q21_frecuencia_discriminacion, '')),
+        ('preguntas', CASE WHEN f.q1_actividades_productivas <> '' THEN 'q1_actividades_productivas' END),
+        ('preguntas', CASE WHEN f.q2_experiencia_valor <> '' THEN 'q2_experiencia_valor' END),
+        ('preguntas', CASE WHEN f.q3_nivel_productividad <> '' THEN 'q3_nivel_productividad' END),
+        ('preguntas', CASE WHEN f.q4_uso_tecnologia <> '' THEN 'q4_uso_tecnologia' END),
+        ('preguntas', CASE WHEN f.q5_aprendizaje_tecnologia <> '' THEN 'q5_aprendizaje_tecnologia' END),
+        ('preguntas', CASE WHEN f.q6_oportunidades_digitales <> '' THEN 'q6_oportunidades_digitales' END),
+        ('preguntas', CASE WHEN f.q7_actividades_proposito <> '' THEN 'q7_actividades_proposito' END),
+        ('preguntas', CASE WHEN f.q8_importancia_utilidad <> '' THEN 'q8_importancia_utilidad' END),
+        ('preguntas', CASE WHEN f.q9_nivel_proposito <> '' THEN 'q9_nivel_proposito' END),
+        ('preguntas', CASE WHEN f.q10_situacion_vivienda <> '' THEN 'q10_situacion_vivienda' END),
+        ('preguntas', CASE WHEN f.q11_entorno_cercano <> '' THEN 'q11_entorno_cercano' END),
+        ('preguntas', CASE WHEN f.q12_frecuencia_social <> '' THEN 'q12_frecuencia_social' END),
+        ('preguntas', CASE WHEN f.q13_soledad <> '' THEN 'q13_soledad' END),
+        ('preguntas', CASE WHEN f.q14_nivel_apoyo_social <> '' THEN 'q14_nivel_apoyo_social' END),
+        ('preguntas', CASE WHEN f.q15_actividades_disfrute <> '' THEN 'q15_actividades_disfrute' END),
+        ('preguntas', CASE WHEN f.q16_frecuencia_placer <> '' THEN 'q16_frecuencia_placer' END),
+        ('preguntas', CASE WHEN f.q17_satisfaccion_disfrute <> '' THEN 'q17_satisfaccion_disfrute' END),
+        ('preguntas', CASE WHEN f.q18_edad <> '' THEN 'q18_edad' END),
+        ('preguntas', CASE WHEN f.q19_experiencias_discriminacion <> '' THEN 'q19_experiencias_discriminacion' END),
+        ('preguntas', CASE WHEN f.q20_espacios_discriminacion <> '' THEN 'q20_espacios_discriminacion' END),
+        ('preguntas', CASE WHEN f.q21_frecuencia_discriminacion <> '' THEN 'q21_frecuencia_discriminacion' END),
+        ('preguntas', CASE WHEN f.q22_filosofia_vida <> '' THEN 'q22_filosofia_vida' END),
+        ('preguntas', CASE WHEN f.q23_mensaje_generaciones <> '' THEN 'q23_mensaje_generaciones' END),
+        ('preguntas', CASE WHEN f.q24_compartir_adicional <> '' THEN 'q24_compartir_adicional' END),
+        ('preguntas', CASE WHEN f.q25_experiencias_recientes <> '' THEN 'q25_experiencias_recientes' END),
+        ('preguntas', CASE WHEN f.q26_servicios_necesarios <> '' THEN 'q26_servicios_necesarios' END),
+        ('preguntas', CASE WHEN f.q27_limitaciones_fisicas <> '' THEN 'q27_limitaciones_fisicas' END)
+) AS d(dimension, valor)
+WHERE f.status <> 'invited' AND d.valor IS NOT NULL
+GROUP BY 1, 2, 3, 4"""
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table("view_refreshes"):
+        op.create_table(
+            "view_refreshes",
+            sa.Column("view_name", sa.String(63), primary_key=True),
+            sa.Column("refreshed_at", sa.DateTime(), nullable=False),
+            sa.Column("seconds", sa.Float()),
+        )
+    op.execute(KPI_DAILY_SQL)
+    op.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{KPI_DAILY_VIEW} "
+               f"ON {KPI_DAILY_VIEW} (day, status, dimension, valor)")
+    op.execute(sa.text(
+        "INSERT INTO view_refreshes (view_name, refreshed_at) VALUES (:name, timezone('utc', now())) "
+        "ON CONFLICT (view_name) DO UPDATE SET refreshed_at = excluded.refreshed_at"
+    ).bindparams(name=KPI_DAILY_VIEW))
+
+
+def downgrade() -> None:
+    op.execute(f"DROP MATERIALIZED VIEW IF EXISTS {KPI_DAILY_VIEW}")
+    op.drop_table("view_refreshes")
@@ -0,0 +1,36 @@
+"""Tabla survey_definitions con cada versión de la definición de la encuesta
+
+survey_registry guarda aquí la definición vigente al compilarla y carga las
+anteriores por feedbacks.survey_version, así una encuesta que empezó con una
+versión vieja sigue con sus preguntas y seguimientos aunque la definición
+cambie. Tabla nueva: no toca feedbacks.
+
+Revision ID: 0014_survey_definitions
+Revises: 0013_kpi_daily
+Create Date: 2026-10-19 17:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0014_survey_definitions'
+down_revision = '0013_kpi_daily'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table("survey_definitions"):
+        op.create_table(
+            "survey_definitions",
+            sa.Column("version", sa.String(16), primary_key=True),
+            sa.Column("definition", postgresql.JSONB(), nullable=False),
+            sa.Column("created_at", sa.DateTime()),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("survey_definitions")
@@ -0,0 +1,36 @@
+"""Índice sobre survey_answers.answered_at para los refrescos incrementales de temas
+
+themes.py toma como marca de agua la última respuesta de cada encuesta
+completada: con este índice encontrar las encuestas con respuestas
+posteriores a la marca es un range scan, sin recorrer survey_answers.
+
+Revision ID: 0015_answers_answered_at
+Revises: 0014_survey_definitions
+Create Date: 2026-10-19 18:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.online import create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = '0015_answers_answered_at'
+down_revision = '0014_survey_definitions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        create_index_concurrently(
+            conn, "ix_survey_answers_answered_at",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_survey_answers_answered_at "
+            "ON survey_answers (answered_at)")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        conn.execute(sa.text("DROP INDEX CONCURRENTLY IF EXISTS ix_survey_answers_answered_at"))
@@ -0,0 +1,27 @@
+"""survey_runs.archived_at por defecto en UTC
+
+0005 creaba la columna con DEFAULT now() (hora local de la sesión) y el
+resto del esquema guarda UTC sin zona. Cambiar el default es solo de
+catálogo: no reescribe la tabla ni sus particiones.
+
+Revision ID: 0016_runs_archived_at_utc
+Revises: 0015_answers_answered_at
+Create Date: 2026-10-19 20:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0016_runs_archived_at_utc'
+down_revision = '0015_answers_answered_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE survey_runs ALTER COLUMN archived_at SET DEFAULT timezone('utc', now())")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE survey_runs ALTER COLUMN archived_at SET DEFAULT now()")
@@ -0,0 +1,112 @@
+# profiles.py - Listado paginado y detalle de perfiles de encuestados
+#
+# La pestaña de perfiles no recorre el DataFrame completo: pide a Postgres una
+# página de encuestas completadas (pocas columnas, orden por created_at sobre
+# ix_feedbacks_status_created_at) y el total acotado como en search.py. La
+# búsqueda acepta un teléfono (dígitos: prefijo de user_id con código de país,
+# sobre ix_feedbacks_user_id_pattern) o texto libre
+# (search_vector con el índice GIN). Las respuestas completas de una persona se
+# leen solo al abrir su detalle, con una consulta por clave primaria.
+#
+#   python profiles.py list [--search "diabetes"] [--page 1]
+#   python profiles.py show 123
+
+import os
+import re
+import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import select, func, desc
+from database import SessionLocal, Feedback
+from search import search_query
+from dashboard_metrics import survey_filters
+from ai_profiles import cached_profile
+
+PROFILES_PAGE_SIZE = int(os.getenv("PROFILES_PAGE_SIZE", "20"))
+PROFILES_MAX_PAGE_SIZE = 100
+PROFILES_MAX_COUNT = 10000      # Más allá se informa "más de N"
+
+PHONE_RE = re.compile(r"^\+?[\d\s\-()]{4,}$")
+
+# Columnas del listado (el detalle lee la fila completa)
+LIST_COLUMNS = ['id', 'user_id', 'created_at', 'updated_at', 'q18_edad', 'final_sentiment']
+
+def profiles_filter(search: Optional[str] = None, start: Optional[datetime.date] = None,
+                    end: Optional[datetime.date] = None) -> List:
+    """Condiciones del listado: encuestas completadas, rango de fechas y búsqueda"""
+    conditions = survey_filters('completed', start, end)
+    search = (search or "").strip()
+    if PHONE_RE.match(search):
+        conditions.append(Feedback.user_id.startswith(re.sub(r"\D", "", search), autoescape=True))
+    elif search:
+        conditions.append(Feedback.search_vector.op('@@')(search_query(search)))
+    return conditions
+
+def profiles_page(page: int = 1, page_size: int = PROFILES_PAGE_SIZE, search: Optional[str] = None,
+                  start: Optional[datetime.date] = None, end: Optional[datetime.date] = None) -> Dict:
+    """{'total', 'capped', 'page', 'pages', 'rows': [{LIST_COLUMNS}]} de una página del listado"""
+    page_size = max(1, min(page_size, PROFILES_MAX_PAGE_SIZE))
+    page = max(page, 1)
+    conditions = profiles_filter(search, start, end)
+    matches = select(Feedback.id).where(*conditions).limit(PROFILES_MAX_COUNT + 1)
+    listing = (
+        select(*[getattr(Feedback, column) for column in LIST_COLUMNS])
+        .where(*conditions)
+        .order_by(desc(Feedback.created_at), desc(Feedback.id))
+        .offset((page - 1) * page_size)
+        .limit(page_size)
+    )
+    db = SessionLocal()
+    try:
+        total = db.execute(select(func.count()).select_from(matches.subquery())).scalar()
+        rows = db.execute(listing).mappings().all()
+    finally:
+        db.close()
+
+    capped = total > PROFILES_MAX_COUNT
+    total = min(total, PROFILES_MAX_COUNT)
+    return {
+        'total': total,
+        'capped': capped,
+        'page': page,
+        'pages': -(-total // page_size),
+        'rows': [dict(row) for row in rows],
+    }
+
+def profile_detail(feedback_id: int) -> Optional[Dict]:
+    """Respuestas completas de una encuesta (por clave primaria) y su perfil IA vigente"""
+    db = SessionLocal()
+    try:
+        survey = db.get(Feedback, feedback_id)
+        if survey is None:
+            return None
+        answers = {column.key: getattr(survey, column.key) for column in Feedback.__table__.columns
+                   if column.key != 'search_vector'}
+    finally:
+        db.close()
+    answers['perfil'] = cached_profile(answers)
+    return answers
+
+if __name__ == "__main__":
+    import time
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Perfiles de encuestados (listado paginado y detalle)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    listing = subparsers.add_parser("list")
+    listing.add_argument("--search", default=None)
+    listing.add_argument("--page", type=int, default=1)
+    show = subparsers.add_parser("show")
+    show.add_argument("id", type=int)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "list":
+        result = profiles_page(args.page, search=args.search)
+        more = "más de " if result['capped'] else ""
+        print(f"👤 {more}{result['total']} perfiles (página {result['page']}/{result['pages']}) "
+              f"en {(time.perf_counter() - started) * 1000:.0f} ms")
+        for row in result['rows']:
+            print(f"  {row['id']}  {row['user_id']}  {row['created_at']}  {row['final_sentiment']}")
+    else:
+        detail = profile_detail(args.id)
+        print(detail if detail else f"⚠️ No existe la encuesta {args.id}")
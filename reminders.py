@@ -0,0 +1,104 @@
+# reminders.py - Barrido de encuestas abandonadas (status='active' sin actividad reciente)
+#
+# Recorre feedbacks por páginas con paginación por clave (updated_at, id) sobre
+# el índice parcial ix_feedbacks_active_updated_id: cada página es un range
+# scan acotado, sin OFFSET ni escaneo de las encuestas completadas.
+# Cada recordatorio se "reclama" con un UPDATE atómico de last_reminded_at;
+# solo se reclama si el usuario no fue recordado desde su última respuesta,
+# así dos barridos concurrentes nunca encolan el mismo recordatorio.
+# Pasadas REMINDER_STALE_HOURS (24 por defecto) la ventana de atención de
+# WhatsApp ya cerró: el recordatorio es la plantilla aprobada REMINDER_TEMPLATE
+# y la pregunta pendiente se reenvía cuando la persona contesta. Si el envío
+# falla, el reclamo se libera y el próximo barrido lo vuelve a intentar.
+
+import os
+import datetime
+import logging
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy import select, update, tuple_, or_
+from database import SessionLocal, Feedback
+
+logger = logging.getLogger(__name__)
+
+REMINDER_STALE_HOURS = float(os.getenv("REMINDER_STALE_HOURS", "24"))    # Inactividad antes de recordar
+REMINDER_MAX_AGE_DAYS = float(os.getenv("REMINDER_MAX_AGE_DAYS", "30"))  # No insistir con encuestas muy viejas
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "500"))
+# Plantilla aprobada del recordatorio: {{1}} = pregunta pendiente, {{2}} = total de preguntas
+REMINDER_TEMPLATE = os.getenv("REMINDER_TEMPLATE", "recordatorio_encuesta")
+REMINDER_TEMPLATE_LANGUAGE = os.getenv("REMINDER_TEMPLATE_LANGUAGE", "es")
+
+def stale_page_query(cutoff: datetime.datetime, after: Tuple[datetime.datetime, int], limit: int):
+    """Siguiente página de encuestas activas inactivas, ordenadas por (updated_at, id)"""
+    return (
+        select(Feedback.updated_at, Feedback.id)
+        .where(Feedback.status == 'active')
+        .where(Feedback.updated_at < cutoff)
+        .where(tuple_(Feedback.updated_at, Feedback.id) > tuple_(*after))
+        .order_by(Feedback.updated_at, Feedback.id)
+        .limit(limit)
+    )
+
+def claim_statement(ids: List[int], cutoff: datetime.datetime, now: datetime.datetime):
+    """Marca last_reminded_at solo en las filas aún pendientes; devuelve las reclamadas"""
+    return (
+        update(Feedback)
+        .where(Feedback.id.in_(ids))
+        .where(Feedback.status == 'active')
+        .where(Feedback.updated_at < cutoff)
+        .where(or_(Feedback.last_reminded_at.is_(None), Feedback.last_reminded_at < Feedback.updated_at))
+        # updated_at explícito: el onupdate del modelo no debe contar el recordatorio como actividad
+        .values(last_reminded_at=now, updated_at=Feedback.updated_at)
+        .returning(Feedback.id)
+    )
+
+def release_claim(feedback_id: int) -> None:
+    """Deshace el reclamo de un recordatorio que no se pudo enviar (el próximo barrido lo reintenta)"""
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Feedback)
+            .where(Feedback.id == feedback_id)
+            .values(last_reminded_at=None, updated_at=Feedback.updated_at)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def reminder_pending(survey: Feedback) -> bool:
+    """Se envió un recordatorio y la persona no respondió desde entonces"""
+    return survey.last_reminded_at is not None and survey.updated_at is not None \
+        and survey.last_reminded_at >= survey.updated_at
+
+def sweep_abandoned_surveys(enqueue: Callable[[int], None], now: Optional[datetime.datetime] = None,
+                            batch_size: int = REMINDER_BATCH_SIZE) -> dict:
+    """Reclama y encola recordatorios página por página (una transacción corta por página)"""
+    now = now or datetime.datetime.utcnow()
+    cutoff = now - datetime.timedelta(hours=REMINDER_STALE_HOURS)
+    after = (now - datetime.timedelta(days=REMINDER_MAX_AGE_DAYS), 0)
+
+    stats = {'scanned': 0, 'claimed': 0, 'pages': 0}
+    db = SessionLocal()
+    try:
+        while True:
+            page = db.execute(stale_page_query(cutoff, after, batch_size)).all()
+            if not page:
+                break
+            after = tuple(page[-1])
+
+            claimed = db.execute(claim_statement([row.id for row in page], cutoff, now)).scalars().all()
+            db.commit()
+
+            # Encolar solo lo ya confirmado: otro barrido no puede reclamar estas filas
+            for feedback_id in claimed:
+                enqueue(feedback_id)
+
+            stats['pages'] += 1
+            stats['scanned'] += len(page)
+            stats['claimed'] += len(claimed)
+            if len(page) < batch_size:
+                break
+    finally:
+        db.close()
+
+    logger.info(f"Barrido de recordatorios: {stats['claimed']} encolados de {stats['scanned']} revisados")
+    return stats
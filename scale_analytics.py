@@ -0,0 +1,261 @@
+# scale_analytics.py - Correlaciones, tablas cruzadas e intervalos bootstrap
+# entre las escalas 1-5 y las preguntas de botones
+#
+# Las respuestas se extraen una sola vez por filtro, ya agrupadas en Postgres:
+# cada escala como entero desde la columna tipada survey_answers.scale_value
+# (pivote por encuesta, 0 = sin respuesta) y cada pregunta de botones como código de su lista de opciones
+# (-1 = sin respuesta u otro texto), con GROUP BY sobre esas columnas y la
+# frecuencia de cada patrón. Seis escalas de 0-5 dan a lo sumo unos miles de
+# patrones aunque haya millones de personas, así que todo lo demás es álgebra
+# con NumPy sobre una matriz chica ponderada por frecuencia:
+#   - correlación de Pearson o Spearman con casos completos por par, para
+#     todas las preguntas a la vez (productos matriciales sobre la máscara);
+#   - bootstrap: cada réplica es un vector de pesos multinomial sobre los
+#     patrones, así BOOTSTRAP_SAMPLES réplicas son un único producto matricial;
+#   - tablas cruzadas con np.bincount ponderado y medias por grupo con su IC.
+#
+#   python scale_analytics.py [--status completed] [--start 2026-01-01] [--end 2026-06-30]
+
+import os
+import logging
+import datetime
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func, case
+from database import engine, Feedback, SurveyAnswer
+from dashboard_metrics import SCALE_COLUMNS, survey_filters
+from survey_questions import ELDERLY_SURVEY_QUESTIONS
+
+logger = logging.getLogger(__name__)
+
+BOOTSTRAP_SAMPLES = int(os.getenv("BOOTSTRAP_SAMPLES", "500"))
+CONFIDENCE = 0.95
+
+# Preguntas de botones que se cruzan con las escalas
+CATEGORY_COLUMNS = ['q4_uso_tecnologia', 'q10_situacion_vivienda']
+# Número de pregunta de cada escala (survey_answers.question_no)
+SCALE_QUESTIONS = {question['column']: number for number, question in ELDERLY_SURVEY_QUESTIONS.items()
+                   if question['column'] in SCALE_COLUMNS}
+OPTIONS = {question['column']: list(question.get('options') or []) for question in ELDERLY_SURVEY_QUESTIONS.values()}
+METHODS = ['spearman', 'pearson']
+
+@dataclass(frozen=True)
+class ScaleMatrix:
+    """Patrones de respuesta únicos y su frecuencia.
+
+    scales: (P, escalas) int8 con 0 = sin respuesta; categories: (P, categorías)
+    int8 con -1 = sin respuesta; counts: (P,) personas con ese patrón.
+    """
+    scales: np.ndarray
+    categories: np.ndarray
+    counts: np.ndarray
+
+    @property
+    def respondents(self) -> int:
+        return int(self.counts.sum())
+
+def _scales_subquery():
+    """Una fila por encuesta con al menos una escala respondida y una columna por escala"""
+    return (
+        select(SurveyAnswer.survey_id, *[
+            func.max(SurveyAnswer.scale_value).filter(SurveyAnswer.question_no == SCALE_QUESTIONS[column]).label(column)
+            for column in SCALE_COLUMNS
+        ])
+        .where(SurveyAnswer.question_no.in_(list(SCALE_QUESTIONS.values())))
+        .where(SurveyAnswer.scale_value.isnot(None))
+        .group_by(SurveyAnswer.survey_id)
+        .subquery('scales')
+    )
+
+def _category_sql(column: str):
+    attribute = getattr(Feedback, column)
+    return case(*[(attribute == option, code) for code, option in enumerate(OPTIONS[column])], else_=-1)
+
+def load_matrix(status: Optional[str] = None, start: Optional[datetime.date] = None,
+                end: Optional[datetime.date] = None) -> ScaleMatrix:
+    """Patrones de respuesta bajo los filtros del sidebar (personas con al menos una escala)"""
+    scales = _scales_subquery()
+    expressions = [func.coalesce(scales.c[column], 0) for column in SCALE_COLUMNS] + \
+                  [_category_sql(column) for column in CATEGORY_COLUMNS]
+    statement = (
+        select(*expressions, func.count())
+        .select_from(Feedback)
+        .join(scales, scales.c.survey_id == Feedback.id)
+        .where(*survey_filters(status, start, end))
+        .group_by(*expressions)
+    )
+    with engine.connect() as conn:
+        rows = conn.execute(statement).all()
+    data = np.asarray(rows, dtype=np.int64).reshape(len(rows), len(expressions) + 1)
+    scales = data[:, :len(SCALE_COLUMNS)]
+    scales[(scales < 1) | (scales > 5)] = 0
+    return ScaleMatrix(scales=scales.astype(np.int8),
+                       categories=data[:, len(SCALE_COLUMNS):-1].astype(np.int8),
+                       counts=data[:, -1])
+
+def scale_ranks(matrix: ScaleMatrix) -> np.ndarray:
+    """Rango promedio (con empates) de cada respuesta dentro de su escala; 0 sin respuesta"""
+    scales = matrix.scales.astype(np.int64)
+    rank_of = np.zeros((6, scales.shape[1]))
+    for j in range(scales.shape[1]):
+        counts = np.bincount(scales[:, j], weights=matrix.counts, minlength=6)[1:]
+        below = np.concatenate([[0.0], np.cumsum(counts)[:-1]])
+        rank_of[1:, j] = below + (counts + 1) / 2
+    return rank_of[scales, np.arange(scales.shape[1])]
+
+def pairwise_correlations(values: np.ndarray, mask: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Pearson por pares con casos completos para cada fila de `weights` (B, P).
+
+    Devuelve (r, n) con forma (B, k, k). Cada suma es weights @ (producto por
+    patrón), así que B réplicas cuestan un producto matricial por término.
+    """
+    k = values.shape[1]
+    x = values * mask
+
+    def weighted(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+        products = (left[:, :, None] * right[:, None, :]).reshape(len(left), k * k)
+        return (weights @ products).reshape(len(weights), k, k)
+
+    n = weighted(mask, mask)
+    sx = weighted(x, mask)
+    sxx = weighted(x * x, mask)
+    sxy = weighted(x, x)
+    sy = np.swapaxes(sx, 1, 2)
+    syy = np.swapaxes(sxx, 1, 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = sxy - sx * sy / n
+        spread = np.sqrt((sxx - sx * sx / n) * (syy - sy * sy / n))
+        r = np.where((n > 2) & (spread > 1e-9), covariance / spread, np.nan)
+    return r, n
+
+def bootstrap_weights(counts: np.ndarray, samples: int, seed: int = 0) -> np.ndarray:
+    """(samples, P): frecuencias de cada patrón al remuestrear las personas con reposición"""
+    rng = np.random.default_rng(seed)
+    total = int(counts.sum())
+    return rng.multinomial(total, counts / total, size=samples).astype(float)
+
+def correlations(matrix: ScaleMatrix, method: str = 'spearman', samples: int = BOOTSTRAP_SAMPLES,
+                 seed: int = 0) -> Dict[str, pd.DataFrame]:
+    """{'r', 'inferior', 'superior', 'n'}: matrices entre escalas con IC bootstrap percentil.
+
+    Spearman usa los rangos de cada escala sobre todas sus respuestas; en las
+    réplicas se conservan esos rangos (con 5 niveles el efecto de recalcularlos
+    es despreciable frente al del remuestreo).
+    """
+    if method not in METHODS:
+        raise ValueError(f"Método no soportado: {method}")
+    frame = lambda data: pd.DataFrame(data, index=SCALE_COLUMNS, columns=SCALE_COLUMNS)
+    if not len(matrix.counts):
+        empty = np.full((len(SCALE_COLUMNS), len(SCALE_COLUMNS)), np.nan)
+        return {'r': frame(empty), 'inferior': frame(empty), 'superior': frame(empty),
+                'n': frame(np.zeros(empty.shape, dtype=int))}
+
+    mask = (matrix.scales > 0).astype(float)
+    values = scale_ranks(matrix) if method == 'spearman' else matrix.scales.astype(float)
+    r, n = pairwise_correlations(values, mask, matrix.counts[None, :].astype(float))
+    lower = upper = np.full(r[0].shape, np.nan)
+    if samples:
+        boot, _ = pairwise_correlations(values, mask, bootstrap_weights(matrix.counts, samples, seed))
+        alpha = (1 - CONFIDENCE) / 2
+        with np.errstate(invalid='ignore'):
+            lower, upper = np.nanquantile(boot, [alpha, 1 - alpha], axis=0)
+    return {'r': frame(r[0]), 'inferior': frame(lower), 'superior': frame(upper), 'n': frame(n[0].astype(int))}
+
+def correlation_pairs(result: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Pares de escalas (triángulo superior) ordenados por |r|: ['pregunta_a', 'pregunta_b', 'r', 'inferior', 'superior', 'n']"""
+    upper = np.triu_indices(len(SCALE_COLUMNS), k=1)
+    pairs = pd.DataFrame({
+        'pregunta_a': np.asarray(SCALE_COLUMNS)[upper[0]],
+        'pregunta_b': np.asarray(SCALE_COLUMNS)[upper[1]],
+        **{key: result[key].to_numpy()[upper] for key in ['r', 'inferior', 'superior', 'n']},
+    })
+    return pairs.dropna(subset=['r']).sort_values('r', key=np.abs, ascending=False).reset_index(drop=True)
+
+def _codes(matrix: ScaleMatrix, column: str) -> Tuple[np.ndarray, List[str]]:
+    """(códigos 0..k-1 con -1 = sin respuesta, etiquetas) de una escala o pregunta de botones"""
+    if column in SCALE_COLUMNS:
+        labels = OPTIONS[column] if len(OPTIONS[column]) == 5 else [str(value) for value in range(1, 6)]
+        return matrix.scales[:, SCALE_COLUMNS.index(column)].astype(np.int64) - 1, labels
+    return matrix.categories[:, CATEGORY_COLUMNS.index(column)].astype(np.int64), OPTIONS[column]
+
+def crosstab(matrix: ScaleMatrix, rows: str, columns: str) -> Dict:
+    """{'conteos', 'porcentaje_fila', 'cramer_v', 'n'} entre dos preguntas (escala o botones)"""
+    row_codes, row_labels = _codes(matrix, rows)
+    column_codes, column_labels = _codes(matrix, columns)
+    both = (row_codes >= 0) & (column_codes >= 0)
+    counts = np.bincount(row_codes[both] * len(column_labels) + column_codes[both], weights=matrix.counts[both],
+                         minlength=len(row_labels) * len(column_labels)).reshape(len(row_labels), len(column_labels))
+
+    total = counts.sum()
+    row_totals = counts.sum(axis=1, keepdims=True)
+    cramer = np.nan
+    if total:
+        expected = row_totals * counts.sum(axis=0, keepdims=True) / total
+        with np.errstate(divide='ignore', invalid='ignore'):
+            chi2 = np.where(expected > 0, (counts - expected) ** 2 / expected, 0.0).sum()
+        dof = min((row_totals > 0).sum(), (counts.sum(axis=0) > 0).sum()) - 1
+        cramer = float(np.sqrt(chi2 / (total * dof))) if dof > 0 else np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        share = np.where(row_totals > 0, counts / row_totals, 0.0)
+    return {
+        'conteos': pd.DataFrame(counts.astype(int), index=row_labels, columns=column_labels),
+        'porcentaje_fila': pd.DataFrame(share, index=row_labels, columns=column_labels),
+        'cramer_v': cramer,
+        'n': int(total),
+    }
+
+def group_means(matrix: ScaleMatrix, scale: str, group: str, samples: int = BOOTSTRAP_SAMPLES,
+                seed: int = 0) -> pd.DataFrame:
+    """Media de una escala por grupo con IC bootstrap: ['grupo', 'n', 'media', 'inferior', 'superior']
+
+    El bootstrap es estratificado (cada grupo conserva su tamaño) y remuestrea
+    las celdas (grupo, valor 1-5), que es equivalente a remuestrear personas.
+    """
+    values = matrix.scales[:, SCALE_COLUMNS.index(scale)].astype(np.int64)
+    group_codes, labels = _codes(matrix, group)
+    valid = (values > 0) & (group_codes >= 0)
+    cells = np.bincount(group_codes[valid] * 5 + values[valid] - 1, weights=matrix.counts[valid],
+                        minlength=len(labels) * 5).reshape(len(labels), 5)
+    levels = np.arange(1, 6, dtype=float)
+
+    def means(weights: np.ndarray) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (weights @ levels) / weights.sum(axis=-1)
+
+    lower = upper = np.full(len(labels), np.nan)
+    if samples and cells.sum():
+        replicates = np.zeros((samples, len(labels), 5))
+        for code, block in enumerate(cells):
+            if block.sum():
+                replicates[:, code] = bootstrap_weights(block, samples, seed + code)
+        alpha = (1 - CONFIDENCE) / 2
+        with np.errstate(invalid='ignore'):
+            lower, upper = np.nanquantile(means(replicates), [alpha, 1 - alpha], axis=0)
+    return pd.DataFrame({'grupo': labels, 'n': cells.sum(axis=1).astype(int), 'media': means(cells),
+                         'inferior': lower, 'superior': upper})
+
+if __name__ == "__main__":
+    import time
+    import argparse
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    parser = argparse.ArgumentParser(description="Correlaciones y tablas cruzadas entre escalas")
+    parser.add_argument("--status", default=None)
+    parser.add_argument("--start", type=datetime.date.fromisoformat, default=None)
+    parser.add_argument("--end", type=datetime.date.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    matrix = load_matrix(args.status, args.start, args.end)
+    loaded = time.perf_counter()
+    result = correlations(matrix)
+    table = crosstab(matrix, 'q9_nivel_proposito', 'q10_situacion_vivienda')
+    means = group_means(matrix, 'q9_nivel_proposito', 'q10_situacion_vivienda')
+    print(f"📊 {matrix.respondents} personas, {len(matrix.counts)} patrones: extracción {loaded - started:.2f}s, "
+          f"análisis {time.perf_counter() - loaded:.2f}s")
+    print(correlation_pairs(result).round(3).to_string(index=False))
+    print(table['conteos'].to_string())
+    print(f"V de Cramér: {table['cramer_v']:.3f}")
+    print(means.round(2).to_string(index=False))
@@ -0,0 +1,111 @@
+# search.py - Búsqueda de texto completo en las respuestas abiertas
+#
+# Usa feedbacks.search_vector (columna generada, configuración es_unaccent) y
+# su índice GIN: el filtro @@ se resuelve con el índice sin leer toda la tabla.
+# El ranking (ts_rank_cd) se calcula solo sobre los primeros
+# SEARCH_MAX_CANDIDATES aciertos y los fragmentos (ts_headline, costosos) solo
+# sobre la página pedida, así la búsqueda sigue acotada con millones de filas.
+# Para términos muy comunes el orden es aproximado: se ordena dentro de esos
+# candidatos y el total se informa como "más de N".
+#
+#   python search.py "diabetes transporte" --page 1
+
+import os
+import logging
+from typing import Dict, Optional
+from sqlalchemy import select, func, cast, desc
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from database import SessionLocal, Feedback, SEARCH_CONFIG, SEARCH_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "20"))
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "5000"))
+HEADLINE_OPTIONS = "StartSel=«, StopSel=», MaxFragments=2, MaxWords=18, MinWords=6, FragmentDelimiter=\" … \""
+
+def search_query(terms: str):
+    """tsquery con sintaxis de buscador web: "frase exacta", -excluir, or"""
+    return func.websearch_to_tsquery(cast(SEARCH_CONFIG, REGCONFIG), terms)
+
+def _matches(query, status: Optional[str]):
+    statement = select(Feedback.id).where(Feedback.search_vector.op('@@')(query))
+    if status:
+        statement = statement.where(Feedback.status == status)
+    return statement
+
+def count_statement(terms: str, status: Optional[str] = None):
+    """Aciertos hasta SEARCH_MAX_CANDIDATES + 1 (para saber si hay más)"""
+    return select(func.count()).select_from(
+        _matches(search_query(terms), status).limit(SEARCH_MAX_CANDIDATES + 1).subquery())
+
+def page_statement(terms: str, page: int = 1, page_size: int = SEARCH_PAGE_SIZE, status: Optional[str] = None):
+    """Página de aciertos ordenada por relevancia, con fragmentos resaltados"""
+    query = search_query(terms)
+    candidates = (
+        _matches(query, status)
+        .add_columns(func.ts_rank_cd(Feedback.search_vector, query).label('rank'))
+        .limit(SEARCH_MAX_CANDIDATES)
+        .subquery()
+    )
+    ranked = (
+        select(candidates.c.id, candidates.c.rank)
+        .order_by(desc(candidates.c.rank), candidates.c.id)
+        .offset((max(page, 1) - 1) * page_size)
+        .limit(page_size)
+        .subquery()
+    )
+    document = func.concat_ws(' · ', *[getattr(Feedback, column) for column in SEARCH_COLUMNS])
+    return (
+        select(
+            Feedback.id,
+            Feedback.user_id,
+            Feedback.status,
+            Feedback.updated_at,
+            ranked.c.rank,
+            func.ts_headline(cast(SEARCH_CONFIG, REGCONFIG), document, query, HEADLINE_OPTIONS).label('fragmento'),
+        )
+        .join(ranked, ranked.c.id == Feedback.id)
+        .order_by(desc(ranked.c.rank), Feedback.id)
+    )
+
+def search_answers(terms: str, page: int = 1, page_size: int = SEARCH_PAGE_SIZE,
+                   status: Optional[str] = None) -> Dict:
+    """{'total', 'capped', 'page', 'pages', 'hits': [{id, user_id, status, updated_at, rank, fragmento}]}"""
+    terms = (terms or "").strip()
+    if not terms:
+        return {'total': 0, 'capped': False, 'page': 1, 'pages': 0, 'hits': []}
+
+    db = SessionLocal()
+    try:
+        total = db.execute(count_statement(terms, status)).scalar()
+        hits = db.execute(page_statement(terms, page, page_size, status)).mappings().all()
+    finally:
+        db.close()
+
+    capped = total > SEARCH_MAX_CANDIDATES
+    total = min(total, SEARCH_MAX_CANDIDATES)
+    return {
+        'total': total,
+        'capped': capped,
+        'page': page,
+        'pages': -(-total // page_size),
+        'hits': [dict(hit) for hit in hits],
+    }
+
+if __name__ == "__main__":
+    import time
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Buscar en las respuestas abiertas")
+    parser.add_argument("terms")
+    parser.add_argument("--page", type=int, default=1)
+    parser.add_argument("--status", default=None)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    result = search_answers(args.terms, args.page, status=args.status)
+    elapsed = (time.perf_counter() - started) * 1000
+    more = "más de " if result['capped'] else ""
+    print(f"🔎 {more}{result['total']} resultados (página {result['page']}/{result['pages']}) en {elapsed:.0f} ms")
+    for hit in result['hits']:
+        print(f"  {hit['rank']:.3f}  {hit['user_id']}  {hit['fragmento']}")
@@ -0,0 +1,221 @@
+# sentiment_lexicon.py - Sentimiento local (sin LLM) para las respuestas abiertas
+#
+# Léxico en español con manejo de negación ("no me siento sola") e
+# intensificadores ("muy feliz"). El puntaje se calcula vectorizado con NumPy
+# sobre todas las personas a la vez: se tokeniza una sola vez, cada token se
+# convierte en un índice del léxico y los pesos, la negación y las sumas por
+# persona son operaciones sobre arreglos (miles de personas por segundo).
+#
+# Se usa al completar la encuesta (survey_repository.mark_completed), en el
+# backfill masivo (python sentiment_lexicon.py backfill) y en el dashboard para
+# filas sin sentimiento. El sentimiento de Gemini queda como enriquecimiento
+# opcional (INSIGHTS_LLM_SENTIMENT en insights.py).
+
+import os
+import re
+import logging
+import unicodedata
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Respuestas de texto libre que se analizan
+OPEN_TEXT_COLUMNS = [
+    'q1_actividades_productivas',
+    'q2_experiencia_valor',
+    'q5_aprendizaje_tecnologia',
+    'q7_actividades_proposito',
+    'q13_soledad',
+    'q19_experiencias_discriminacion',
+    'q22_filosofia_vida',
+    'q23_mensaje_generaciones',
+    'q24_compartir_adicional',
+    'q25_experiencias_recientes',
+    'q26_servicios_necesarios',
+    'q27_limitaciones_fisicas',
+]
+
+SENTIMENT_THRESHOLD = float(os.getenv("SENTIMENT_THRESHOLD", "0.15"))
+NEGATION_WINDOW = 3          # Tokens afectados después de un negador
+INTENSIFIER_BOOST = 1.5
+LEXICON_BATCH_SIZE = int(os.getenv("LEXICON_BATCH_SIZE", "5000"))
+
+# Palabras base (sin tildes); se agregan plurales y femenino/masculino
+POSITIVE_WORDS = {
+    2: ['feliz', 'felicidad', 'alegria', 'alegre', 'encanta', 'maravilloso', 'excelente', 'amor', 'agradecido',
+        'bendicion', 'bendecido', 'disfruto', 'disfrutar', 'plenitud', 'pleno', 'orgulloso', 'satisfecho'],
+    1: ['bien', 'bueno', 'buen', 'gusta', 'gusto', 'tranquilo', 'tranquilidad', 'paz', 'contento', 'util',
+        'aprender', 'aprendo', 'ayudar', 'ayudo', 'apoyo', 'acompanado', 'compartir', 'comparto', 'salud',
+        'sano', 'activo', 'energia', 'esperanza', 'fe', 'gracias', 'valor', 'valioso', 'respeto', 'respetado',
+        'importante', 'capaz', 'independiente', 'libre', 'sonreir', 'reir', 'divierte',
+        'divertido', 'mejor', 'positivo', 'optimista', 'animo', 'animado', 'carino', 'querido', 'unido',
+        'emocionante', 'interesante', 'facil', 'logro', 'lograr', 'exito', 'sabiduria', 'experiencia'],
+}
+NEGATIVE_WORDS = {
+    2: ['triste', 'tristeza', 'deprimido', 'depresion', 'soledad', 'abandonado', 'horrible', 'terrible',
+        'odio', 'miedo', 'angustia', 'desesperado', 'sufro', 'sufrimiento', 'maltrato', 'humillado',
+        'discriminado', 'discriminacion', 'rechazo', 'rechazado'],
+    1: ['mal', 'malo', 'aislado', 'aburrido', 'aburre', 'cansado', 'dolor', 'duele', 'enfermo',
+        'enfermedad', 'dificil', 'dificultad', 'problema', 'preocupa', 'preocupado', 'preocupacion', 'estres',
+        'ansiedad', 'nervioso', 'inutil', 'olvidado', 'ignorado', 'excluido', 'falta', 'pobre', 'pobreza',
+        'perdida', 'perdi', 'murio', 'limitado', 'limitacion', 'limitaciones', 'peor', 'negativo', 'injusto',
+        'injusticia', 'irrespeto', 'groseria', 'grosero', 'molesta', 'molesto', 'rabia', 'enojo', 'llorar',
+        'lloro', 'carencia', 'abuso', 'estorbo', 'carga', 'frustrado'],
+}
+NEGATORS = ['no', 'nunca', 'jamas', 'ni', 'tampoco', 'nada', 'sin', 'ningun', 'ninguno', 'ninguna', 'nadie']
+INTENSIFIERS = ['muy', 'mucho', 'mucha', 'muchisimo', 'bastante', 'demasiado', 'super', 'tan', 'tanto', 'realmente']
+
+TOKEN_RE = re.compile(r"[a-z]+|[.,;:!?\n]")
+BREAKS = frozenset('.,;:!?\n')
+
+def normalize_text(text: str) -> str:
+    """Minúsculas y sin tildes ('Alegría' -> 'alegria')"""
+    decomposed = unicodedata.normalize('NFD', text.lower())
+    return ''.join(char for char in decomposed if unicodedata.category(char) != 'Mn')
+
+def _variants(word: str) -> List[str]:
+    forms = {word, word + 's', word + 'es'}
+    if word[-1] in 'oa':
+        other = word[:-1] + ('a' if word[-1] == 'o' else 'o')
+        forms |= {other, other + 's'}
+    return sorted(forms)
+
+def _build_lexicon():
+    """Vocabulario -> índice y arreglos de pesos/banderas indexados por ese índice"""
+    weights = {}
+    for sign, groups in ((1, POSITIVE_WORDS), (-1, NEGATIVE_WORDS)):
+        for strength, words in groups.items():
+            for word in words:
+                for form in _variants(word):
+                    weights.setdefault(form, sign * strength)
+
+    # Índice 0: palabra neutra; índice 1: corte de cláusula (puntuación)
+    vocab = {}
+    for word in chain(weights, NEGATORS, INTENSIFIERS):
+        vocab.setdefault(word, len(vocab) + 2)
+    size = len(vocab) + 2
+    weight = np.zeros(size, dtype=np.float64)
+    negator = np.zeros(size, dtype=bool)
+    intensifier = np.zeros(size, dtype=bool)
+    for word, value in weights.items():
+        weight[vocab[word]] = value
+    negator[[vocab[word] for word in NEGATORS]] = True
+    intensifier[[vocab[word] for word in INTENSIFIERS]] = True
+    return vocab, weight, negator, intensifier
+
+VOCAB, WEIGHT, IS_NEGATOR, IS_INTENSIFIER = _build_lexicon()
+BREAK_ID = 1
+
+def _token_ids(text: Optional[str]) -> List[int]:
+    if not text:
+        return []
+    get = VOCAB.get
+    return [BREAK_ID if token in BREAKS else get(token, 0) for token in TOKEN_RE.findall(normalize_text(text))]
+
+def score_texts(texts: Sequence[Optional[str]]) -> np.ndarray:
+    """Puntaje promedio por palabra con carga, en [-3, 3] (NaN si no hay texto)"""
+    tokens = [_token_ids(text) for text in texts]
+    n = len(tokens)
+    lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=n)
+    ids = np.fromiter(chain.from_iterable(tokens), dtype=np.int64, count=int(lengths.sum()))
+    if not len(ids):
+        return np.full(n, np.nan)
+    doc = np.repeat(np.arange(n), lengths)
+    # Cada puntuación abre una cláusula nueva: la negación no la atraviesa
+    clause = np.cumsum(ids == BREAK_ID) + doc * (len(ids) + 1)
+
+    # La negación afecta solo a la primera palabra con carga dentro de la ventana
+    position = np.arange(len(ids))
+    clause_start = np.maximum.accumulate(np.where(np.r_[True, clause[1:] != clause[:-1]], position, 0))
+    weight = WEIGHT[ids]
+    last_negator = np.maximum.accumulate(np.where(IS_NEGATOR[ids], position, -1))
+    previous_hit = np.r_[-1, np.maximum.accumulate(np.where(weight != 0, position, -1))[:-1]]
+    negated = ((last_negator >= clause_start) & (position - last_negator <= NEGATION_WINDOW)
+               & (last_negator > previous_hit))
+    boosted = np.r_[False, IS_INTENSIFIER[ids[:-1]] & (clause[1:] == clause[:-1])]
+
+    values = weight * np.where(negated, -1.0, 1.0) * np.where(boosted, INTENSIFIER_BOOST, 1.0)
+    totals = np.bincount(doc, weights=values, minlength=n)
+    hits = np.bincount(doc, weights=(weight != 0), minlength=n)
+    scores = totals / np.maximum(hits, 1)
+    scores[lengths == 0] = np.nan
+    return scores
+
+def labels_for(scores: np.ndarray, threshold: float = SENTIMENT_THRESHOLD) -> List[Optional[str]]:
+    """'positivo' / 'neutral' / 'negativo' (None sin texto)"""
+    labels = np.where(scores >= threshold, 'positivo', np.where(scores <= -threshold, 'negativo', 'neutral'))
+    return [None if np.isnan(score) else str(label) for score, label in zip(scores, labels)]
+
+def respondent_text(answers: Dict) -> str:
+    """Respuestas abiertas de una persona, una cláusula por respuesta"""
+    return "\n".join(str(answers[column]) for column in OPEN_TEXT_COLUMNS
+                     if answers.get(column) is not None and str(answers[column]).strip())
+
+def label_respondents(rows: Iterable[Dict]) -> List[Optional[str]]:
+    """Etiqueta de sentimiento por persona (dicts o filas con las columnas abiertas)"""
+    return labels_for(score_texts([respondent_text(row) for row in rows]))
+
+def sentiment_of(answers: Dict) -> Optional[str]:
+    return label_respondents([answers])[0]
+
+def backfill_sentiment(batch_size: int = LEXICON_BATCH_SIZE, force: bool = False) -> dict:
+    """Etiqueta encuestas completadas por páginas (clave id) con un UPDATE masivo por página"""
+    from sqlalchemy import select, update
+    from database import SessionLocal, Feedback
+
+    columns = [getattr(Feedback, column) for column in OPEN_TEXT_COLUMNS]
+    stats = {'scanned': 0, 'written': 0}
+    after = 0
+    db = SessionLocal()
+    try:
+        while True:
+            query = (
+                select(Feedback.id, *columns)
+                .where(Feedback.status == 'completed')
+                .where(Feedback.id > after)
+                .order_by(Feedback.id)
+                .limit(batch_size)
+            )
+            if not force:
+                query = query.where(Feedback.final_sentiment.is_(None))
+            page = db.execute(query).mappings().all()
+            if not page:
+                break
+            after = page[-1]['id']
+
+            rows = [{'id': row['id'], 'final_sentiment': label}
+                    for row, label in zip(page, label_respondents(page)) if label]
+            if rows:
+                db.execute(update(Feedback), rows)
+            db.commit()
+            stats['scanned'] += len(page)
+            stats['written'] += len(rows)
+            logger.info(f"Sentimiento local: {stats['written']}/{stats['scanned']}")
+    finally:
+        db.close()
+    return stats
+
+if __name__ == "__main__":
+    import time
+    import argparse
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    parser = argparse.ArgumentParser(description="Sentimiento local de las respuestas abiertas")
+    sub = parser.add_subparsers(dest="command", required=True)
+    backfill = sub.add_parser("backfill", help="Etiquetar encuestas completadas")
+    backfill.add_argument("--batch-size", type=int, default=LEXICON_BATCH_SIZE)
+    backfill.add_argument("--force", action="store_true", help="Recalcular también las que ya tienen etiqueta")
+    score = sub.add_parser("score", help="Puntuar un texto")
+    score.add_argument("text")
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        started = time.perf_counter()
+        stats = backfill_sentiment(args.batch_size, args.force)
+        elapsed = time.perf_counter() - started
+        print(f"✅ {stats['written']} etiquetadas de {stats['scanned']} en {elapsed:.1f}s")
+    else:
+        scores = score_texts([args.text])
+        print(f"{scores[0]:+.2f} -> {labels_for(scores)[0]}")
@@ -0,0 +1,129 @@
+# snapshots.py - Instantáneas Arrow (IPC/Feather) de las vistas del dashboard
+#
+# Un proceso (tarea beat o CLI) escribe la vista completa en un archivo Arrow
+# IPC sin compresión y lo publica con reemplazo atómico (archivo temporal en
+# el mismo directorio + os.replace): los lectores ven el archivo anterior o el
+# nuevo, nunca uno a medio escribir.
+# El dashboard abre el archivo con memory map: las columnas de texto (la mayor
+# parte de la memoria) quedan como StringDtype("pyarrow") apuntando a las
+# páginas del archivo, compartidas por todas las sesiones y procesos a través
+# del page cache; el arranque en frío es abrir un archivo, no consultar la base.
+# La marca de agua (máximo updated_at) va en los metadatos del esquema para que
+# LiveFrame siga con el refresco incremental desde ahí.
+#
+#   python snapshots.py build [--view dashboard]
+#   python snapshots.py info [--view dashboard]
+
+import os
+import time
+import logging
+import datetime
+from typing import Dict, Optional, Tuple
+import pandas as pd
+import pyarrow as pa
+from data_loader import VIEWS, load_view, fill_sentiment
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "snapshots"))
+
+# Preparación aplicada al construir (la misma que usa el dashboard con los cambios incrementales)
+PREPARE = {'dashboard': fill_sentiment}
+
+# Texto Arrow -> StringDtype respaldado por los buffers del archivo (sin copia)
+STRING_TYPES = {
+    pa.string(): pd.StringDtype("pyarrow"),
+    pa.large_string(): pd.StringDtype("pyarrow"),
+}
+
+class Snapshot:
+    """Archivo Arrow de una vista: construir, publicar y abrir con memory map"""
+
+    def __init__(self, view: str, directory: str = SNAPSHOT_DIR):
+        if view not in VIEWS:
+            raise ValueError(f"Vista desconocida: {view}")
+        self.view = view
+        self.path = os.path.join(directory, f"{view}.arrow")
+
+    def version(self) -> Optional[float]:
+        """mtime del archivo publicado (None si todavía no existe)"""
+        try:
+            return os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def build(self) -> Dict:
+        started = time.perf_counter()
+        frame, stats = load_view(self.view)
+        frame = PREPARE.get(self.view, lambda f: f)(frame)
+        watermark = frame['updated_at'].max() if not frame.empty else None
+        # Texto siempre como string de Arrow (una columna vacía no debe quedar con tipo null)
+        frame = frame.astype({column: pd.StringDtype("pyarrow") for column in frame.columns
+                              if frame[column].dtype == object})
+
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b'view': self.view.encode(),
+            b'watermark': watermark.isoformat().encode() if watermark is not None and not pd.isna(watermark) else b'',
+            b'built_at': datetime.datetime.utcnow().isoformat().encode(),
+        })
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            # Sin compresión: requisito para leer sin copiar desde el memory map
+            with pa.OSFile(temporary, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table, max_chunksize=max(len(frame), 1))
+            with open(temporary, 'rb') as written:
+                os.fsync(written.fileno())
+            os.replace(temporary, self.path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+        stats = {
+            'rows': len(frame),
+            'file_mb': round(os.path.getsize(self.path) / 2**20, 1),
+            'seconds': round(time.perf_counter() - started, 3),
+            'load_seconds': stats['seconds'],
+        }
+        logger.info(f"Instantánea {self.view}: {stats['rows']} filas, {stats['file_mb']} MB en {stats['seconds']}s")
+        return stats
+
+    def load(self) -> Optional[Tuple[pd.DataFrame, Optional[datetime.datetime]]]:
+        """(DataFrame respaldado por el memory map, marca de agua) o None si no hay instantánea"""
+        try:
+            source = pa.memory_map(self.path, 'r')
+        except FileNotFoundError:
+            return None
+        table = pa.ipc.open_file(source).read_all()
+        frame = table.to_pandas(types_mapper=STRING_TYPES.get)
+        watermark = (table.schema.metadata or {}).get(b'watermark') or None
+        return frame, datetime.datetime.fromisoformat(watermark.decode()) if watermark else None
+
+def build_snapshot(view: str = 'dashboard') -> Dict:
+    return Snapshot(view).build()
+
+if __name__ == "__main__":
+    import argparse
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    parser = argparse.ArgumentParser(description="Instantáneas Arrow de las vistas del dashboard")
+    parser.add_argument("command", choices=["build", "info"])
+    parser.add_argument("--view", choices=list(VIEWS), default="dashboard")
+    args = parser.parse_args()
+
+    snapshot = Snapshot(args.view)
+    if args.command == "build":
+        print(f"📦 {build_snapshot(args.view)}")
+    else:
+        started = time.perf_counter()
+        loaded = snapshot.load()
+        if loaded is None:
+            print(f"⚠️ No hay instantánea en {snapshot.path}")
+        else:
+            frame, watermark = loaded
+            print(f"📦 {snapshot.path}: {len(frame)} filas, marca de agua {watermark}, "
+                  f"abierta en {time.perf_counter() - started:.3f}s")
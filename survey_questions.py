@@ -160,6 +160,111 @@ INICIO_ENCUESTA_FRASES = [
     'iniciar'
 ]
 
+def parse_intelligent_response(response_text, question_type, options=None):
+    """Reconoce respuestas de múltiples formas para adultos mayores"""
+    response_lower = response_text.lower().strip()
+    
+    if question_type == 'buttons' and options:
+        # Mapear respuestas comunes a opciones de botones
+        for option in options:
+            option_lower = option.lower()
+            
+            # Buscar coincidencias exactas o parciales
+            if option_lower in response_lower or response_lower in option_lower:
+                return option
+            
+            # Mapear respuestas positivas (Sí)
+            if any(word in option_lower for word in ['sí', 'si', 'frecuente']):
+                if any(word in response_lower for word in ['sí', 'si', 'yes', 'claro', 'por supuesto', 'efectivamente', 'correcto', 'afirmativo']):
+                    return option
+            
+            # Mapear respuestas negativas (No)
+            if any(word in option_lower for word in ['no', 'nunca']):
+                if any(word in response_lower for word in ['no', 'nunca', 'jamás', 'para nada', 'negativo', 'tampoco']):
+                    return option
+                    
+            # Mapear respuestas ocasionales
+            if any(word in option_lower for word in ['ocasional', 'a veces']):
+                if any(word in response_lower for word in ['ocasional', 'a veces', 'algunas veces', 'de vez en cuando', 'poco', 'regular']):
+                    return option
+    
+    elif question_type == 'scale_1_5' and options:
+        # Reconocer números directos primero
+        for i, option in enumerate(options):
+            if f"{i+1}" in response_lower or f"opción {i+1}" in response_lower:
+                return option
+        
+        # Reconocer palabras descriptivas
+        for i, option in enumerate(options):
+            option_lower = option.lower()
+            
+            # Extraer la parte descriptiva después del " - "
+            if ' - ' in option_lower:
+                description = option_lower.split(' - ')[1]
+                
+                # Mapear palabras clave específicas
+                if i == 0:  # Primera opción (1 - Nada/Muy poco)
+                    if any(word in response_lower for word in ['nada', 'cero', 'ningún', 'ninguna', 'muy poco', 'mínimo']):
+                        return option
+                elif i == 1:  # Segunda opción (2 - Poco)
+                    if any(word in response_lower for word in ['poco', 'bajo', 'escaso', 'limitado']):
+                        return option
+                elif i == 2:  # Tercera opción (3 - Moderado/Regular)
+                    if any(word in response_lower for word in ['moderado', 'regular', 'medio', 'normal', 'promedio']):
+                        return option
+                elif i == 3:  # Cuarta opción (4 - Mucho/Alto)
+                    if any(word in response_lower for word in ['mucho', 'muy', 'alto', 'bastante', 'considerable']):
+                        return option
+                elif i == 4:  # Quinta opción (5 - Extremo/Máximo)
+                    if any(word in response_lower for word in ['extremo', 'máximo', 'muchísimo', 'totalmente', 'completamente']):
+                        return option
+                
+                # Buscar coincidencias parciales en la descripción
+                description_words = description.split()
+                if any(word in response_lower for word in description_words):
+                    return option
+    
+    elif question_type == 'list' and options:
+        # Para listas, buscar coincidencias similares a botones
+        for option in options:
+            option_lower = option.lower()
+            if option_lower in response_lower or response_lower in option_lower:
+                return option
+            
+            # Mapear frecuencias comunes
+            if 'diario' in option_lower or 'diariamente' in option_lower:
+                if any(word in response_lower for word in ['diario', 'todos los días', 'cada día', 'siempre']):
+                    return option
+            elif 'semana' in option_lower:
+                if any(word in response_lower for word in ['semana', 'semanal']):
+                    return option
+            elif 'mes' in option_lower:
+                if any(word in response_lower for word in ['mes', 'mensual']):
+                    return option
+            elif 'rara' in option_lower or 'nunca' in option_lower:
+                if any(word in response_lower for word in ['rara', 'nunca', 'casi nunca', 'muy poco']):
+                    return option
+    
+    # Si no encuentra coincidencia, devolver respuesta original
+    return response_text
+
+def scale_value_from_option(option):
+    """Extrae el valor entero de una opción de escala ("3 - Moderado" -> 3)"""
+    if not option:
+        return None
+    head = str(option).strip().split(' - ', 1)[0]
+    if head.isdigit() and 1 <= int(head) <= 5:
+        return int(head)
+    return None
+
+def normalize_answer(question, parsed_response):
+    """Devuelve (opción normalizada, valor de escala) para una respuesta ya parseada (pregunta compilada)"""
+    normalized_option = parsed_response if parsed_response in question.options else None
+    scale_value = None
+    if question.type == 'scale_1_5':
+        scale_value = scale_value_from_option(normalized_option)
+    return normalized_option, scale_value
+
 def get_intelligent_response(user_text, options=None, keywords=None):
     """
     Procesa respuestas de usuario de manera inteligente
@@ -0,0 +1,243 @@
+# survey_registry.py - Definiciones de encuesta compiladas, versionadas y cacheadas por worker
+#
+# Una definición (dict de Python o archivo YAML con el mismo formato que
+# ELDERLY_SURVEY_QUESTIONS) se compila una sola vez en objetos inmutables con
+# __slots__ y un grafo de transiciones precalculado: cada mensaje resuelve la
+# pregunta actual, el siguiente paso y la pregunta de seguimiento en O(1),
+# sin consultas extra. La versión (hash del contenido) se guarda en
+# feedbacks.survey_version para que cada encuesta siga con la definición con
+# la que empezó: la definición vigente se guarda en survey_definitions la
+# primera vez que se estampa en una encuesta nueva (survey_to_start; las
+# lecturas del dashboard y la analítica no escriben) y las versiones
+# anteriores se cargan de ahí (una vez por worker) cuando llega una encuesta
+# que las usa.
+#
+# Formato de una pregunta:
+#   N:
+#     text: "..."
+#     type: open | scale_1_5 | buttons | list
+#     column: qN_...
+#     options: [...]                       # opcional
+#     next: M                              # opcional, por defecto N + 1
+#     conditional:                         # opcional
+#       trigger_answer: "..." | [...]
+#       follow_up: {text, type, options?, column?}
+
+import os
+import json
+import hashlib
+import importlib
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SURVEY_DEFINITION = os.getenv("SURVEY_DEFINITION", "survey_questions:ELDERLY_SURVEY_QUESTIONS")
+QUESTION_TYPES = {"open", "scale_1_5", "buttons", "list"}
+# Las respuestas de seguimiento se guardan en survey_answers con question_no = offset + pregunta
+FOLLOWUP_QUESTION_OFFSET = 100
+
+@dataclass(frozen=True, slots=True)
+class FollowUp:
+    """Pregunta de seguimiento que se dispara con ciertas respuestas"""
+    parent: int
+    text: str
+    type: str
+    options: Tuple[str, ...] = ()
+    column: Optional[str] = None
+
+    @property
+    def number(self) -> int:
+        return FOLLOWUP_QUESTION_OFFSET + self.parent
+
+@dataclass(frozen=True, slots=True)
+class Question:
+    """Pregunta compilada de la encuesta"""
+    number: int
+    text: str
+    type: str
+    column: str
+    options: Tuple[str, ...] = ()
+    triggers: Tuple[str, ...] = ()
+
+@dataclass(frozen=True, slots=True)
+class CompiledSurvey:
+    """Definición compilada: preguntas por paso y grafo de transiciones"""
+    version: str
+    questions: Tuple[Optional[Question], ...]        # índice = paso (0 sin uso)
+    transitions: Tuple[int, ...]                      # paso -> siguiente paso
+    branches: Mapping[Tuple[int, str], FollowUp]      # (paso, respuesta) -> seguimiento
+    follow_ups: Mapping[int, FollowUp]                # paso -> seguimiento
+
+    @property
+    def total(self) -> int:
+        return len(self.questions) - 1
+
+    def question(self, step: int) -> Question:
+        return self.questions[step]
+
+    def next_step(self, step: int) -> int:
+        return self.transitions[step]
+
+    def follow_up_for(self, step: int, *answers: str) -> Optional[FollowUp]:
+        """Seguimiento disparado por la respuesta (parseada o texto original), si lo hay"""
+        for answer in answers:
+            follow_up = self.branches.get((step, answer.strip() if answer else answer))
+            if follow_up:
+                return follow_up
+        return None
+
+    def is_finished(self, step: int) -> bool:
+        return step > self.total
+
+def definition_version(definition: dict) -> str:
+    """Hash estable del contenido de la definición"""
+    canonical = json.dumps({str(k): v for k, v in definition.items()}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:12]
+
+def compile_survey(definition: dict) -> CompiledSurvey:
+    """Valida la definición y construye los objetos inmutables y las transiciones"""
+    numbers = sorted(int(number) for number in definition)
+    if numbers != list(range(1, len(numbers) + 1)):
+        raise ValueError(f"Las preguntas deben numerarse 1..N sin huecos: {numbers}")
+    total = len(numbers)
+
+    questions = [None]
+    transitions = [1]
+    branches = {}
+    follow_ups = {}
+    for number in numbers:
+        raw = definition.get(number, definition.get(str(number)))
+        if raw["type"] not in QUESTION_TYPES:
+            raise ValueError(f"Pregunta {number}: tipo desconocido '{raw['type']}'")
+
+        next_step = int(raw.get("next", number + 1))
+        if not number < next_step <= total + 1:
+            raise ValueError(f"Pregunta {number}: 'next' fuera de rango ({next_step})")
+
+        triggers = ()
+        conditional = raw.get("conditional")
+        if conditional:
+            trigger = conditional["trigger_answer"]
+            triggers = tuple(trigger) if isinstance(trigger, (list, tuple)) else (trigger,)
+            spec = conditional["follow_up"]
+            follow_up = FollowUp(
+                parent=number,
+                text=spec["text"],
+                type=spec.get("type", "open"),
+                options=tuple(spec.get("options") or ()),
+                column=spec.get("column"),
+            )
+            follow_ups[number] = follow_up
+            for answer in triggers:
+                branches[(number, answer)] = follow_up
+
+        questions.append(Question(
+            number=number,
+            text=raw["text"],
+            type=raw["type"],
+            column=raw["column"],
+            options=tuple(raw.get("options") or ()),
+            triggers=triggers,
+        ))
+        transitions.append(next_step)
+
+    return CompiledSurvey(
+        version=definition_version(definition),
+        questions=tuple(questions),
+        transitions=tuple(transitions),
+        branches=MappingProxyType(branches),
+        follow_ups=MappingProxyType(follow_ups),
+    )
+
+def load_definition(source: str) -> dict:
+    """Carga la definición desde un YAML (ruta) o un objeto Python ('modulo:NOMBRE')"""
+    if source.endswith((".yaml", ".yml")):
+        import yaml
+        with open(source, encoding="utf-8") as f:
+            data = yaml.safe_load(f)
+        return data.get("questions", data)
+
+    module_name, _, attribute = source.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+# --- Registro por worker ---
+
+_compiled_versions: Dict[str, CompiledSurvey] = {}
+_missing_versions = set()     # Versiones que no están en survey_definitions (no se vuelven a consultar)
+_saved_versions = set()       # Versiones ya guardadas por este proceso
+
+def register(definition: dict) -> CompiledSurvey:
+    """Compila (una vez por versión) y registra la definición"""
+    version = definition_version(definition)
+    if version not in _compiled_versions:
+        _compiled_versions[version] = compile_survey(definition)
+    return _compiled_versions[version]
+
+def save_definition(definition: dict) -> None:
+    """Guarda la definición en survey_definitions (idempotente por versión)"""
+    from sqlalchemy.dialects.postgresql import insert
+    from database import engine, SurveyDefinition
+    with engine.begin() as conn:
+        conn.execute(
+            insert(SurveyDefinition)
+            .values(version=definition_version(definition),
+                    definition={str(number): question for number, question in definition.items()})
+            .on_conflict_do_nothing(index_elements=[SurveyDefinition.version])
+        )
+
+def load_version(version: str) -> Optional[CompiledSurvey]:
+    """Compila y registra una versión guardada en survey_definitions; None si no existe"""
+    from sqlalchemy import select
+    from database import engine, SurveyDefinition
+    with engine.connect() as conn:
+        definition = conn.execute(
+            select(SurveyDefinition.definition).where(SurveyDefinition.version == version)).scalar()
+    if definition is None:
+        return None
+    compiled = register(definition)
+    if compiled.version != version:
+        logger.warning(f"La definición guardada como {version} tiene versión {compiled.version}")
+    _compiled_versions[version] = compiled
+    logger.info(f"Encuesta versión {version} cargada de survey_definitions ({compiled.total} preguntas)")
+    return compiled
+
+@lru_cache(maxsize=None)
+def current_survey(source: str = SURVEY_DEFINITION) -> CompiledSurvey:
+    """Definición vigente (se compila al primer uso en cada proceso; sin escribir en la base)"""
+    compiled = register(load_definition(source))
+    logger.info(f"Encuesta compilada: {source} (versión {compiled.version}, {compiled.total} preguntas)")
+    return compiled
+
+def survey_to_start(source: str = SURVEY_DEFINITION) -> CompiledSurvey:
+    """Definición vigente para estampar en encuestas nuevas: antes la guarda en
+    survey_definitions (una vez por proceso; si falla se reintenta en la próxima)"""
+    compiled = current_survey(source)
+    if compiled.version not in _saved_versions:
+        try:
+            save_definition(load_definition(source))
+            _saved_versions.add(compiled.version)
+        except Exception as e:
+            logger.error(f"No se pudo guardar la definición {compiled.version}: {e}")
+    return compiled
+
+def survey_for(survey) -> CompiledSurvey:
+    """Definición con la que empezó la encuesta (de survey_definitions si no está en este
+    worker); la vigente si la versión no se guardó nunca"""
+    version = getattr(survey, "survey_version", None)
+    compiled = _compiled_versions.get(version) if version else None
+    if compiled is None and version and version != current_survey().version and version not in _missing_versions:
+        try:
+            compiled = load_version(version)
+            if compiled is None:
+                _missing_versions.add(version)
+        except Exception as e:
+            logger.error(f"No se pudo cargar la versión de encuesta {version}: {e}")
+    if compiled is None:
+        compiled = current_survey()
+        if version and version != compiled.version:
+            logger.warning(f"Versión de encuesta {version} no registrada, usando {compiled.version}")
+    return compiled
@@ -0,0 +1,222 @@
+# survey_repository.py - Operaciones de encuesta (lectura, respuesta, cierre) en versión sync y async
+
+import logging
+import datetime
+from typing import Optional, Tuple
+from sqlalchemy import select, delete
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import Feedback, SurveyAnswer, SurveyAnswersMixin
+from survey_questions import parse_intelligent_response, normalize_answer
+from survey_registry import survey_to_start, survey_for
+from survey_runs import archive_run, aarchive_run
+from sentiment_lexicon import OPEN_TEXT_COLUMNS, sentiment_of
+
+logger = logging.getLogger(__name__)
+
+# --- Lógica compartida (sin I/O) ---
+
+def _survey_by_user(user_id: str):
+    return select(Feedback).where(Feedback.user_id == user_id).limit(1)
+
+def new_survey(user_id: str) -> Feedback:
+    """Encuesta nueva con la versión vigente de la definición"""
+    now = datetime.datetime.utcnow()
+    return Feedback(
+        user_id=user_id,
+        current_step=1,
+        status='active',
+        survey_version=survey_to_start().version,
+        is_in_followup=0,
+        created_at=now,
+        updated_at=now,
+    )
+
+def record_answer(survey: Feedback, response_text: str) -> Tuple[int, str]:
+    """Guarda la respuesta del paso actual, avanza según el grafo de transiciones
+    y activa la pregunta de seguimiento si la respuesta la dispara (no hace commit)"""
+    definition = survey_for(survey)
+    step = survey.current_step
+    question = definition.question(step)
+
+    parsed_response = parse_intelligent_response(
+        response_text,
+        question.type,
+        list(question.options) or None
+    )
+
+    if hasattr(survey, question.column):
+        setattr(survey, question.column, parsed_response)
+
+    if definition.follow_up_for(step, parsed_response, response_text):
+        survey.is_in_followup = 1
+        survey.followup_question = step
+
+    survey.current_step = definition.next_step(step)
+    survey.updated_at = datetime.datetime.utcnow()
+    return step, parsed_response
+
+def pending_follow_up(survey: Feedback):
+    """Seguimiento pendiente de la encuesta, o None. Si su definición ya no tiene ese
+    seguimiento, sale del modo seguimiento para seguir con la encuesta principal (no hace commit)"""
+    if not in_followup(survey):
+        return None
+    follow_up = survey_for(survey).follow_ups.get(survey.followup_question)
+    if follow_up is None:
+        logger.warning(f"Encuesta {survey.id}: la versión {survey.survey_version} no tiene seguimiento "
+                       f"para la pregunta {survey.followup_question}, se continúa con la encuesta principal")
+        survey.is_in_followup = 0
+        survey.followup_question = None
+    return follow_up
+
+def record_followup(survey: Feedback, response_text: str):
+    """Guarda la respuesta de seguimiento y sale del modo seguimiento (no hace commit).
+
+    Devuelve None si el seguimiento ya no existe: la respuesta queda para la
+    encuesta principal.
+    """
+    follow_up = pending_follow_up(survey)
+    if follow_up is None:
+        return None
+    if follow_up.column and hasattr(survey, follow_up.column):
+        setattr(survey, follow_up.column, response_text)
+
+    survey.is_in_followup = 0
+    survey.followup_question = None
+    survey.updated_at = datetime.datetime.utcnow()
+    return follow_up
+
+def answer_upsert(survey_id: int, question, response_text: str, parsed_response: str):
+    """INSERT ... ON CONFLICT para la fila normalizada de la respuesta (una fila angosta por pregunta)"""
+    question_no = question.number
+    normalized_option, scale_value = normalize_answer(question, parsed_response)
+    values = {
+        'raw_text': response_text,
+        'normalized_option': normalized_option,
+        'scale_value': scale_value,
+        'answered_at': datetime.datetime.utcnow(),
+    }
+    stmt = insert(SurveyAnswer).values(survey_id=survey_id, question_no=question_no, **values)
+    return stmt.on_conflict_do_update(index_elements=['survey_id', 'question_no'], set_=values)
+
+def mark_completed(survey: Feedback) -> None:
+    """Marca la encuesta como completada con su sentimiento local (no hace commit)"""
+    survey.status = 'completed'
+    survey.final_sentiment = sentiment_of({column: getattr(survey, column) for column in OPEN_TEXT_COLUMNS})
+    survey.updated_at = datetime.datetime.utcnow()
+
+def is_finished(survey: Feedback) -> bool:
+    return survey_for(survey).is_finished(survey.current_step)
+
+def in_followup(survey: Feedback) -> bool:
+    return bool(survey.is_in_followup) and survey.followup_question is not None
+
+def reset_run(survey: Feedback) -> None:
+    """Deja la fila lista para una corrida nueva: respuestas vacías, paso 1 (no hace commit)"""
+    for column in vars(SurveyAnswersMixin):
+        if not column.startswith('_'):
+            setattr(survey, column, None)
+    survey.current_step = 1
+    survey.status = 'active'
+    survey.survey_version = survey_to_start().version
+    survey.is_in_followup = 0
+    survey.followup_question = None
+    survey.created_at = datetime.datetime.utcnow()
+    survey.updated_at = survey.created_at
+
+def _answers_of(survey_id: int):
+    return delete(SurveyAnswer).where(SurveyAnswer.survey_id == survey_id)
+
+# --- Versión síncrona (SessionLocal) ---
+
+def get_survey(db: Session, user_id: str) -> Optional[Feedback]:
+    """Obtiene la encuesta del usuario"""
+    return db.execute(_survey_by_user(user_id)).scalars().first()
+
+def store_answer(db: Session, survey: Feedback, response_text: str) -> Tuple[int, str]:
+    """Registra la respuesta en la columna ancha y en survey_answers (no hace commit)"""
+    step, parsed_response = record_answer(survey, response_text)
+    question = survey_for(survey).question(step)
+    db.execute(answer_upsert(survey.id, question, response_text, parsed_response))
+    return step, parsed_response
+
+def store_followup(db: Session, survey: Feedback, response_text: str):
+    """Registra la respuesta de seguimiento en survey_answers (no hace commit); None si ya no existe"""
+    follow_up = record_followup(survey, response_text)
+    if follow_up is not None:
+        db.execute(answer_upsert(survey.id, follow_up, response_text, response_text))
+    return follow_up
+
+def save_answer(db: Session, survey: Feedback, response_text: str) -> Tuple[int, str]:
+    """Registra la respuesta (o la de seguimiento), cierra la encuesta si era la última y hace commit"""
+    follow_up = store_followup(db, survey, response_text) if in_followup(survey) else None
+    if follow_up is not None:
+        result = (follow_up.number, response_text)
+    else:
+        result = store_answer(db, survey, response_text)
+    if is_finished(survey) and not in_followup(survey):
+        mark_completed(survey)
+        archive_run(db, survey)
+    db.commit()
+    return result
+
+def complete_survey(db: Session, survey: Feedback) -> None:
+    """Marca la encuesta como completada, la archiva en survey_runs y hace commit"""
+    mark_completed(survey)
+    archive_run(db, survey)
+    db.commit()
+
+def restart_survey(db: Session, survey: Feedback) -> None:
+    """Archiva la corrida completada y reinicia la encuesta sin perder historia (no hace commit)"""
+    if survey.status == 'completed':
+        archive_run(db, survey)
+    db.execute(_answers_of(survey.id))
+    reset_run(survey)
+
+# --- Versión async (AsyncSessionLocal) ---
+
+async def aget_survey(session: AsyncSession, user_id: str) -> Optional[Feedback]:
+    """Obtiene la encuesta del usuario (async)"""
+    result = await session.execute(_survey_by_user(user_id))
+    return result.scalars().first()
+
+async def astore_answer(session: AsyncSession, survey: Feedback, response_text: str) -> Tuple[int, str]:
+    """Registra la respuesta en la columna ancha y en survey_answers (async, no hace commit)"""
+    step, parsed_response = record_answer(survey, response_text)
+    question = survey_for(survey).question(step)
+    await session.execute(answer_upsert(survey.id, question, response_text, parsed_response))
+    return step, parsed_response
+
+async def astore_followup(session: AsyncSession, survey: Feedback, response_text: str):
+    """Registra la respuesta de seguimiento en survey_answers (async, no hace commit); None si ya no existe"""
+    follow_up = record_followup(survey, response_text)
+    if follow_up is not None:
+        await session.execute(answer_upsert(survey.id, follow_up, response_text, response_text))
+    return follow_up
+
+async def asave_answer(session: AsyncSession, survey: Feedback, response_text: str) -> Tuple[int, str]:
+    """Registra la respuesta (o la de seguimiento), cierra la encuesta si era la última y hace commit (async)"""
+    follow_up = await astore_followup(session, survey, response_text) if in_followup(survey) else None
+    if follow_up is not None:
+        result = (follow_up.number, response_text)
+    else:
+        result = await astore_answer(session, survey, response_text)
+    if is_finished(survey) and not in_followup(survey):
+        mark_completed(survey)
+        await aarchive_run(session, survey)
+    await session.commit()
+    return result
+
+async def acomplete_survey(session: AsyncSession, survey: Feedback) -> None:
+    """Marca la encuesta como completada, la archiva en survey_runs y hace commit (async)"""
+    mark_completed(survey)
+    await aarchive_run(session, survey)
+    await session.commit()
+
+async def arestart_survey(session: AsyncSession, survey: Feedback) -> None:
+    """Archiva la corrida completada y reinicia la encuesta (async, no hace commit)"""
+    if survey.status == 'completed':
+        await aarchive_run(session, survey)
+    await session.execute(_answers_of(survey.id))
+    reset_run(survey)
@@ -0,0 +1,180 @@
+# survey_runs.py - Historial de corridas de encuesta particionado por mes (created_at)
+#
+# feedbacks guarda la corrida en curso de cada usuario (una fila por user_id).
+# Al completarse, la corrida se copia a survey_runs, cuya partición mensual
+# corresponde a su created_at; así reiniciar la encuesta ya no pierde historia.
+# El sentimiento y el perfil llegan después (insights.write_insights), que los
+# copia también a la corrida ya archivada.
+# Las particiones viejas se separan (DETACH) y se mueven al schema de archivo.
+
+import os
+import datetime
+import logging
+from typing import List, Optional
+from sqlalchemy import select, update, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from database import Feedback, SurveyRun, engine
+
+logger = logging.getLogger(__name__)
+
+SURVEY_RUNS_TABLE = SurveyRun.__tablename__
+ARCHIVE_SCHEMA = os.getenv("SURVEY_ARCHIVE_SCHEMA", "archive")
+ARCHIVE_TABLESPACE = os.getenv("SURVEY_ARCHIVE_TABLESPACE")          # Opcional: almacenamiento barato
+ARCHIVE_AFTER_MONTHS = int(os.getenv("SURVEY_ARCHIVE_AFTER_MONTHS", "12"))
+PARTITIONS_AHEAD = int(os.getenv("SURVEY_PARTITIONS_AHEAD", "2"))
+
+# Columnas copiadas de feedbacks a survey_runs (control + respuestas + análisis)
+RUN_COLUMNS = [
+    column.name for column in SurveyRun.__table__.c
+    if column.name in Feedback.__table__.c and column.name not in ("id", "created_at")
+]
+# Análisis que se calcula después de archivar la corrida
+INSIGHT_COLUMNS = ['final_sentiment', 'final_summary', 'summary_hash']
+
+# --- Particiones ---
+
+def month_start(value: datetime.datetime) -> datetime.date:
+    return datetime.date(value.year, value.month, 1)
+
+def next_month(value: datetime.date) -> datetime.date:
+    return datetime.date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+def previous_month(value: datetime.date) -> datetime.date:
+    return datetime.date(value.year - (value.month == 1), (value.month - 2) % 12 + 1, 1)
+
+def partition_name(month: datetime.date) -> str:
+    return f"{SURVEY_RUNS_TABLE}_{month:%Y_%m}"
+
+def partition_ddl(month: datetime.date) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {SURVEY_RUNS_TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+    )
+
+def ensure_partitions(conn, months_ahead: int = PARTITIONS_AHEAD, since: Optional[datetime.date] = None) -> List[str]:
+    """Crea las particiones del mes actual (o desde `since`) y de los próximos meses"""
+    month = month_start(since or datetime.datetime.utcnow())
+    last = month_start(datetime.datetime.utcnow())
+    for _ in range(months_ahead):
+        last = next_month(last)
+
+    created = []
+    while month <= last:
+        conn.execute(text(partition_ddl(month)))
+        created.append(partition_name(month))
+        month = next_month(month)
+    return created
+
+def detach_old_partitions(older_than_months: int = ARCHIVE_AFTER_MONTHS) -> List[str]:
+    """Separa las particiones anteriores al corte y las mueve al schema de archivo"""
+    cutoff = month_start(datetime.datetime.utcnow())
+    for _ in range(older_than_months):
+        cutoff = previous_month(cutoff)
+
+    detached = []
+    # DETACH ... CONCURRENTLY no puede correr dentro de una transacción
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        partitions = conn.execute(text("""
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = :parent
+            ORDER BY c.relname
+        """), {"parent": SURVEY_RUNS_TABLE}).scalars().all()
+
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+        for name in partitions:
+            year, month = name.rsplit("_", 2)[-2:]
+            if datetime.date(int(year), int(month), 1) >= cutoff:
+                continue
+            conn.execute(text(f"ALTER TABLE {SURVEY_RUNS_TABLE} DETACH PARTITION {name} CONCURRENTLY"))
+            conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+            if ARCHIVE_TABLESPACE:
+                # La partición ya está separada: reescribirla no bloquea al bot
+                conn.execute(text(f"ALTER TABLE {ARCHIVE_SCHEMA}.{name} SET TABLESPACE {ARCHIVE_TABLESPACE}"))
+            logger.info(f"Partición archivada: {ARCHIVE_SCHEMA}.{name}")
+            detached.append(name)
+    return detached
+
+# --- Archivo de corridas ---
+
+def archive_run_statement(feedback_id: int):
+    """INSERT ... SELECT de la corrida actual de feedbacks a su partición mensual (idempotente)"""
+    run_created_at = func.coalesce(Feedback.created_at, Feedback.updated_at, func.timezone('utc', func.now()))
+    source = select(
+        Feedback.id,
+        run_created_at,
+        *[getattr(Feedback, column) for column in RUN_COLUMNS],
+    ).where(Feedback.id == feedback_id)
+
+    stmt = insert(SurveyRun).from_select(["feedback_id", "created_at"] + RUN_COLUMNS, source)
+    return stmt.on_conflict_do_update(
+        index_elements=["feedback_id", "created_at"],
+        set_={column: stmt.excluded[column] for column in RUN_COLUMNS},
+    )
+
+def sync_run_insights_statement(feedback_ids: List[int]):
+    """UPDATE ... FROM feedbacks: copia el análisis a la corrida completada ya archivada
+
+    Solo actualiza filas existentes (nunca inserta en una partición separada o
+    que falte) y solo si la encuesta sigue completada: si ya se reinició, la
+    corrida archivada no corresponde a la fila viva.
+    """
+    run_created_at = func.coalesce(Feedback.created_at, Feedback.updated_at)
+    return (
+        update(SurveyRun)
+        .where(SurveyRun.feedback_id == Feedback.id)
+        .where(SurveyRun.created_at == run_created_at)
+        .where(Feedback.id.in_(feedback_ids))
+        .where(Feedback.status == 'completed')
+        .values({column: getattr(Feedback, column) for column in INSIGHT_COLUMNS})
+        .execution_options(synchronize_session=False)
+    )
+
+def _run_month(survey: Feedback) -> datetime.date:
+    return month_start(survey.created_at or survey.updated_at or datetime.datetime.utcnow())
+
+def archive_run(db, survey: Feedback) -> None:
+    """Copia la corrida a survey_runs; crea la partición si falta (no hace commit)"""
+    db.flush()
+    try:
+        with db.begin_nested():
+            db.execute(archive_run_statement(survey.id))
+    except IntegrityError:
+        # Corrida de un mes sin partición (p. ej. iniciada antes del último mantenimiento)
+        db.execute(text(partition_ddl(_run_month(survey))))
+        db.execute(archive_run_statement(survey.id))
+
+async def aarchive_run(session, survey: Feedback) -> None:
+    """Versión async de archive_run"""
+    await session.flush()
+    try:
+        async with session.begin_nested():
+            await session.execute(archive_run_statement(survey.id))
+    except IntegrityError:
+        await session.execute(text(partition_ddl(_run_month(survey))))
+        await session.execute(archive_run_statement(survey.id))
+
+# --- Lectura con poda de particiones ---
+
+def runs_in_range_query(start: datetime.date, end: datetime.date):
+    """Corridas con created_at en [start, end]: PostgreSQL solo lee las particiones del rango"""
+    return (
+        select(SurveyRun)
+        .where(SurveyRun.created_at >= start)
+        .where(SurveyRun.created_at < end + datetime.timedelta(days=1))
+        .order_by(SurveyRun.created_at)
+    )
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Mantenimiento de particiones de survey_runs")
+    parser.add_argument("--detach", action="store_true", help="Archivar particiones viejas")
+    args = parser.parse_args()
+
+    with engine.begin() as conn:
+        print(f"📅 Particiones listas: {', '.join(ensure_partitions(conn))}")
+    if args.detach:
+        print(f"📦 Particiones archivadas: {detach_old_partitions() or 'ninguna'}")
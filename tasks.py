@@ -6,11 +6,22 @@ import logging
 import ffmpeg
 import wave
 from datetime import datetime
-from celery import Celery
+from celery import Celery, chain
+from celery.schedules import crontab
+from sqlalchemy.exc import IntegrityError
 from dotenv import load_dotenv
 from vosk import Model, KaldiRecognizer
-from database import SessionLocal, Feedback
-from survey_questions import ELDERLY_SURVEY_QUESTIONS
+from database import SessionLocal, Feedback, engine
+from survey_registry import current_survey, survey_for
+from survey_repository import new_survey, store_answer, store_followup, in_followup, pending_follow_up, is_finished, complete_survey, restart_survey
+from survey_runs import ensure_partitions, detach_old_partitions
+from reminders import REMINDER_TEMPLATE, REMINDER_TEMPLATE_LANGUAGE, sweep_abandoned_surveys, release_claim, reminder_pending
+from campaigns import INVITED_STATUS, dispatch_campaign
+from insights import compute_insights, answers_of, write_insights, backfill_insights
+from themes import refresh_themes
+from snapshots import build_snapshot
+from exports import write_export
+from kpi_views import KPI_REFRESH_MINUTES, refresh_kpi_views
 from whatsapp_service import whatsapp_service
 from audio_processing import process_elderly_audio, cleanup_audio_files, analyze_audio_quality, transcribe_with_vosk
 
@@ -24,6 +35,38 @@ logger = logging.getLogger(__name__)
 # Configuración de Celery
 app = Celery('tasks', broker=os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0'))
 
+# Límite de envío de recordatorios por worker (cuota de la Graph API)
+REMINDER_RATE_LIMIT = os.getenv('REMINDER_RATE_LIMIT', '20/s')
+# Reintentos de un recordatorio fallido antes de liberar el reclamo
+REMINDER_SEND_RETRIES = int(os.getenv('REMINDER_SEND_RETRIES', '3'))
+# Límite de llamadas a Gemini por worker para sentimiento/perfil
+INSIGHTS_RATE_LIMIT = os.getenv('INSIGHTS_RATE_LIMIT', '30/m')
+
+# Tareas periódicas (celery -A tasks beat)
+app.conf.beat_schedule = {
+    'sweep-abandoned-surveys': {
+        'task': 'tasks.sweep_abandoned_surveys_task',
+        'schedule': crontab(minute='*/15'),
+    },
+    'maintain-survey-run-partitions': {
+        'task': 'tasks.maintain_survey_run_partitions',
+        'schedule': crontab(minute=0, hour=3, day_of_month=1),
+    },
+    'refresh-answer-themes': {
+        'task': 'tasks.refresh_themes_task',
+        'schedule': crontab(minute=30),
+    },
+    'build-dashboard-snapshot': {
+        'task': 'tasks.build_snapshot_task',
+        'schedule': crontab(minute='*/10'),
+    },
+    'refresh-kpi-views': {
+        'task': 'tasks.refresh_kpi_views_task',
+        # Intervalo en segundos: crontab '*/N' solo sirve con divisores de 60
+        'schedule': KPI_REFRESH_MINUTES * 60,
+    },
+}
+
 # Configuraciones de WhatsApp (para compatibilidad)
 WHATSAPP_API_TOKEN = os.getenv('WHATSAPP_API_TOKEN')
 WHATSAPP_PHONE_NUMBER_ID = os.getenv('WHATSAPP_PHONE_NUMBER_ID')
@@ -79,6 +122,10 @@ def process_whatsapp_message(payload):
             # Buscar encuesta existente
             survey = db.query(Feedback).filter_by(user_id=from_number).first()
             
+            # Invitado por campaña: su primer mensaje (texto, botón o audio) inicia la encuesta
+            if survey and survey.status == INVITED_STATUS:
+                return start_new_survey(db, from_number)
+            
             # Procesar según tipo de mensaje
             if message_type == 'text':
                 text_body = message['text']['body'].strip()
@@ -325,26 +372,25 @@ def start_new_survey(db, from_number):
         existing_survey = db.query(Feedback).filter_by(user_id=from_number).first()
         
         if existing_survey:
-            if existing_survey.status == 'completed':
-                # Reiniciar encuesta completada
-                existing_survey.current_step = 1
-                existing_survey.status = 'active'
-                existing_survey.created_at = datetime.now()
+            if existing_survey.status in ('completed', INVITED_STATUS):
+                # Reiniciar encuesta completada (la corrida anterior queda en survey_runs)
+                # o activar la pre-creada por una campaña
+                restart_survey(db, existing_survey)
                 survey = existing_survey
             else:
                 # Continuar encuesta existente
                 survey = existing_survey
         else:
             # Crear nueva encuesta
-            survey = Feedback(
-                user_id=from_number,
-                current_step=1,
-                status='active',
-                created_at=datetime.now()
-            )
+            survey = new_survey(from_number)
             db.add(survey)
         
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            # Otro mensaje del mismo usuario creó la encuesta en paralelo (uq_feedbacks_user_id)
+            db.rollback()
+            survey = db.query(Feedback).filter_by(user_id=from_number).first()
         
         # Mensaje de bienvenida
         welcome_msg = """👋 ¡Bienvenido/a a nuestra encuesta!
@@ -368,94 +414,6 @@ def start_new_survey(db, from_number):
         logger.error(f"Error iniciando encuesta: {e}")
         return {'status': 'error'}
 
-def parse_intelligent_response(response_text, question_type, options=None):
-    """Reconoce respuestas de múltiples formas para adultos mayores"""
-    response_lower = response_text.lower().strip()
-    
-    if question_type == 'buttons' and options:
-        # Mapear respuestas comunes a opciones de botones
-        for option in options:
-            option_lower = option.lower()
-            
-            # Buscar coincidencias exactas o parciales
-            if option_lower in response_lower or response_lower in option_lower:
-                return option
-            
-            # Mapear respuestas positivas (Sí)
-            if any(word in option_lower for word in ['sí', 'si', 'frecuente']):
-                if any(word in response_lower for word in ['sí', 'si', 'yes', 'claro', 'por supuesto', 'efectivamente', 'correcto', 'afirmativo']):
-                    return option
-            
-            # Mapear respuestas negativas (No)
-            if any(word in option_lower for word in ['no', 'nunca']):
-                if any(word in response_lower for word in ['no', 'nunca', 'jamás', 'para nada', 'negativo', 'tampoco']):
-                    return option
-                    
-            # Mapear respuestas ocasionales
-            if any(word in option_lower for word in ['ocasional', 'a veces']):
-                if any(word in response_lower for word in ['ocasional', 'a veces', 'algunas veces', 'de vez en cuando', 'poco', 'regular']):
-                    return option
-    
-    elif question_type == 'scale_1_5' and options:
-        # Reconocer números directos primero
-        for i, option in enumerate(options):
-            if f"{i+1}" in response_lower or f"opción {i+1}" in response_lower:
-                return option
-        
-        # Reconocer palabras descriptivas
-        for i, option in enumerate(options):
-            option_lower = option.lower()
-            
-            # Extraer la parte descriptiva después del " - "
-            if ' - ' in option_lower:
-                description = option_lower.split(' - ')[1]
-                
-                # Mapear palabras clave específicas
-                if i == 0:  # Primera opción (1 - Nada/Muy poco)
-                    if any(word in response_lower for word in ['nada', 'cero', 'ningún', 'ninguna', 'muy poco', 'mínimo']):
-                        return option
-                elif i == 1:  # Segunda opción (2 - Poco)
-                    if any(word in response_lower for word in ['poco', 'bajo', 'escaso', 'limitado']):
-                        return option
-                elif i == 2:  # Tercera opción (3 - Moderado/Regular)
-                    if any(word in response_lower for word in ['moderado', 'regular', 'medio', 'normal', 'promedio']):
-                        return option
-                elif i == 3:  # Cuarta opción (4 - Mucho/Alto)
-                    if any(word in response_lower for word in ['mucho', 'muy', 'alto', 'bastante', 'considerable']):
-                        return option
-                elif i == 4:  # Quinta opción (5 - Extremo/Máximo)
-                    if any(word in response_lower for word in ['extremo', 'máximo', 'muchísimo', 'totalmente', 'completamente']):
-                        return option
-                
-                # Buscar coincidencias parciales en la descripción
-                description_words = description.split()
-                if any(word in response_lower for word in description_words):
-                    return option
-    
-    elif question_type == 'list' and options:
-        # Para listas, buscar coincidencias similares a botones
-        for option in options:
-            option_lower = option.lower()
-            if option_lower in response_lower or response_lower in option_lower:
-                return option
-            
-            # Mapear frecuencias comunes
-            if 'diario' in option_lower or 'diariamente' in option_lower:
-                if any(word in response_lower for word in ['diario', 'todos los días', 'cada día', 'siempre']):
-                    return option
-            elif 'semana' in option_lower:
-                if any(word in response_lower for word in ['semana', 'semanal']):
-                    return option
-            elif 'mes' in option_lower:
-                if any(word in response_lower for word in ['mes', 'mensual']):
-                    return option
-            elif 'rara' in option_lower or 'nunca' in option_lower:
-                if any(word in response_lower for word in ['rara', 'nunca', 'casi nunca', 'muy poco']):
-                    return option
-    
-    # Si no encuentra coincidencia, devolver respuesta original
-    return response_text
-
 def reset_survey(db, survey, from_number):
     """TESTING: Resetea la encuesta para poder empezar de nuevo"""
     try:
@@ -481,14 +439,15 @@ def jump_to_question(db, survey, from_number, question_num):
             send_whatsapp_message(from_number, "❌ No hay encuesta activa. Escriba 'encuesta' para empezar.")
             return {'status': 'no_survey'}
         
-        if question_num < 1 or question_num > len(ELDERLY_SURVEY_QUESTIONS):
-            send_whatsapp_message(from_number, f"❌ Pregunta inválida. Use números del 1 al {len(ELDERLY_SURVEY_QUESTIONS)}")
+        total_questions = survey_for(survey).total
+        if question_num < 1 or question_num > total_questions:
+            send_whatsapp_message(from_number, f"❌ Pregunta inválida. Use números del 1 al {total_questions}")
             return {'status': 'invalid_question'}
         
         # Saltar a la pregunta especificada
         survey.current_step = question_num
-        # survey.is_in_followup = 0  # Reset seguimiento (TEMPORALMENTE DESHABILITADO)
-        # survey.followup_question = None  # TEMPORALMENTE DESHABILITADO
+        survey.is_in_followup = 0  # Reset seguimiento
+        survey.followup_question = None
         db.commit()
         
         send_whatsapp_message(from_number, f"⏭️ Saltando a pregunta {question_num}...")
@@ -509,8 +468,9 @@ def show_survey_status(db, survey, from_number):
         status_msg = f"""📊 **Estado de la Encuesta**
         
 👤 Usuario: {survey.user_id}
-📍 Pregunta actual: {survey.current_step}/{len(ELDERLY_SURVEY_QUESTIONS)}
-🔄 En seguimiento: No (funcionalidad deshabilitada)
+📍 Pregunta actual: {survey.current_step}/{survey_for(survey).total}
+🔄 En seguimiento: {f"Sí (pregunta {survey.followup_question})" if in_followup(survey) else "No"}
+🏷️ Versión: {survey.survey_version or '-'}
 
 **Comandos disponibles:**
 • 'reset' - Resetear encuesta
@@ -526,11 +486,11 @@ def show_survey_status(db, survey, from_number):
 def validate_response_completion(survey, current_step):
     """Control estricto: valida que la pregunta actual esté respondida antes de avanzar"""
     try:
-        if current_step > len(ELDERLY_SURVEY_QUESTIONS):
+        definition = survey_for(survey)
+        if definition.is_finished(current_step):
             return True
             
-        question = ELDERLY_SURVEY_QUESTIONS[current_step]
-        column_name = question['column']
+        column_name = definition.question(current_step).column
         
         if hasattr(survey, column_name):
             current_response = getattr(survey, column_name)
@@ -544,57 +504,44 @@ def validate_response_completion(survey, current_step):
 def handle_followup_response(db, survey, from_number, response_text):
     """Maneja respuestas a preguntas de seguimiento condicionales"""
     try:
-        # Obtener el número de pregunta original que disparó el seguimiento
-        original_question_num = survey.followup_question
-        original_question = ELDERLY_SURVEY_QUESTIONS[original_question_num]
-        
-        # Obtener configuración de la pregunta de seguimiento
-        follow_up_config = original_question['conditional']['follow_up']
-        follow_up_column = follow_up_config['column']
-        
-        # Guardar respuesta de seguimiento
-        if hasattr(survey, follow_up_column):
-            setattr(survey, follow_up_column, response_text)
-            logger.info(f"Respuesta de seguimiento guardada: {follow_up_column} = '{response_text}'")
-        
-        # Terminar el modo de seguimiento
-        survey.is_in_followup = 0
-        survey.followup_question = None
-        
-        # Avanzar al siguiente paso de la encuesta principal
-        survey.current_step = original_question_num + 1
-        survey.updated_at = datetime.now()
+        # Guardar respuesta de seguimiento y terminar el modo de seguimiento;
+        # current_step ya apunta al siguiente paso de la encuesta principal
+        follow_up = store_followup(db, survey, response_text)
+        if follow_up is None:
+            # La definición de la encuesta ya no tiene ese seguimiento: la
+            # respuesta va a la pregunta principal pendiente
+            return process_survey_response(db, survey, from_number, response_text)
+        logger.info(f"Respuesta de seguimiento guardada para pregunta {follow_up.parent}: '{response_text}'")
         
         # Enviar siguiente pregunta principal o finalizar
-        if survey.current_step <= len(ELDERLY_SURVEY_QUESTIONS):
+        if not is_finished(survey):
             send_current_question(survey, from_number)
             db.commit()
             return {'status': 'followup_completed_next_question'}
         else:
+            complete_survey(db, survey)
+            queue_survey_insights(survey.id)
             send_whatsapp_message(from_number, "¡Felicitaciones! Ha completado toda la encuesta. Gracias por compartir su experiencia.")
-            db.commit()
             return {'status': 'survey_completed'}
             
     except Exception as e:
         logger.error(f"Error procesando respuesta de seguimiento: {e}")
-        survey.is_in_followup = 0  # Reset en caso de error
+        db.rollback()
         return {'status': 'error'}
 
-def send_followup_question(from_number, follow_up_config):
+def send_followup_question(from_number, follow_up):
     """Envía una pregunta de seguimiento condicional"""
     try:
-        question_text = follow_up_config['text']
-        question_type = follow_up_config['type']
+        question_text = follow_up.text
+        question_type = follow_up.type
         
         if question_type == 'open':
             # Pregunta abierta, solo enviar texto
             return send_whatsapp_message(from_number, question_text)
         elif question_type == 'buttons':
-            options = follow_up_config.get('options', [])
-            return send_whatsapp_buttons(from_number, question_text, options)
-        elif question_type == 'list':
-            options = follow_up_config.get('options', [])
-            return send_whatsapp_list(from_number, question_text, options)
+            return send_whatsapp_buttons(from_number, question_text, list(follow_up.options))
+        elif question_type in ('list', 'scale_1_5'):
+            return send_whatsapp_list(from_number, "Pregunta adicional", question_text, list(follow_up.options))
         else:
             return send_whatsapp_message(from_number, question_text)
             
@@ -605,14 +552,19 @@ def send_followup_question(from_number, follow_up_config):
 def process_survey_response(db, survey, from_number, response_text):
     """Procesa respuesta de encuesta con reconocimiento inteligente y control estricto"""
     try:
+        # Primera respuesta después de un recordatorio (plantilla sin la pregunta):
+        # se reenvía la pregunta pendiente en vez de tomar el mensaje como respuesta
+        if reminder_pending(survey):
+            return resume_after_reminder(db, survey, from_number)
+        
         # Verificar si estamos en una pregunta de seguimiento
-        # TEMPORALMENTE DESHABILITADO hasta resolver problema de BD
-        # if hasattr(survey, 'is_in_followup') and survey.is_in_followup == 1:
-        #     return handle_followup_response(db, survey, from_number, response_text)
+        if in_followup(survey):
+            return handle_followup_response(db, survey, from_number, response_text)
         
+        definition = survey_for(survey)
         current_step = survey.current_step
         
-        if current_step > len(ELDERLY_SURVEY_QUESTIONS):
+        if definition.is_finished(current_step):
             send_whatsapp_message(from_number, "¡Ya ha completado la encuesta! Gracias por su participación.")
             return {'status': 'already_completed'}
         
@@ -621,8 +573,8 @@ def process_survey_response(db, survey, from_number, response_text):
         # if validate_response_completion(survey, current_step):
         if False:  # Temporalmente deshabilitado para testing
             # Ya respondió esta pregunta, informar amablemente
-            next_step = current_step + 1
-            if next_step <= len(ELDERLY_SURVEY_QUESTIONS):
+            next_step = definition.next_step(current_step)
+            if not definition.is_finished(next_step):
                 send_whatsapp_message(
                     from_number, 
                     f"Ya respondió la pregunta {current_step}. Continuemos con la siguiente pregunta."
@@ -635,55 +587,26 @@ def process_survey_response(db, survey, from_number, response_text):
                 send_whatsapp_message(from_number, "¡Ya ha completado toda la encuesta! 🎉")
                 return {'status': 'survey_completed'}
         
-        # Obtener pregunta actual
-        question = ELDERLY_SURVEY_QUESTIONS[current_step]
-        column_name = question['column']
-        
-        # Reconocimiento inteligente de respuesta
-        parsed_response = parse_intelligent_response(
-            response_text, 
-            question['type'], 
-            question.get('options')
-        )
+        # Reconocimiento inteligente de respuesta, guardado y avance de paso
+        # (store_answer marca el seguimiento si la respuesta lo dispara)
+        _, parsed_response = store_answer(db, survey, response_text)
+        logger.info(f"Respuesta inteligente guardada para pregunta {current_step}: '{response_text}' -> '{parsed_response}'")
         
-        # Guardar respuesta parseada
-        if hasattr(survey, column_name):
-            setattr(survey, column_name, parsed_response)
-            logger.info(f"Respuesta inteligente guardada para pregunta {current_step}: '{response_text}' -> '{parsed_response}'")
-        
-        # Verificar si hay pregunta condicional de seguimiento
-        # TEMPORALMENTE DESHABILITADO hasta resolver problema de BD
-        # if 'conditional' in question:
-        if False:  # Deshabilitar preguntas condicionales temporalmente
-            conditional = question['conditional']
-            trigger_answer = conditional['trigger_answer']
-            
-            # Si la respuesta coincide con el trigger, mostrar pregunta de seguimiento
-            if parsed_response == trigger_answer or response_text.strip() == trigger_answer:
-                follow_up = conditional['follow_up']
-                # Marcar que estamos en una pregunta de seguimiento
-                survey.is_in_followup = 1
-                survey.followup_question = current_step
-                db.commit()
-                
-                # Enviar pregunta de seguimiento
-                send_followup_question(from_number, follow_up)
-                return {'status': 'followup_sent'}
-        
-        # Avanzar al siguiente paso
-        survey.current_step = current_step + 1
-        survey.updated_at = datetime.now()
+        # Pregunta condicional de seguimiento (resuelta en el grafo compilado, sin consultas)
+        if in_followup(survey):
+            db.commit()
+            send_followup_question(from_number, definition.follow_ups[current_step])
+            return {'status': 'followup_sent'}
         
-        if survey.current_step <= len(ELDERLY_SURVEY_QUESTIONS):
+        if not is_finished(survey):
             # Enviar siguiente pregunta
             send_current_question(survey, from_number)
             db.commit()
             return {'status': 'question_sent', 'step': survey.current_step}
         else:
-            # Encuesta completada
-            survey.status = 'completed'
-            survey.completed_at = datetime.now()
-            db.commit()
+            # Encuesta completada: sentimiento y perfil se calculan en segundo plano
+            complete_survey(db, survey)
+            queue_survey_insights(survey.id)
             
             completion_msg = """¡Encuesta completada!
 
@@ -697,30 +620,42 @@ Muchas gracias por dedicar su tiempo a responder nuestras preguntas. Sus respues
         logger.error(f"Error procesando respuesta: {e}")
         return {'status': 'error'}
 
+def resume_after_reminder(db, survey, from_number):
+    """Reenvía la pregunta (o el seguimiento) pendiente y registra la actividad"""
+    follow_up = pending_follow_up(survey)
+    survey.updated_at = datetime.utcnow()
+    db.commit()
+    if follow_up is not None:
+        send_followup_question(from_number, follow_up)
+    else:
+        send_current_question(survey, from_number)
+    return {'status': 'resumed_after_reminder', 'step': survey.current_step}
+
 def send_current_question(survey, from_number):
     """Envía la pregunta actual según su tipo"""
     try:
+        definition = survey_for(survey)
         current_step = survey.current_step
         
-        if current_step > len(ELDERLY_SURVEY_QUESTIONS):
+        if definition.is_finished(current_step):
             return False
         
-        question = ELDERLY_SURVEY_QUESTIONS[current_step]
-        question_text = f"📝 Pregunta {current_step} de {len(ELDERLY_SURVEY_QUESTIONS)}\n\n{question['text']}"
+        question = definition.question(current_step)
+        question_text = f"📝 Pregunta {current_step} de {definition.total}\n\n{question.text}"
         
-        if question['type'] == 'open':
+        if question.type == 'open':
             return send_whatsapp_message(from_number, question_text)
         
-        elif question['type'] == 'scale_1_5':
+        elif question.type == 'scale_1_5':
             return send_whatsapp_list(
                 from_number,
                 f"Pregunta {current_step}",
-                question['text'],
-                question['options']
+                question.text,
+                list(question.options)
             )
         
-        elif question['type'] == 'buttons':
-            return send_whatsapp_buttons(from_number, question_text, question['options'])
+        elif question.type == 'buttons':
+            return send_whatsapp_buttons(from_number, question_text, list(question.options))
         
         else:
             return send_whatsapp_message(from_number, question_text)
@@ -740,8 +675,9 @@ def health_check():
         
         return {
             'status': 'healthy',
-            'timestamp': datetime.now().isoformat(),
-            'questions_loaded': len(ELDERLY_SURVEY_QUESTIONS)
+            'timestamp': datetime.utcnow().isoformat(),
+            'questions_loaded': current_survey().total,
+            'survey_version': current_survey().version
         }
     except Exception as e:
         return {
@@ -749,9 +685,144 @@ def health_check():
             'error': str(e)
         }
 
+@app.task
+def sweep_abandoned_surveys_task():
+    """Encola un recordatorio por cada encuesta activa abandonada (a lo sumo uno por abandono)"""
+    try:
+        stats = sweep_abandoned_surveys(send_survey_reminder.delay)
+        return {'status': 'ok', **stats}
+    except Exception as e:
+        logger.error(f"Error en barrido de recordatorios: {e}")
+        return {'status': 'error', 'error': str(e)}
+
+@app.task(bind=True, rate_limit=REMINDER_RATE_LIMIT, max_retries=REMINDER_SEND_RETRIES, default_retry_delay=60)
+def send_survey_reminder(self, feedback_id):
+    """Recuerda la encuesta pendiente con la plantilla aprobada (fuera de la ventana de 24h
+    no se aceptan mensajes libres); la pregunta se reenvía cuando la persona contesta"""
+    db = SessionLocal()
+    try:
+        survey = db.get(Feedback, feedback_id)
+        if not survey or survey.status != 'active':
+            # Completó, reinició o fue reseteada después del barrido
+            return {'status': 'skipped'}
+        
+        total = survey_for(survey).total
+        sent = whatsapp_service.send_template(
+            survey.user_id, REMINDER_TEMPLATE, REMINDER_TEMPLATE_LANGUAGE,
+            [str(min(survey.current_step, total)), str(total)]
+        )
+        if not sent:
+            raise RuntimeError(f"La Graph API rechazó la plantilla {REMINDER_TEMPLATE}")
+        return {'status': 'reminder_sent', 'step': survey.current_step}
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e)
+        # El reclamo ya estaba confirmado: se libera para que el próximo barrido lo reintente
+        logger.error(f"Error enviando recordatorio {feedback_id}: {e}")
+        release_claim(feedback_id)
+        return {'status': 'error'}
+    finally:
+        db.close()
+
+@app.task(autoretry_for=(Exception,), retry_backoff=True, retry_backoff_max=600, retry_jitter=True,
+          max_retries=5, rate_limit=INSIGHTS_RATE_LIMIT)
+def compute_survey_insights(feedback_id):
+    """Paso 1 de la cadena: sentimiento + perfil con Gemini (reintenta con backoff)"""
+    db = SessionLocal()
+    try:
+        survey = db.get(Feedback, feedback_id)
+        answers = answers_of(survey) if survey else None
+    finally:
+        db.close()
+    insights = compute_insights(answers) if answers else None
+    return {'id': feedback_id, **insights} if insights else None
+
+@app.task
+def save_survey_insights(result):
+    """Paso 2 de la cadena: guarda final_sentiment / final_summary"""
+    return {'status': 'ok', 'written': write_insights([result])}
+
+def queue_survey_insights(feedback_id):
+    """Encola la cadena de insights sin bloquear la conversación"""
+    try:
+        chain(compute_survey_insights.s(feedback_id), save_survey_insights.s()).delay()
+    except Exception as e:
+        logger.error(f"No se pudo encolar insights de {feedback_id}: {e}")
+
+@app.task
+def backfill_insights_task(limit=None, force=False):
+    """Completa sentimiento/perfil de encuestas completadas existentes"""
+    return backfill_insights(limit=limit, force=force)
+
+@app.task
+def run_campaign(campaign_id):
+    """Envía (o reanuda) una campaña de invitaciones cargada con campaigns.py"""
+    try:
+        return {'status': 'ok', **dispatch_campaign(campaign_id)}
+    except Exception as e:
+        logger.error(f"Error enviando campaña {campaign_id}: {e}")
+        return {'status': 'error', 'error': str(e)}
+
+@app.task
+def maintain_survey_run_partitions():
+    """Crea las particiones mensuales próximas de survey_runs y archiva las viejas"""
+    try:
+        with engine.begin() as conn:
+            created = ensure_partitions(conn)
+        detached = detach_old_partitions()
+        logger.info(f"Particiones survey_runs: {len(created)} listas, {len(detached)} archivadas")
+        return {'status': 'ok', 'partitions': created, 'detached': detached}
+    except Exception as e:
+        logger.error(f"Error manteniendo particiones: {e}")
+        return {'status': 'error', 'error': str(e)}
+
+@app.task
+def refresh_themes_task(refit=False):
+    """Actualiza los temas de las respuestas abiertas (incremental salvo refit)"""
+    try:
+        stats = refresh_themes(refit=refit)
+        logger.info(f"Temas actualizados: {stats}")
+        return {'status': 'ok', 'themes': stats}
+    except Exception as e:
+        logger.error(f"Error actualizando temas: {e}")
+        return {'status': 'error', 'error': str(e)}
+
+@app.task
+def build_snapshot_task(view='dashboard'):
+    """Publica la instantánea Arrow que el dashboard abre con memory map"""
+    try:
+        stats = build_snapshot(view)
+        logger.info(f"Instantánea {view} publicada: {stats}")
+        return {'status': 'ok', 'snapshot': stats}
+    except Exception as e:
+        logger.error(f"Error construyendo instantánea {view}: {e}")
+        return {'status': 'error', 'error': str(e)}
+
+@app.task
+def refresh_kpi_views_task():
+    """Refresca (CONCURRENTLY) las vistas materializadas de indicadores del dashboard"""
+    try:
+        seconds = refresh_kpi_views()
+        return {'status': 'ok', 'views': seconds}
+    except Exception as e:
+        logger.error(f"Error refrescando vistas de indicadores: {e}")
+        return {'status': 'error', 'error': str(e)}
+
+@app.task
+def export_task(name, status=None, start=None, end=None):
+    """Exportación grande en segundo plano; el dashboard espera el archivo publicado"""
+    try:
+        stats = write_export(name, status,
+                             datetime.strptime(start, '%Y-%m-%d').date() if start else None,
+                             datetime.strptime(end, '%Y-%m-%d').date() if end else None)
+        return {'status': 'ok', 'export': stats}
+    except Exception as e:
+        logger.error(f"Error exportando {name}: {e}")
+        return {'status': 'error', 'error': str(e)}
+
 if __name__ == '__main__':
     print("Sistema de Encuestas para Adultos Mayores - Refactorizado ✅")
-    print(f"Preguntas disponibles: {len(ELDERLY_SURVEY_QUESTIONS)}")
+    print(f"Preguntas disponibles: {current_survey().total} (versión {current_survey().version})")
     print(f"WhatsApp configurado: {'✅' if whatsapp_service.is_configured() else '❌'}")
     print("🏗️ Arquitectura: Clases profesionales + Interfaces")
     print("🚫 Reducción if/else: WhatsApp Service refactorizado")
\ No newline at end of file
@@ -0,0 +1,68 @@
+import os
+import uuid
+
+import pytest
+
+# Crear el engine no conecta: alcanzan valores de ejemplo para importar campaigns
+for name, value in [('DB_USER', 'user'), ('DB_PASSWORD', 'x'), ('DB_HOST', 'localhost'),
+                    ('DB_PORT', '5432'), ('DB_NAME', 'survey')]:
+    os.environ.setdefault(name, value)
+
+from sqlalchemy import delete
+from sqlalchemy.exc import OperationalError
+from campaigns import normalize_phone, iter_phones, load_contacts, campaign_stats
+from database import SessionLocal, Campaign, CampaignContact, Feedback, engine
+
+def test_normalize_phone():
+    assert normalize_phone("+57 300 123 4567") == "573001234567"
+    assert normalize_phone("300-123-4567") == "573001234567"   # 10 dígitos: se antepone el país
+    assert normalize_phone("12345") is None
+    assert normalize_phone("sin número") is None
+
+def test_iter_phones_with_header(tmp_path):
+    path = tmp_path / "contactos.csv"
+    path.write_text("nombre,Teléfono\nAna,3001234567\nLuis,no tiene\nEva,+57 310 000 0000\n", encoding="utf-8")
+    assert list(iter_phones(str(path))) == ["573001234567", "573100000000"]
+
+def test_iter_phones_without_header(tmp_path):
+    path = tmp_path / "contactos.csv"
+    path.write_text("3001234567,Ana\n573109998877,Luis\n", encoding="utf-8")
+    assert list(iter_phones(str(path))) == ["573001234567", "573109998877"]
+
+@pytest.fixture
+def contacts(tmp_path):
+    """CSV con tres teléfonos nuevos; el primero ya completó la encuesta"""
+    try:
+        engine.connect().close()
+    except OperationalError:
+        pytest.skip("sin base de datos")
+    phones = [f"5799{uuid.uuid4().int % 10**8:08d}" for _ in range(3)]
+    path = tmp_path / "contactos.csv"
+    path.write_text("telefono\n" + "\n".join(phones) + "\n", encoding="utf-8")
+    db = SessionLocal()
+    db.add(Feedback(user_id=phones[0], status='completed', current_step=27))
+    db.commit()
+    campaign_ids = []
+    yield str(path), phones, campaign_ids
+    db.execute(delete(CampaignContact).where(CampaignContact.campaign_id.in_(campaign_ids)))
+    db.execute(delete(Campaign).where(Campaign.id.in_(campaign_ids)))
+    db.execute(delete(Feedback).where(Feedback.user_id.in_(phones)))
+    db.commit()
+    db.close()
+
+@pytest.mark.parametrize("dry_run", [True, False])
+def test_skipped_contacts_are_not_counted(contacts, dry_run):
+    path, phones, campaign_ids = contacts
+    campaign_id = load_contacts(path, "prueba", "invitacion", dry_run=dry_run)
+    campaign_ids.append(campaign_id)
+
+    stats = campaign_stats(campaign_id)
+    assert stats['total'] == 2
+    assert stats['contacts'] == {'pending': 2, 'skipped': 1}
+
+    db = SessionLocal()
+    try:
+        created = db.query(Feedback).filter(Feedback.user_id.in_(phones[1:])).count()
+    finally:
+        db.close()
+    assert created == (0 if dry_run else 2)
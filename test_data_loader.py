@@ -0,0 +1,23 @@
+import os
+
+import pandas as pd
+
+# Crear el engine no conecta: alcanzan valores de ejemplo para importar data_loader
+for name, value in [('DB_USER', 'user'), ('DB_PASSWORD', 'x'), ('DB_HOST', 'localhost'),
+                    ('DB_PORT', '5432'), ('DB_NAME', 'survey')]:
+    os.environ.setdefault(name, value)
+
+from data_loader import fill_sentiment
+from sentiment_lexicon import OPEN_TEXT_COLUMNS
+
+def test_fill_sentiment_only_labels_completed_surveys():
+    frame = pd.DataFrame({
+        'status': pd.Categorical(['completed', 'active', 'completed']),
+        'final_sentiment': pd.Categorical([None, None, 'negativo']),
+        **{column: ["me siento muy feliz y agradecido"] * 3 for column in OPEN_TEXT_COLUMNS},
+    })
+    labels = fill_sentiment(frame)['final_sentiment']
+    assert pd.notna(labels[0])
+    # La activa sigue sin etiqueta y la ya etiquetada no cambia
+    assert pd.isna(labels[1])
+    assert labels[2] == 'negativo'
@@ -0,0 +1,23 @@
+import os
+
+import pytest
+
+# Crear el engine no conecta: alcanzan valores de ejemplo para importar exports
+for name, value in [('DB_USER', 'user'), ('DB_PASSWORD', 'x'), ('DB_HOST', 'localhost'),
+                    ('DB_PORT', '5432'), ('DB_NAME', 'survey')]:
+    os.environ.setdefault(name, value)
+
+import exports
+
+def test_delivery_refuses_exports_over_the_ceiling(tmp_path, monkeypatch):
+    monkeypatch.setattr(exports, 'EXPORT_DIR', str(tmp_path))
+    monkeypatch.setattr(exports, 'EXPORT_DELIVERY_MB', 1)
+    (tmp_path / 'chica.csv').write_bytes(b'user_id\n1\n')
+    (tmp_path / 'grande.csv').write_bytes(b'0' * (2 * 2**20))
+
+    assert exports.export_state('chica.csv') == ('ready', None)
+    assert exports.read_export('chica.csv') == b'user_id\n1\n'
+    assert exports.export_state('grande.csv')[0] == 'too_large'
+    with pytest.raises(ValueError):
+        exports.read_export('grande.csv')
+    assert exports.export_state('pendiente.csv') == ('pending', None)
@@ -0,0 +1,78 @@
+import os
+import re
+import json
+
+import pytest
+
+# Crear el engine no conecta: alcanzan valores de ejemplo para importar insights
+for name, value in [('DB_USER', 'user'), ('DB_PASSWORD', 'x'), ('DB_HOST', 'localhost'),
+                    ('DB_PORT', '5432'), ('DB_NAME', 'survey')]:
+    os.environ.setdefault(name, value)
+
+import ai_profiles
+import insights
+from database import Feedback
+from llm_client import LLMClient, FakeModel, FakeClock
+from whatsapp_service import RateLimiter
+
+def pack_reply(skip=()):
+    """Respuesta JSON para todos los ids del prompt por lotes (menos `skip`)"""
+    def reply(prompt):
+        ids = [int(found) for found in re.findall(r"### id=(\d+)", prompt)]
+        if not ids:
+            return "positivo" if "Responde solo con una palabra" in prompt else "Perfil individual."
+        return json.dumps([{'id': feedback_id, 'sentiment': 'positivo', 'profile': 'Persona activa y solidaria.'}
+                           for feedback_id in ids if feedback_id not in skip])
+    return reply
+
+@pytest.fixture
+def model(monkeypatch):
+    """FakeModel detrás de call_gemini (circuito que no se abre, sin esperas entre reintentos)"""
+    clock = FakeClock()
+    fake = FakeModel([pack_reply()], clock=clock)
+    client = LLMClient(['fake'], model_factory=lambda name: fake, clock=clock, failure_threshold=1000)
+    monkeypatch.setattr(ai_profiles, 'gemini_client', lambda: client)
+    monkeypatch.setenv('GEMINI_API_KEY', 'test')
+    monkeypatch.setattr(insights, 'INSIGHTS_LLM_SENTIMENT', True)
+    monkeypatch.setattr(insights.time, 'sleep', lambda seconds: None)
+    return fake
+
+def surveys(count):
+    return [Feedback(id=index + 1, q18_edad='70', q10_situacion_vivienda='Vive con su familia',
+                     q1_actividades_productivas='Cuida el huerto', q9_nivel_proposito='4')
+            for index in range(count)]
+
+def run(items, packed=True):
+    return insights.run_pool(items, concurrency=1, limiter=RateLimiter(1e9), packed=packed)
+
+def test_packs_cut_requests(model):
+    rows = run(surveys(300), packed=False)
+    assert len(rows) == 300
+    assert model.calls == 600   # Perfil + sentimiento por persona
+
+    model.calls = 0
+    rows = run(surveys(300))
+    assert len(rows) == 300
+    assert model.calls == 15    # Lotes de INSIGHTS_PACK_SIZE=20
+    lines = ai_profiles.profile_lines(insights.answers_of(surveys(1)[0]))
+    assert rows[0]['summary_hash'] == ai_profiles.profile_hash(lines, ai_profiles.PACK_PROMPT_VERSION)
+    assert rows[0]['summary_hash'] != ai_profiles.profile_hash(lines)
+
+def test_rejected_items_fall_back_to_single(model):
+    model.script = [pack_reply(skip={3})]
+    rows = run(surveys(20))
+    assert sorted(row['id'] for row in rows) == list(range(1, 21))
+    assert model.calls == 1 + 2  # El lote y las dos peticiones individuales del id 3
+
+def test_transport_failure_does_not_fan_out(model):
+    prompts = []
+
+    def down(prompt):
+        prompts.append(prompt)
+        raise TimeoutError("deadline exceeded")
+
+    model.script = [down]
+    assert run(surveys(40)) == []
+    # Dos lotes con sus reintentos y ninguna petición individual
+    assert len(prompts) == 2 * insights.INSIGHTS_RETRIES
+    assert all('### id=' in prompt for prompt in prompts)
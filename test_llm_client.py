@@ -0,0 +1,114 @@
+import pytest
+
+from llm_client import LLMClient, LLMUnavailable, FakeModel, FakeClock, OPEN, HALF_OPEN, CLOSED
+
+def make_client(models, clock, **options):
+    """Cliente con FakeModel por nombre; cuenta cuántas veces se crea cada modelo"""
+    created = []
+
+    def factory(name):
+        created.append(name)
+        return models[name]
+
+    options.setdefault('failure_threshold', 2)
+    options.setdefault('reset_seconds', 30)
+    client = LLMClient(list(models), model_factory=factory, clock=clock, **options)
+    return client, created
+
+def test_falls_back_and_opens_circuit():
+    clock = FakeClock()
+    down = FakeModel([TimeoutError("deadline exceeded")], latency=20, clock=clock)
+    up = FakeModel(["perfil"], latency=0.5, clock=clock)
+    client, _ = make_client({'a': down, 'b': up}, clock, failure_threshold=1)
+
+    assert client.generate("hola") == "perfil"
+    assert client.health['a'].state == OPEN
+    assert client.ranked() == ['b', 'a']
+
+    # Con el circuito abierto el modelo caído ya no se llama
+    for _ in range(5):
+        assert client.generate("hola") == "perfil"
+    assert down.calls == 1
+
+def test_half_open_allows_single_probe_and_recovers():
+    clock = FakeClock()
+    flaky = FakeModel([RuntimeError("503"), RuntimeError("503"), "recuperado"], latency=0.1, clock=clock)
+    client, _ = make_client({'a': flaky}, clock)
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            client.generate("x")
+    assert client.health['a'].state == OPEN
+    with pytest.raises(LLMUnavailable):
+        client.generate("x")
+    assert flaky.calls == 2
+
+    clock.advance(31)
+    assert client.health['a'].allow()
+    assert client.health['a'].state == HALF_OPEN
+    assert not client.health['a'].allow()   # solo una prueba a la vez
+
+    client.health['a'].probing = False
+    assert client.generate("x") == "recuperado"
+    assert client.health['a'].state == CLOSED
+
+def test_failed_probe_reopens_circuit():
+    clock = FakeClock()
+    down = FakeModel([RuntimeError("503")], clock=clock)
+    client, _ = make_client({'a': down}, clock, failure_threshold=1)
+
+    with pytest.raises(RuntimeError):
+        client.generate("x")
+    clock.advance(31)
+    with pytest.raises(RuntimeError):
+        client.generate("x")
+    assert client.health['a'].state == OPEN
+    assert client.health['a'].opened_at == clock.now
+
+def test_ranks_by_success_rate_then_latency():
+    clock = FakeClock()
+    slow = FakeModel(["lento"], latency=2.0, clock=clock)
+    fast = FakeModel(["rápido"], latency=0.2, clock=clock)
+    client, _ = make_client({'slow': slow, 'fast': fast}, clock)
+
+    # Sin historial se respeta el orden configurado
+    assert client.ranked() == ['slow', 'fast']
+    client.health['fast'].record_success(0.2)
+    client.generate("x")
+    assert client.ranked() == ['fast', 'slow']
+
+    client.health['fast'].record_failure()
+    assert client.ranked() == ['slow', 'fast']
+
+def test_reuses_model_objects():
+    clock = FakeClock()
+    client, created = make_client({'a': FakeModel(["ok"], clock=clock)}, clock)
+    for _ in range(10):
+        client.generate("x")
+    assert created == ['a']
+
+def test_all_circuits_open_raises():
+    clock = FakeClock()
+    client, _ = make_client({'a': FakeModel([ValueError("quota")], clock=clock)}, clock, failure_threshold=1)
+
+    with pytest.raises(ValueError):
+        client.generate("x")
+    with pytest.raises(LLMUnavailable):
+        client.generate("x")
+
+def test_metrics_per_model():
+    clock = FakeClock()
+    client, _ = make_client({
+        'a': FakeModel([RuntimeError("500"), "ok"], latency=0.3, clock=clock),
+        'b': FakeModel(["ok"], latency=0.1, clock=clock),
+    }, clock, failure_threshold=5)
+
+    client.generate("x")   # a falla, b responde
+    client.generate("x")   # b primero por tasa de éxito
+    metrics = client.metrics()
+
+    assert metrics['a'] == {'state': CLOSED, 'calls': 1, 'failures': 1, 'consecutive_failures': 1,
+                            'success_rate': 0.0, 'p50_ms': 0.0}
+    assert metrics['b']['calls'] == 2
+    assert metrics['b']['success_rate'] == 1.0
+    assert metrics['b']['p50_ms'] == 100.0
@@ -0,0 +1,80 @@
+import os
+import uuid
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# Crear el engine no conecta: alcanzan valores de ejemplo para importar reminders
+for name, value in [('DB_USER', 'user'), ('DB_PASSWORD', 'x'), ('DB_HOST', 'localhost'),
+                    ('DB_PORT', '5432'), ('DB_NAME', 'survey')]:
+    os.environ.setdefault(name, value)
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import OperationalError
+from database import SessionLocal, Feedback, engine
+from reminders import sweep_abandoned_surveys, release_claim
+
+# Encuestas en 1999: ningún dato real cae en la ventana de estos barridos
+START = datetime.datetime(1999, 1, 1)
+NOW = START + datetime.timedelta(days=4)
+
+@pytest.fixture
+def stale_ids():
+    try:
+        engine.connect().close()
+    except OperationalError:
+        pytest.skip("sin base de datos")
+    db = SessionLocal()
+    surveys = [Feedback(user_id=f"5798{uuid.uuid4().int % 10**8:08d}", status='active', current_step=3,
+                        created_at=START, updated_at=START + datetime.timedelta(minutes=index))
+               for index in range(3)]
+    db.add_all(surveys)
+    db.commit()
+    ids = [survey.id for survey in surveys]
+    yield ids
+    db.execute(delete(Feedback).where(Feedback.id.in_(ids)))
+    db.commit()
+    db.close()
+
+def sweep(now=NOW):
+    claimed = []
+    sweep_abandoned_surveys(claimed.append, now=now, batch_size=2)
+    return claimed
+
+def row(feedback_id):
+    db = SessionLocal()
+    try:
+        return db.get(Feedback, feedback_id)
+    finally:
+        db.close()
+
+def test_concurrent_sweeps_claim_each_id_once(stale_ids):
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first, second = pool.map(lambda _: sweep(), range(2))
+    assert sorted(first + second) == stale_ids
+    assert sweep() == []
+
+def test_reply_makes_survey_claimable_again(stale_ids):
+    assert sweep() == stale_ids
+    replied = stale_ids[0]
+    db = SessionLocal()
+    db.execute(update(Feedback).where(Feedback.id == replied)
+               .values(updated_at=NOW + datetime.timedelta(hours=1)))
+    db.commit()
+    db.close()
+
+    later = NOW + datetime.timedelta(days=2)
+    assert sweep(later) == [replied]
+    assert sweep(later) == []
+
+def test_release_restores_claim_without_touching_updated_at(stale_ids):
+    assert sweep() == stale_ids
+    released = stale_ids[1]
+    before = row(released).updated_at
+    release_claim(released)
+
+    after = row(released)
+    assert after.last_reminded_at is None
+    assert after.updated_at == before
+    assert sweep() == [released]
@@ -0,0 +1,12 @@
+import numpy as np
+
+from sentiment_lexicon import score_texts
+
+def test_punctuation_ends_negation_scope():
+    negated, separated, plain = score_texts(["no estoy feliz", "no, estoy feliz", "estoy feliz"])
+    assert negated < 0
+    # La coma corta la cláusula: "no, estoy feliz" es una respuesta positiva
+    assert separated == plain > 0
+
+def test_empty_answers_are_nan():
+    assert np.isnan(score_texts([None, ""])).all()
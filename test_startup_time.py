@@ -0,0 +1,73 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# Importación de dashboard.py sin contar Streamlit (microsegundos de -X importtime)
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "0.8"))
+# No deben cargarse al importar: se importan al dibujar las pestañas o al generar un perfil
+HEAVY_MODULES = ('pandas', 'plotly', 'pyarrow', 'scipy', 'google.generativeai', 'grpc')
+
+def import_profile(module):
+    """Árbol de `python -X importtime -c 'import módulo'`: {raíz de nivel 1: {módulos}}, acumulados
+
+    Crear el engine no conecta, así que alcanzan valores de ejemplo si no hay
+    configuración de base de datos. Se importa dos veces para no medir la
+    compilación de los .pyc.
+    """
+    env = dict(os.environ)
+    for name, value in [('DB_USER', 'user'), ('DB_PASSWORD', 'x'), ('DB_HOST', 'localhost'),
+                        ('DB_PORT', '5432'), ('DB_NAME', 'survey')]:
+        env.setdefault(name, value)
+    command = [sys.executable, '-X', 'importtime', '-c', f'import {module}']
+    for _ in range(2):
+        result = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, total, name = line.split('|')
+        entries.append(((len(name) - len(name.lstrip()) - 1) // 2, name.strip(), int(total)))
+
+    # -X importtime lista cada módulo después de sus dependencias: el bloque del
+    # módulo pedido son las líneas anteriores a él desde la raíz previa
+    end = max(index for index, (level, name, _) in enumerate(entries) if level == 0 and name == module)
+    start = max([index + 1 for index, (level, _, _) in enumerate(entries[:end]) if level == 0] or [0])
+    trees, cumulative, pending = {}, {module: entries[end][2]}, set()
+    for level, name, total in entries[start:end]:
+        cumulative[name] = total
+        if level >= 2:
+            pending.add(name)
+        else:
+            trees[name] = pending | {name}
+            pending = set()
+    return trees, cumulative
+
+def loaded(modules, prefix):
+    return sorted(name for name in modules if name == prefix or name.startswith(prefix + '.'))
+
+def test_dashboard_import_is_light():
+    pytest.importorskip('streamlit')
+    trees, cumulative = import_profile('dashboard')
+
+    own = {name: modules for name, modules in trees.items() if name.split('.')[0] != 'streamlit'}
+    modules = set().union(*own.values())
+    for heavy in HEAVY_MODULES:
+        assert not loaded(modules, heavy), f"dashboard.py importa {heavy} al iniciar: {loaded(modules, heavy)[:5]}"
+
+    streamlit = sum(total for name, total in cumulative.items() if name in trees and name.split('.')[0] == 'streamlit')
+    seconds = (cumulative['dashboard'] - streamlit) / 1e6
+    assert seconds < STARTUP_BUDGET_SECONDS, f"importar dashboard.py tardó {seconds:.2f}s (presupuesto {STARTUP_BUDGET_SECONDS}s)"
+
+def test_gemini_is_loaded_on_first_profile():
+    trees, _ = import_profile('ai_profiles')
+    modules = set().union(*trees.values())
+    assert not loaded(modules, 'google')
+    assert not loaded(modules, 'grpc')
+
+    import ai_profiles
+    assert ai_profiles.gemini_client.cache_info().currsize == 0
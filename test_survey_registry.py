@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+# Crear el engine no conecta: alcanzan valores de ejemplo para importar el repositorio
+for name, value in [('DB_USER', 'user'), ('DB_PASSWORD', 'x'), ('DB_HOST', 'localhost'),
+                    ('DB_PORT', '5432'), ('DB_NAME', 'survey')]:
+    os.environ.setdefault(name, value)
+
+import survey_registry
+from survey_registry import compile_survey, register, current_survey, survey_to_start, FOLLOWUP_QUESTION_OFFSET
+from survey_repository import record_answer, store_answer, store_followup, in_followup
+from database import Feedback
+
+USO = ["Sí, frecuentemente", "Ocasionalmente", "No las uso"]
+
+def definition(**changes):
+    """Tres preguntas; la 2 dispara un seguimiento con 'No las uso' y salta a la 3 por 'next'"""
+    questions = {
+        1: {"text": "Actividades", "type": "open", "column": "q1_actividades_productivas", "next": 2},
+        2: {"text": "Tecnología", "type": "buttons", "column": "q4_uso_tecnologia", "options": USO, "next": 3,
+            "conditional": {"trigger_answer": ["No las uso"],
+                            "follow_up": {"text": "¿Por qué no las usa?", "type": "open"}}},
+        3: {"text": "Aprendizaje", "type": "open", "column": "q5_aprendizaje_tecnologia"},
+    }
+    for number, values in changes.items():
+        questions[int(number[1:])].update(values)
+    return questions
+
+class Recorder:
+    """Sesión falsa: guarda las sentencias en vez de ejecutarlas"""
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, statement):
+        self.statements.append(statement)
+
+def question_no(statement):
+    return statement.compile().params['question_no']
+
+def test_numbering_and_next_are_validated():
+    with pytest.raises(ValueError, match="sin huecos"):
+        compile_survey({1: definition()[1], 3: definition()[3]})
+    with pytest.raises(ValueError, match="'next' fuera de rango"):
+        compile_survey(definition(q2={"next": 2}))
+    with pytest.raises(ValueError, match="'next' fuera de rango"):
+        compile_survey(definition(q2={"next": 5}))
+    with pytest.raises(ValueError, match="tipo desconocido"):
+        compile_survey(definition(q3={"type": "fecha"}))
+
+def test_transitions():
+    survey = compile_survey(definition(q1={"next": 3}))
+    assert survey.transitions == (1, 3, 3, 4)
+    assert survey.next_step(1) == 3
+    assert survey.total == 3
+    assert not survey.is_finished(3) and survey.is_finished(4)
+
+def test_follow_up_matches_parsed_or_raw_answer():
+    survey = compile_survey(definition())
+    follow_up = survey.follow_ups[2]
+    assert follow_up.number == FOLLOWUP_QUESTION_OFFSET + 2
+    assert survey.follow_up_for(2, "No las uso", "nunca uso eso") is follow_up   # respuesta parseada
+    assert survey.follow_up_for(2, "Ocasionalmente", " No las uso ") is follow_up  # texto original
+    assert survey.follow_up_for(2, "Ocasionalmente", "a veces") is None
+    assert survey.follow_up_for(1, "No las uso") is None
+
+def test_follow_up_round_trip():
+    compiled = register(definition())
+    survey = Feedback(id=7, user_id="570000000007", status='active', current_step=2,
+                      survey_version=compiled.version, is_in_followup=0)
+    db = Recorder()
+
+    assert store_answer(db, survey, "nunca uso eso") == (2, "No las uso")
+    assert in_followup(survey) and survey.followup_question == 2
+    assert survey.current_step == 3
+    assert question_no(db.statements[-1]) == 2
+
+    follow_up = store_followup(db, survey, "No me interesan")
+    assert follow_up.number == 102
+    assert question_no(db.statements[-1]) == 102
+    assert not in_followup(survey) and survey.current_step == 3
+
+    # Ya sin seguimiento pendiente: la siguiente respuesta es la de la pregunta 3
+    assert store_followup(db, survey, "otra") is None
+    assert store_answer(db, survey, "Me cuesta") == (3, "Me cuesta")
+
+def test_only_new_surveys_save_the_definition(monkeypatch):
+    saved = []
+    monkeypatch.setattr(survey_registry, 'save_definition', lambda definition: saved.append(definition))
+    monkeypatch.setattr(survey_registry, '_saved_versions', set())
+
+    current_survey()
+    assert saved == []
+    version = survey_to_start().version
+    survey_to_start()
+    assert len(saved) == 1 and survey_registry.definition_version(saved[0]) == version
@@ -0,0 +1,365 @@
+# themes.py - Temas de las respuestas abiertas (TF-IDF disperso + k-means esférico)
+#
+# Para cada pregunta abierta de THEME_COLUMNS:
+#   - se tokeniza y se quitan tildes y palabras vacías;
+#   - se arma una matriz TF-IDF dispersa (scipy.sparse, normalizada L2);
+#   - se agrupa con k-means esférico vectorizado (similitud coseno = X @ C.T).
+# El modelo ajustado (vocabulario, idf, centroides, tamaños y ejemplos) se
+# guarda en THEMES_CACHE_DIR. Cada refresco solo lee las encuestas
+# completadas después de la marca de agua y actualiza los centroides como
+# promedio móvil. La marca es la última respuesta de cada encuesta
+# (survey_answers.answered_at, es decir, cuándo se completó) y no
+# feedbacks.updated_at, que cambia con los insights y otros UPDATE masivos.
+# La lectura retrocede THEMES_OVERLAP_SECONDS (una respuesta sellada antes de
+# la marca puede confirmarse después de la lectura anterior) y el modelo
+# guarda qué encuestas ya sumó, con su hora de cierre: las repetidas del
+# solape se descartan y una encuesta reiniciada y completada de nuevo no se
+# suma dos veces, cuenta como pendiente hasta el próximo reajuste. Cuando las
+# respuestas nuevas o pendientes superan THEMES_REFIT_GROWTH del total
+# ajustado (o con --refit) se reajusta desde cero con el vocabulario nuevo.
+#
+#   python themes.py refresh [--refit]
+#   python themes.py show q26_servicios_necesarios
+
+import os
+import re
+import logging
+import datetime
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from scipy import sparse
+from sentiment_lexicon import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Preguntas abiertas con análisis de temas
+THEME_COLUMNS = {
+    'q26_servicios_necesarios': 'Servicios que necesita (Q26)',
+    'q20_espacios_discriminacion': 'Espacios de discriminación (Q20)',
+    'q27_limitaciones_fisicas': 'Limitaciones físicas (Q27)',
+    'q1_actividades_productivas': 'Actividades productivas (Q1)',
+    'q15_actividades_disfrute': 'Actividades que disfruta (Q15)',
+}
+
+THEMES_K = int(os.getenv("THEMES_K", "8"))
+THEMES_MAX_FEATURES = int(os.getenv("THEMES_MAX_FEATURES", "5000"))
+THEMES_MIN_DF = int(os.getenv("THEMES_MIN_DF", "2"))
+THEMES_ITERATIONS = 30
+THEMES_RESTARTS = 4
+THEMES_TOP_TERMS = 6
+THEMES_EXAMPLES = 3
+THEMES_REFIT_GROWTH = float(os.getenv("THEMES_REFIT_GROWTH", "0.5"))
+THEMES_OVERLAP_SECONDS = int(os.getenv("THEMES_OVERLAP_SECONDS", "300"))
+THEMES_CACHE_DIR = os.getenv("THEMES_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "themes"))
+
+STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes aqui asi aun bien cada casi como con contra cual cuales
+cuando de del desde donde dos el ella ellas ello ellos en entre era eran es esa esas ese eso esos esta estaba
+estado estamos estan estar este esto estos estoy fue fueron ha hace hacen hacer hago han hasta hay he la las le
+les lo los mas me mi mis mucho muy nada ni no nos nosotros o otra otras otro otros para pero poco por porque
+que quien se sea segun ser si sido siempre sin sobre solo son soy su sus tal tambien tan tanto te tengo tiene
+tienen todo todos tu un una uno unos usted ya yo cosas cosa veces vez dia dias creo pues bueno entonces
+""".split())
+TOKEN_RE = re.compile(r"[a-z]{3,}")
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Palabras sin tildes ni palabras vacías ('Ayuda económica' -> ['ayuda', 'economica'])"""
+    if not text:
+        return []
+    return [token for token in TOKEN_RE.findall(normalize_text(str(text))) if token not in STOPWORDS]
+
+def build_vocabulary(docs: Sequence[List[str]], max_features: int = THEMES_MAX_FEATURES,
+                     min_df: int = THEMES_MIN_DF) -> Tuple[List[str], np.ndarray]:
+    """Términos más frecuentes por documento y su idf suavizado"""
+    document_frequency = Counter(token for tokens in docs for token in set(tokens))
+    terms = [term for term, count in document_frequency.most_common(max_features) if count >= min_df]
+    df = np.array([document_frequency[term] for term in terms], dtype=np.float64)
+    idf = np.log((1 + len(docs)) / (1 + df)) + 1
+    return terms, idf
+
+def tfidf_matrix(docs: Sequence[List[str]], index: Dict[str, int], idf: np.ndarray) -> sparse.csr_matrix:
+    """Matriz dispersa documentos x términos, filas con norma L2 = 1 (filas vacías quedan en cero)"""
+    columns = [[index[token] for token in tokens if token in index] for tokens in docs]
+    lengths = np.fromiter(map(len, columns), dtype=np.int64, count=len(columns))
+    indptr = np.r_[0, np.cumsum(lengths)]
+    indices = np.fromiter((column for row in columns for column in row), dtype=np.int64, count=int(indptr[-1]))
+    matrix = sparse.csr_matrix((np.ones(len(indices)), indices, indptr), shape=(len(docs), len(idf)))
+    matrix.sum_duplicates()
+    matrix.data *= idf[matrix.indices]
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    return sparse.diags(1 / np.where(norms > 0, norms, 1)) @ matrix
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1)
+
+def _cluster_sums(matrix: sparse.csr_matrix, labels: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Suma de vectores y cantidad de documentos por grupo (una multiplicación dispersa)"""
+    indicator = sparse.csr_matrix((np.ones(len(labels)), (labels, np.arange(len(labels)))), shape=(k, len(labels)))
+    return (indicator @ matrix).toarray(), np.bincount(labels, minlength=k)
+
+def _kmeans_plus_plus(matrix: sparse.csr_matrix, k: int, rng: np.random.Generator) -> np.ndarray:
+    """Semillas k-means++ (distancia coseno) sobre una muestra"""
+    sample = matrix[rng.choice(matrix.shape[0], size=min(matrix.shape[0], 20000), replace=False)]
+    centers = [sample[rng.integers(sample.shape[0])].toarray().ravel()]
+    closest = 1 - sample @ centers[0]
+    for _ in range(1, k):
+        weights = np.clip(closest, 0, None) ** 2
+        total = weights.sum()
+        choice = rng.choice(sample.shape[0], p=weights / total) if total > 0 else rng.integers(sample.shape[0])
+        centers.append(sample[choice].toarray().ravel())
+        closest = np.minimum(closest, 1 - sample @ centers[-1])
+    return np.vstack(centers)
+
+def spherical_kmeans(matrix: sparse.csr_matrix, k: int, iterations: int = THEMES_ITERATIONS,
+                     seed: int = 0, restarts: int = THEMES_RESTARTS) -> Tuple[np.ndarray, np.ndarray]:
+    """(centroides k x términos, etiqueta por documento); se queda con el mejor de varios arranques"""
+    rng = np.random.default_rng(seed)
+    best, best_score = None, -np.inf
+    for _ in range(restarts):
+        centroids = _kmeans_plus_plus(matrix, k, rng)
+        labels = None
+        for _ in range(iterations):
+            similarity = matrix @ centroids.T
+            new_labels = similarity.argmax(axis=1)
+            if labels is not None and np.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+            sums, counts = _cluster_sums(matrix, labels, k)
+            # Grupos vacíos: cada uno se resiembra con un documento distinto,
+            # de peor a mejor representado
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                worst = np.argsort(np.asarray(similarity.max(axis=1)).ravel())[:len(empty)]
+                sums[empty[:len(worst)]] = matrix[worst].toarray()
+            centroids = _normalize_rows(sums)
+        # Cohesión: similitud total de cada documento con su centroide
+        score = (matrix @ centroids.T).max(axis=1).sum()
+        if score > best_score:
+            best, best_score = (centroids, (matrix @ centroids.T).argmax(axis=1)), score
+    return best
+
+class ThemeModel:
+    """Modelo ajustado de una pregunta: vocabulario, idf, centroides, tamaños y encuestas sumadas"""
+
+    def __init__(self, column: str, terms: List[str], idf: np.ndarray, centroids: np.ndarray,
+                 counts: np.ndarray, examples: List[List[str]], fitted_docs: int,
+                 surveys: np.ndarray, completed: np.ndarray, stale_docs: int = 0):
+        self.column = column
+        self.terms = terms
+        self.idf = idf
+        self.centroids = centroids
+        self.counts = counts.astype(np.int64)
+        self.examples = examples
+        self.fitted_docs = fitted_docs
+        # Encuestas ya sumadas (ordenadas por id) y la hora de cierre con la que entraron
+        order = np.argsort(surveys, kind='stable')
+        self.surveys = surveys[order].astype(np.int64)
+        self.completed = completed[order].astype('datetime64[us]')
+        self.stale_docs = stale_docs
+        self.index = {term: position for position, term in enumerate(terms)}
+
+    @property
+    def watermark(self) -> Optional[datetime.datetime]:
+        if not len(self.completed):
+            return None
+        return self.completed.max().astype(datetime.datetime)
+
+    @classmethod
+    def fit(cls, column: str, surveys: np.ndarray, completed: np.ndarray, texts: Sequence[str],
+            k: int = THEMES_K, seed: int = 0) -> Optional['ThemeModel']:
+        docs = [tokenize(text) for text in texts]
+        terms, idf = build_vocabulary(docs)
+        if not terms:
+            return None
+        matrix = tfidf_matrix(docs, {term: i for i, term in enumerate(terms)}, idf)
+        keep = np.flatnonzero(matrix.getnnz(axis=1))
+        matrix = matrix[keep]
+        k = min(k, matrix.shape[0])
+        centroids, labels = spherical_kmeans(matrix, k, seed=seed)
+
+        # Ejemplos: las respuestas más cercanas a cada centroide
+        similarity = np.asarray((matrix @ centroids.T)[np.arange(matrix.shape[0]), labels]).ravel()
+        examples = []
+        for cluster in range(k):
+            members = np.flatnonzero(labels == cluster)
+            best = members[np.argsort(-similarity[members])[:THEMES_EXAMPLES]]
+            examples.append([str(texts[keep[i]])[:160] for i in best])
+        return cls(column, terms, idf, centroids, np.bincount(labels, minlength=k), examples,
+                   matrix.shape[0], surveys, completed)
+
+    def transform(self, texts: Sequence[str]) -> sparse.csr_matrix:
+        return tfidf_matrix([tokenize(text) for text in texts], self.index, self.idf)
+
+    def partial_fit(self, surveys: np.ndarray, completed: np.ndarray, texts: Sequence[str]) -> int:
+        """Asigna respuestas de encuestas no sumadas y mueve cada centroide hacia su promedio ponderado
+
+        Las encuestas ya sumadas con la misma hora de cierre (solape de lectura) se
+        ignoran; con otra hora fueron reiniciadas y completadas de nuevo: no se
+        vuelven a sumar y cuentan como pendientes (stale_docs) para el reajuste.
+        """
+        position = np.searchsorted(self.surveys, surveys)
+        known = position < len(self.surveys)
+        known[known] = self.surveys[position[known]] == surveys[known]
+        restarted = known.copy()
+        restarted[known] = self.completed[position[known]] != completed[known]
+        if restarted.any():
+            logger.info(f"{self.column}: {int(restarted.sum())} encuestas completadas de nuevo, quedan para el reajuste")
+            self.completed[position[restarted]] = completed[restarted]
+            self.stale_docs += int(restarted.sum())
+
+        fresh = np.flatnonzero(~known)
+        matrix = self.transform([texts[i] for i in fresh])
+        matrix = matrix[np.flatnonzero(matrix.getnnz(axis=1))]
+        if matrix.shape[0]:
+            labels = np.asarray((matrix @ self.centroids.T).argmax(axis=1)).ravel()
+            sums, counts = _cluster_sums(matrix, labels, len(self.centroids))
+            self.centroids = _normalize_rows(self.centroids * self.counts[:, None] + sums)
+            self.counts += counts
+        if len(fresh):
+            surveys = np.concatenate([self.surveys, surveys[fresh]])
+            completed = np.concatenate([self.completed, completed[fresh].astype('datetime64[us]')])
+            order = np.argsort(surveys, kind='stable')
+            self.surveys, self.completed = surveys[order], completed[order]
+        return matrix.shape[0]
+
+    @property
+    def new_docs(self) -> int:
+        """Respuestas sumadas desde el ajuste más las pendientes de encuestas reiniciadas"""
+        return int(self.counts.sum()) - self.fitted_docs + self.stale_docs
+
+    def themes(self, top_terms: int = THEMES_TOP_TERMS) -> List[Dict]:
+        """Temas ordenados por tamaño: términos principales, cantidad, proporción y ejemplos"""
+        total = max(int(self.counts.sum()), 1)
+        top = np.argsort(-self.centroids, axis=1)[:, :top_terms]
+        rows = [{
+            'tema': ", ".join(self.terms[i] for i in top[cluster] if self.centroids[cluster, i] > 0),
+            'respuestas': int(self.counts[cluster]),
+            'proporcion': self.counts[cluster] / total,
+            'ejemplos': self.examples[cluster],
+        } for cluster in range(len(self.centroids))]
+        return sorted(rows, key=lambda row: -row['respuestas'])
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez_compressed(
+            path,
+            terms=np.array(self.terms),
+            idf=self.idf,
+            centroids=self.centroids,
+            counts=self.counts,
+            examples=np.array(["\x1f".join(group) for group in self.examples]),
+            fitted_docs=self.fitted_docs,
+            surveys=self.surveys,
+            completed=self.completed,
+            stale_docs=self.stale_docs,
+        )
+
+    @classmethod
+    def load(cls, column: str, path: str) -> Optional['ThemeModel']:
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            if 'surveys' not in data.files:
+                # Caché de antes del seguimiento por encuesta: se reajusta
+                return None
+            return cls(
+                column,
+                [str(term) for term in data['terms']],
+                data['idf'],
+                data['centroids'],
+                data['counts'],
+                [str(group).split("\x1f") if str(group) else [] for group in data['examples']],
+                int(data['fitted_docs']),
+                data['surveys'],
+                data['completed'],
+                int(data['stale_docs']),
+            )
+
+def model_path(column: str) -> str:
+    return os.path.join(THEMES_CACHE_DIR, f"{column}.npz")
+
+def load_model(column: str) -> Optional[ThemeModel]:
+    return ThemeModel.load(column, model_path(column))
+
+def load_answers(column: str, after: Optional[datetime.datetime] = None) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """(ids de encuesta, hora de cierre, respuestas) de encuestas completadas, opcionalmente
+    solo las completadas después de `after`"""
+    from sqlalchemy import select, func
+    from database import engine, Feedback, SurveyAnswer
+
+    answer = getattr(Feedback, column)
+    # Última respuesta de la encuesta: solo cambia si la persona vuelve a responder
+    completed_at = (
+        select(func.max(SurveyAnswer.answered_at))
+        .where(SurveyAnswer.survey_id == Feedback.id)
+        .scalar_subquery()
+    )
+    query = (
+        select(Feedback.id, completed_at, answer)
+        .where(Feedback.status == 'completed')
+        .where(answer.isnot(None))
+        .where(completed_at.isnot(None))
+    )
+    if after is not None:
+        recent = select(SurveyAnswer.survey_id).where(SurveyAnswer.answered_at > after)
+        query = query.where(Feedback.id.in_(recent)).where(completed_at > after)
+
+    surveys, completed, texts = [], [], []
+    with engine.connect() as conn:
+        for survey_id, answered_at, text in conn.execution_options(stream_results=True, yield_per=10000).execute(query):
+            surveys.append(survey_id)
+            completed.append(answered_at)
+            texts.append(text)
+    return np.array(surveys, dtype=np.int64), np.array(completed, dtype='datetime64[us]'), texts
+
+def refresh_themes(columns: Sequence[str] = tuple(THEME_COLUMNS), refit: bool = False) -> Dict[str, Dict]:
+    """Actualiza incrementalmente (o reajusta) los modelos en caché; devuelve estadísticas por pregunta"""
+    stats = {}
+    for column in columns:
+        model = None if refit else load_model(column)
+        if model is not None:
+            after = model.watermark - datetime.timedelta(seconds=THEMES_OVERLAP_SECONDS) if model.watermark else None
+            added = model.partial_fit(*load_answers(column, after=after))
+            if model.new_docs > THEMES_REFIT_GROWTH * model.fitted_docs:
+                logger.info(f"{column}: {model.new_docs} respuestas nuevas desde el ajuste, se reajusta")
+                model = None
+            else:
+                stats[column] = {'mode': 'incremental', 'docs': added}
+
+        if model is None:
+            model = ThemeModel.fit(column, *load_answers(column))
+            if model is None:
+                stats[column] = {'mode': 'empty', 'docs': 0}
+                continue
+            stats[column] = {'mode': 'refit', 'docs': model.fitted_docs}
+        model.save(model_path(column))
+    return stats
+
+if __name__ == "__main__":
+    import time
+    import argparse
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    parser = argparse.ArgumentParser(description="Temas de las respuestas abiertas")
+    sub = parser.add_subparsers(dest="command", required=True)
+    refresh = sub.add_parser("refresh", help="Actualizar los modelos en caché")
+    refresh.add_argument("--refit", action="store_true", help="Reajustar desde cero")
+    refresh.add_argument("--column", action="append", choices=list(THEME_COLUMNS))
+    show = sub.add_parser("show", help="Mostrar los temas de una pregunta")
+    show.add_argument("column", choices=list(THEME_COLUMNS))
+    args = parser.parse_args()
+
+    if args.command == "refresh":
+        started = time.perf_counter()
+        for column, result in refresh_themes(args.column or tuple(THEME_COLUMNS), args.refit).items():
+            print(f"🧩 {column}: {result['mode']} ({result['docs']} respuestas)")
+        print(f"✅ Listo en {time.perf_counter() - started:.1f}s")
+    else:
+        model = load_model(args.column)
+        if model is None:
+            print("Sin modelo: ejecuta python themes.py refresh")
+        else:
+            for theme in model.themes():
+                print(f"{theme['proporcion']:6.1%}  {theme['respuestas']:>7}  {theme['tema']}")
@@ -3,6 +3,8 @@
 
 import os
 import json
+import time
+import threading
 import requests
 import logging
 from typing import Dict, Any, List, Optional
@@ -12,12 +14,20 @@ from abc import ABC, abstractmethod
 # Configuración logging controlado
 logger = logging.getLogger(__name__)
 
+# Base de la Graph API; se puede apuntar a un servidor stub (ver whatsapp_stub.py)
+WHATSAPP_API_BASE_URL = os.getenv('WHATSAPP_API_BASE_URL', "https://graph.facebook.com/v18.0")
+
+# Pool de conexiones compartido (requests.Session es seguro para POST concurrentes simples)
+_http_session = requests.Session()
+_http_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32))
+_http_session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32))
+
 @dataclass
 class WhatsAppConfig:
     """Configuración centralizada de WhatsApp"""
     api_token: str
     phone_number_id: str
-    base_url: str = "https://graph.facebook.com/v18.0"
+    base_url: str = WHATSAPP_API_BASE_URL
     
     @property
     def messages_url(self) -> str:
@@ -29,6 +39,10 @@ class WhatsAppConfig:
             'Authorization': f'Bearer {self.api_token}',
             'Content-Type': 'application/json'
         }
+    
+    @property
+    def http(self) -> requests.Session:
+        return _http_session
 
 class MessageSender(ABC):
     """Interface para diferentes tipos de mensajes"""
@@ -144,13 +158,72 @@ class ListMessage(MessageSender):
             logger.error(f"Error enviando lista: {str(e)[:30]}")
             return False
 
+class TemplateMessage(MessageSender):
+    """Plantillas aprobadas (únicas permitidas para iniciar conversación fuera de la ventana de 24h)"""
+    
+    def __init__(self, template_name: str, language_code: str = "es", body_parameters: Optional[List[str]] = None):
+        self.template_name = template_name
+        self.language_code = language_code
+        self.body_parameters = body_parameters or []
+    
+    def send(self, to_number: str, config: WhatsAppConfig) -> bool:
+        template = {
+            "name": self.template_name,
+            "language": {"code": self.language_code}
+        }
+        if self.body_parameters:
+            template["components"] = [{
+                "type": "body",
+                "parameters": [{"type": "text", "text": value} for value in self.body_parameters]
+            }]
+        
+        data = {
+            "messaging_product": "whatsapp",
+            "to": to_number,
+            "type": "template",
+            "template": template
+        }
+        return self._send_request(data, config)
+    
+    def _send_request(self, data: Dict, config: WhatsAppConfig) -> bool:
+        try:
+            # Sesión compartida: reutiliza conexiones keep-alive en envíos masivos
+            response = config.http.post(config.messages_url, headers=config.headers, json=data, timeout=10)
+            return response.status_code == 200
+        except Exception as e:
+            logger.error(f"Error enviando plantilla: {str(e)[:30]}")
+            return False
+
+class RateLimiter:
+    """Token bucket thread-safe: a lo sumo `rate` envíos por segundo (ráfagas de hasta `burst`)"""
+    
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
 class WhatsAppService:
     """Servicio principal de WhatsApp - Elimina if/else anidados"""
     
-    def __init__(self):
+    def __init__(self, base_url: Optional[str] = None):
         self.config = WhatsAppConfig(
             api_token=os.getenv('WHATSAPP_API_TOKEN'),
-            phone_number_id=os.getenv('WHATSAPP_PHONE_NUMBER_ID')
+            phone_number_id=os.getenv('WHATSAPP_PHONE_NUMBER_ID'),
+            base_url=base_url or WHATSAPP_API_BASE_URL
         )
     
     def send_text(self, to_number: str, message: str) -> bool:
@@ -165,6 +238,11 @@ class WhatsAppService:
         """Envía mensaje con lista"""
         return ListMessage(header, body, items).send(to_number, self.config)
     
+    def send_template(self, to_number: str, template_name: str, language_code: str = "es",
+                      body_parameters: Optional[List[str]] = None) -> bool:
+        """Envía una plantilla aprobada (invitaciones de campaña)"""
+        return TemplateMessage(template_name, language_code, body_parameters).send(to_number, self.config)
+    
     def is_configured(self) -> bool:
         """Verifica si el servicio está configurado correctamente"""
         return bool(self.config.api_token and self.config.phone_number_id)
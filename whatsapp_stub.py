@@ -0,0 +1,71 @@
+# whatsapp_stub.py - Servidor local que imita el endpoint /messages de la Graph API
+#
+# Para ensayos sin enviar nada real (campañas en --dry-run, pruebas de carga):
+#   python whatsapp_stub.py --port 8089 --latency-ms 80
+#   WHATSAPP_API_BASE_URL=http://127.0.0.1:8089/v18.0 python campaigns.py dispatch 1
+
+import json
+import time
+import random
+import argparse
+import threading
+import itertools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubGraphAPIHandler(BaseHTTPRequestHandler):
+    """Responde 200 con un id falso; opcionalmente simula latencia y errores 429"""
+    latency_ms = 0
+    fail_rate = 0.0
+    counter = itertools.count(1)
+    protocol_version = "HTTP/1.1"   # keep-alive, como la API real
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+        if random.random() < self.fail_rate:
+            status, body = 429, {"error": {"code": 130429, "message": "Rate limit hit (stub)"}}
+        else:
+            message_id = f"wamid.stub{next(self.counter)}"
+            status, body = 200, {
+                "messaging_product": "whatsapp",
+                "contacts": [{"input": payload.get("to"), "wa_id": payload.get("to")}],
+                "messages": [{"id": message_id}],
+            }
+
+        raw = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_server(port: int = 0, latency_ms: int = 0, fail_rate: float = 0.0):
+    """Levanta el stub en un hilo; devuelve (server, base_url)"""
+    handler = type("ConfiguredStubHandler", (StubGraphAPIHandler,), {
+        "latency_ms": latency_ms,
+        "fail_rate": fail_rate,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v18.0"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub local de la WhatsApp Graph API")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=int, default=0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.port, args.latency_ms, args.fail_rate)
+    print(f"🧪 Stub de WhatsApp escuchando en {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()